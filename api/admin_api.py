@@ -1,11 +1,35 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
-from werkzeug.security import generate_password_hash
+import csv
+import io
+from datetime import datetime
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Response, stream_with_context
 from utils.logger import logger
-from models.db_connection import get_db_cursor
+from models.db_connection import get_db_cursor, get_pool_stats
 from services.admin import admin_required
+from services.alerts import get_alert_metrics
+from services.anomaly import get_anomaly_metrics
+from services.audit import (
+    AUDIT_COLUMNS,
+    AUDIT_EQUALITY_FILTERS,
+    AUDIT_EXPORT_CHUNK,
+    AUDIT_PAGE_SIZE,
+    audit_row_to_json,
+    build_audit_filters,
+    get_audit_page,
+    iter_audit_rows,
+)
+from services.market_pages import get_market_page_metrics
+from services.notification_bus import notification_bus
+from services.passwords import hash_password, password_hasher
+from services.principals import invalidate_principal, principal_cache
+from services.rate_limit import rate_limiter
+from utils.auditing import audit_writer
+from utils.coingecko import get_refresh_metrics
 
 admin_api = Blueprint("admin_api", __name__)
 
+AUDIT_FILTER_ARGS = (*AUDIT_EQUALITY_FILTERS, "since", "until")
+
 
 def handle_db_query(query, params=None):
     """Helper function to manage database connections and queries."""
@@ -45,16 +69,102 @@ def view_users():
 @admin_api.route("/admin/audit", methods=["GET"])
 @admin_required
 def view_audits():
-    query = "SELECT * FROM audit_log ORDER BY created_at DESC"
-    audits, error = handle_db_query(query)
+    """
+    Show one page of the audit log, newest first.
 
-    if error:
+    Query parameters: event_type, status, username, ip_address, since and
+    until filter the events; limit and cursor page through them.
+    """
+    filters = {name: request.args.get(name, "") for name in AUDIT_FILTER_ARGS}
+    try:
+        conditions, params = build_audit_filters(filters)
+        audits, next_cursor = get_audit_page(
+            conditions,
+            params,
+            request.args.get("limit", AUDIT_PAGE_SIZE, type=int),
+            request.args.get("cursor"),
+        )
+    except ValueError as e:
+        flash(str(e), "danger")
+        return render_template("admin_audit_log.html", audits=[], filters=filters)
+    except Exception as e:
+        logger.error(f"Database error: {e}")
         flash("Error retrieving audit logs. Please try again later.", "danger")
-        return render_template("admin_audit_log.html", audits=[])
+        return render_template("admin_audit_log.html", audits=[], filters=filters)
+
     if not audits:
         flash("No audit logs available.", "info")
 
-    return render_template("admin_audit_log.html", audits=audits)
+    return render_template(
+        "admin_audit_log.html",
+        audits=audits,
+        filters=filters,
+        next_cursor=next_cursor,
+    )
+
+
+@admin_api.route("/admin/audit/export", methods=["GET"])
+@admin_required
+def export_audits():
+    """
+    Stream the audit events matching the viewer's filters as CSV or NDJSON.
+
+    Query parameters: the filters of `/admin/audit`, plus format=csv (default)
+    or format=ndjson.
+    """
+    export_format = request.args.get("format", "csv")
+    if export_format not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    try:
+        conditions, params = build_audit_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(AUDIT_COLUMNS)
+        for count, row in enumerate(iter_audit_rows(conditions, params), 1):
+            writer.writerow(tuple(row))
+            if count % AUDIT_EXPORT_CHUNK == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_ndjson():
+        for row in iter_audit_rows(conditions, params):
+            yield audit_row_to_json(row)
+
+    if export_format == "csv":
+        body, mimetype = generate_csv(), "text/csv"
+    else:
+        body, mimetype = generate_ndjson(), "application/x-ndjson"
+    filename = f"audit_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@admin_api.route("/admin/metrics", methods=["GET"])
+@admin_required
+def view_metrics():
+    return jsonify(
+        {
+            "db_pool": get_pool_stats(),
+            "market_refresh": get_refresh_metrics(),
+            "alerts": get_alert_metrics(),
+            "notification_streams": notification_bus.stats(),
+            "anomaly_model": get_anomaly_metrics(),
+            "market_pages": get_market_page_metrics(),
+            "audit_log": audit_writer.stats(),
+            "principals": principal_cache.stats(),
+            "rate_limits": rate_limiter.stats(),
+            "password_hashing": password_hasher.stats(),
+        }
+    )
 
 
 @admin_api.route("/admin/users/create", methods=["POST"])
@@ -70,7 +180,7 @@ def create_user():
         return redirect(url_for("admin_api.view_users"))
 
     try:
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
 
         query = """
             INSERT INTO users (username, email, password_hash, is_active, is_admin)
@@ -82,6 +192,7 @@ def create_user():
         if error:
             flash("Error creating user: " + error, "danger")
         else:
+            invalidate_principal()
             flash("User created successfully.", "success")
     except Exception as e:
         logger.error(f"Error creating user: {e}")
@@ -112,6 +223,7 @@ def delete_user(user_id):
             if error:
                 flash(error, "danger")
             else:
+                invalidate_principal(user_id)
                 flash("User marked as deleted.", "success")
     except Exception as e:
         logger.error(f"Error deleting user: {e}")
@@ -1,6 +1,8 @@
+import math
 from flask import Blueprint, jsonify, request, session
 from models.db_connection import get_db_cursor
 from services.alerts import get_active_alerts
+from services.alert_index import ALERT_TYPES, alert_index
 from utils.login_required import login_required
 
 alert_api = Blueprint("alert_api", __name__)
@@ -45,6 +47,16 @@ def set_alert():
         if field not in data:
             return jsonify({"error": f"Missing field: {field}"}), 400
 
+    # The alert index compares prices against thresholds as floats
+    try:
+        threshold = float(data["threshold"])
+    except (TypeError, ValueError):
+        threshold = math.nan
+    if not math.isfinite(threshold):
+        return jsonify({"error": "Threshold must be a finite number"}), 400
+    if data["alert_type"] not in ALERT_TYPES:
+        return jsonify({"error": "Alert type must be 'more' or 'less'"}), 400
+
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({"error": "User not logged in"}), 401
@@ -65,11 +77,21 @@ def set_alert():
                 data["name"],
                 data["cryptocurrency"],
                 data["alert_type"],
-                data["threshold"],
+                threshold,
             ),
         )
         conn.commit()
         alert_id = cursor.lastrowid
+        alert_index.add(
+            {
+                "id": alert_id,
+                "user_id": user_id,
+                "name": data["name"],
+                "cryptocurrency": data["cryptocurrency"],
+                "alert_type": data["alert_type"],
+                "threshold": threshold,
+            }
+        )
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
@@ -116,11 +138,13 @@ def delete_alert(alert_id):
     alert = cursor.fetchone()
 
     if not alert:
+        conn.close()
         return jsonify({"error": "Alert not found or does not belong to the user"}), 404
 
     query = "DELETE FROM alerts WHERE id = ?"
     cursor.execute(query, (alert_id,))
     conn.commit()
     conn.close()
+    alert_index.remove(alert_id)
 
     return jsonify({"message": "Alert deleted successfully"})
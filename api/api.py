@@ -1,7 +1,7 @@
-import csv
-import os
+import io
+import time
 
-from flask import Blueprint, jsonify, request, render_template, session, redirect, current_app
+from flask import Blueprint, jsonify, request, render_template, session, redirect, g
 from dateutil.parser import parse
 
 from models.db_connection import get_db_cursor
@@ -9,21 +9,54 @@ from services.portfolio import (
     get_assets_by_query,
     read_portfolio,
     calculate_portfolio_value,
+    calculate_ledger_pnl,
     fetch_owned_coins_from_db,
 )
+from services.anomaly import score_coins
+from services.market_movers import get_gainers_and_losers
+from services.portfolio_history import get_portfolio_history, pick_resolution
+from services.market_pages import get_market_page
+from services.search import get_portfolio_search_index, invalidate_portfolio_index
 import sqlite3
-from utils.coingecko import get_top_1000_crypto, fetch_gainers_and_losers_owned
-from utils.anomaly_detection import detect_outliers, combine_results, preprocess_data
+from utils.coingecko import get_market_snapshot
+from utils.anomaly_detection import combine_results
 from datetime import datetime
+from utils.csv_loader import import_transactions
 from utils.logger import logger
-from utils.login_required import login_required
-from math import ceil
-from werkzeug.utils import secure_filename
+from utils.login_required import has_valid_principal, login_required
 
 
 api = Blueprint("api", __name__)
 
 
+def current_market_snapshot():
+    """
+    Return the market snapshot pinned to the current request.
+
+    The view and the context processor read the same snapshot, so a page is
+    rendered from one consistent version of the market data.
+    """
+    if "market_snapshot" not in g:
+        g.market_snapshot = get_market_snapshot()
+    return g.market_snapshot
+
+
+def current_portfolio_valuation(user_id):
+    """
+    Read and value the user's portfolio once per request.
+
+    Returns:
+        tuple: The valued portfolio (assets annotated with value and allocation) and its total value.
+    """
+    if "portfolio_valuation" not in g:
+        portfolio = read_portfolio(user_id)
+        total_portfolio_value = calculate_portfolio_value(
+            portfolio, current_market_snapshot()
+        )
+        g.portfolio_valuation = (portfolio, total_portfolio_value)
+    return g.portfolio_valuation
+
+
 @api.route("/search_assets", methods=["GET"])
 @login_required
 def search_assets():
@@ -58,17 +91,12 @@ def filter_assets_by_letter():
 
     user_id = session["user_id"]
 
-    # Query the portfolio for assets whose names start with the specified letter
-    cursor, conn = get_db_cursor()
-    if cursor is None:
-        return jsonify({"error": "Database connection failed"}), 500
-
-    cursor.execute(
-        """SELECT name, abbreviation, amount FROM portfolio WHERE name LIKE ? AND user_id = ?""",
-        (f"{letter}%", user_id),
-    )
-    filtered_assets = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    # Look up the assets whose names start with the specified letter
+    index, assets = get_portfolio_search_index(user_id)
+    filtered_assets = [
+        {key: assets[doc][key] for key in ("name", "abbreviation", "amount")}
+        for doc in index.names_starting_with(letter)
+    ]
 
     # Return filtered assets as JSON
     return jsonify(filtered_assets)
@@ -104,6 +132,7 @@ def update_asset():
 
         conn.commit()
         conn.close()
+        invalidate_portfolio_index(user_id)
 
         # Check if the update was successful
         if cursor.rowcount == 0:
@@ -153,6 +182,7 @@ def delete_asset():
 
         conn.commit()
         conn.close()
+        invalidate_portfolio_index(user_id)
 
         # Check if the delete operation affected any rows
         if cursor.rowcount == 0:
@@ -179,13 +209,8 @@ def delete_asset():
 def save_portfolio_value():
     try:
         user_id = session["user_id"]
-        portfolio = read_portfolio(user_id)  # Assuming this reads your portfolio data
-        top_1000_cryptos = (
-            get_top_1000_crypto()
-        )  # Assuming this gets the top 1000 cryptos
-
         # Calculate the total portfolio value
-        total_portfolio_value = calculate_portfolio_value(portfolio, top_1000_cryptos)
+        _, total_portfolio_value = current_portfolio_valuation(user_id)
 
         # Get today's date
         today_date = datetime.now().strftime("%Y-%m-%d")
@@ -277,48 +302,16 @@ def market_data():
     # Get the current page, items per page, and search term
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 100, type=int)
-    search = request.args.get("search", "", type=str).lower()
-
-    cryptos = get_top_1000_crypto()
+    search = request.args.get("search", "", type=str).strip().lower()
 
-    # Filter cryptos if search term is provided
-    if search:
-        cryptos = [
-            crypto
-            for crypto in cryptos
-            if search in crypto["name"].lower() or search in crypto["symbol"].lower()
-        ]
-
-    # Calculate the total number of pages
-    total_cryptos = len(cryptos)
-    total_pages = ceil(total_cryptos / per_page)
-
-    # Apply pagination
-    start = (page - 1) * per_page
-    end = start + per_page
-    paginated_cryptos = cryptos[start:end]
-
-    # Format data as needed
-    for coin in paginated_cryptos:
-        coin["ath_date"] = parse(coin["ath_date"])
-        coin["atl_date"] = parse(coin["atl_date"])
-        coin["last_updated"] = parse(coin["last_updated"])
-        coin["price_change_percentage_24h"] = coin["price_change_percentage_24h"] or 0
-        coin["max_supply"] = coin["max_supply"] or 0
-        coin["high_24h"] = coin["high_24h"] or 0
-        coin["low_24h"] = coin["low_24h"] or 0
-        coin["price_change_24h"] = coin["price_change_24h"] or 0
-        coin["market_cap_change_24h"] = coin["market_cap_change_24h"] or 0
-        coin["market_cap_change_percentage_24h"] = (
-            coin["market_cap_change_percentage_24h"] or 0
-        )
-        coin["fully_diluted_valuation"] = coin["fully_diluted_valuation"] or 0
+    # Rendered once per snapshot, page and search; later requests are a lookup
+    market_page = get_market_page(current_market_snapshot(), page, per_page, search)
 
     return render_template(
         "market.html",
-        coins=paginated_cryptos,
-        page=page,
-        total_pages=total_pages,
+        market_table=market_page.html,
+        page=market_page.page,
+        total_pages=market_page.total_pages,
         search=search,
     )
 
@@ -326,9 +319,7 @@ def market_data():
 @api.context_processor
 def inject_total_portfolio_value():
     user_id = session["user_id"]
-    portfolio = read_portfolio(user_id)
-    top_1000_cryptos = get_top_1000_crypto()
-    total_portfolio_value = calculate_portfolio_value(portfolio, top_1000_cryptos)
+    _, total_portfolio_value = current_portfolio_valuation(user_id)
     return {"total_portfolio_value": total_portfolio_value}
 
 
@@ -337,18 +328,7 @@ def inject_total_portfolio_value():
 @login_required
 def show_portfolio():
     user_id = session["user_id"]
-    portfolio = read_portfolio(user_id)
-    top_1000_cryptos = get_top_1000_crypto()
-    total_portfolio_value = calculate_portfolio_value(portfolio, top_1000_cryptos)
-
-    # Portfolio allocation
-    for asset in portfolio:
-        allocation = (
-            (asset["value"] / total_portfolio_value) * 100
-            if total_portfolio_value > 0
-            else 0
-        )
-        asset["allocation_percentage"] = round(allocation, 2)
+    portfolio, total_portfolio_value = current_portfolio_valuation(user_id)
 
     portfolio = sorted(portfolio, key=lambda x: x["value"], reverse=True)
 
@@ -359,13 +339,49 @@ def show_portfolio():
     )
 
 
+def parse_time_param(value, default):
+    """Parse a Unix timestamp or ISO date/datetime query parameter into Unix time."""
+    if not value:
+        return default
+    if value.isdigit():
+        return int(value)
+    return int(parse(value).timestamp())
+
+
+@api.route("/api/portfolio/history", methods=["GET"])
+@login_required
+def portfolio_history():
+    user_id = session["user_id"]
+    try:
+        end = parse_time_param(request.args.get("to"), int(time.time()))
+        start = parse_time_param(request.args.get("from"), end - 86400)
+        if start > end:
+            return jsonify({"error": "'from' must not be after 'to'"}), 400
+
+        resolution = request.args.get("resolution") or pick_resolution(start, end)
+        points = get_portfolio_history(user_id, start, end, resolution)
+    except (ValueError, OverflowError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(
+        {"from": start, "to": end, "resolution": resolution, "points": points}
+    )
+
+
+@api.route("/api/portfolio/ledger", methods=["GET"])
+@login_required
+def portfolio_ledger():
+    ledger = calculate_ledger_pnl(session["user_id"], current_market_snapshot())
+    return jsonify(ledger)
+
+
 @api.route("/unowned", methods=["GET"])
 @login_required
 def show_unowned_cryptos():
     user_id = session["user_id"]
     # Read the portfolio and get the top 100 cryptos from CoinGecko
     portfolio = read_portfolio(user_id)
-    top_1000_cryptos = get_top_1000_crypto()
+    top_1000_cryptos = current_market_snapshot().coins
     top_100_cryptos = top_1000_cryptos[:100]  # Get only the top 100
 
     # Create a set of owned crypto names and abbreviations from the portfolio
@@ -400,12 +416,8 @@ def index():
         if "user_id" not in session:
             return redirect("/login")  # Redirect to login if not logged in
 
-        # Validate that user exists in the database
-        cursor, conn = get_db_cursor()
-        cursor.execute("SELECT 1 FROM users WHERE user_id = ?", (session["user_id"],))
-        user_exists = cursor.fetchone()
-
-        if not user_exists:
+        # Validate that user exists (and is not deleted), from the principal cache
+        if not has_valid_principal(session["user_id"]):
             session.clear()  # Clear invalid session
             return redirect("/login")  # Redirect to login
 
@@ -420,33 +432,25 @@ def index():
             gainers, losers = [], []
         else:
             # Fetch gainers and losers
-            gainers, losers = fetch_gainers_and_losers_owned(user_id, owned_coins)
-
-        # Fetch the portfolio data that we need for calculation
-        portfolio = read_portfolio(user_id)  # Your function to read portfolio data
-        top_1000_cryptos = get_top_1000_crypto()  # Function to get the top 1000 cryptos
+            gainers, losers = get_gainers_and_losers(
+                owned_coins, current_market_snapshot()
+            )
 
         # Calculate the total portfolio value
-        total_portfolio_value = calculate_portfolio_value(portfolio, top_1000_cryptos)
+        _, total_portfolio_value = current_portfolio_valuation(user_id)
 
-        # Get today's date for checking the database
+        # Get today's date to look up the last snapshot before today
         today_date = datetime.now().strftime("%Y-%m-%d")
 
-        # Connect to the database and check if a record for today already exists
         cursor, conn = get_db_cursor()
         if cursor is None:
             return jsonify({"error": "Database connection failed"}), 500
 
-        # Calculate the sum of all investments in the transactions table
-        cursor.execute(
-            "SELECT SUM(price) FROM transactions WHERE user_id = ?", (user_id,)
-        )
-        sum_price = cursor.fetchone()[0]
-        total_investment = round(sum_price, 2) if sum_price is not None else 0
-
-        # If there's no sum (i.e., no records), set total_investment to 0
-        if total_investment is None:
-            total_investment = 0
+        # Investment and P&L totals come from the materialized cost-basis ledger
+        ledger_totals = calculate_ledger_pnl(user_id, current_market_snapshot())[
+            "totals"
+        ]
+        total_investment = ledger_totals["total_invested"]
 
         # Calculate Nominal ROI
         if total_investment > 0:
@@ -457,53 +461,25 @@ def index():
             nominal_roi = 0
         formatted_nominal_roi = f"{nominal_roi:+.2f}%"
 
-        cursor.execute(
-            "SELECT 1 FROM portfolio_daily WHERE date = ? AND user_id = ?",
-            (today_date, user_id),
-        )
-        existing_record = cursor.fetchone()
-
-        if existing_record:
-            # If the record exists, update the portfolio_value
-            cursor.execute(
-                """
-                UPDATE portfolio_daily
-                SET portfolio_value = ?
-                WHERE date = ? AND user_id = ?
-            """,
-                (total_portfolio_value, today_date, user_id),
-            )
-        else:
-            # If no record for today, insert the new portfolio_value
-            cursor.execute(
-                """
-                INSERT INTO portfolio_daily (user_id, date, portfolio_value)
-                VALUES (?, ?, ?)
-            """,
-                (user_id, today_date, total_portfolio_value),
-            )
-
-        conn.commit()
-
-        # Fetch the previous day's portfolio value from the database for percentage change calculation
+        # Daily values are recorded by the scheduled snapshot job, this page only reads them
         cursor.execute(
             """
             SELECT portfolio_value
             FROM portfolio_daily
-            WHERE user_id = ?
+            WHERE user_id = ? AND date < ?
             ORDER BY date DESC
-            LIMIT 2
+            LIMIT 1
         """,
-            (user_id,),
+            (user_id, today_date),
         )
-        records = cursor.fetchall()
+        record = cursor.fetchone()
         conn.close()
 
         # Assign values for the current and previous portfolio values
         current_value = total_portfolio_value  # Use the freshly calculated value
         previous_value = (
-            records[1][0] if len(records) > 1 else current_value
-        )  # Last saved value
+            record[0] if record else current_value
+        )  # Last value saved before today
 
         # Calculate percentage change dynamically
         percentage_change = (
@@ -524,6 +500,8 @@ def index():
             total_investment=total_investment,
             nominal_roi=nominal_roi,
             formatted_nominal_roi=formatted_nominal_roi,
+            realized_pnl=ledger_totals["realized_pnl"],
+            unrealized_pnl=ledger_totals["unrealized_pnl"],
             gainers=gainers,
             losers=losers,
         )
@@ -547,19 +525,16 @@ def show_outliers():
     owned_coins = fetch_owned_coins_from_db(user_id)
 
     # Fetch gainers and losers
-    gainers, losers = fetch_gainers_and_losers_owned(user_id, owned_coins)
+    gainers, losers = get_gainers_and_losers(owned_coins, current_market_snapshot())
 
     if not gainers and not losers:
-        return "Failed to fetch data from the API.", 500
-
-    # Preprocess data
-    features, coin_ids = preprocess_data(gainers, losers)
+        return render_template("outliers.html", outlier_cryptos=[], inlier_cryptos=[])
 
-    # Detect outliers using Isolation Forest
-    labels = detect_outliers(features, contamination=0.1)
+    # Score against the Isolation Forest fitted on the whole market snapshot
+    labels, scores = score_coins(gainers + losers, current_market_snapshot())
 
     # Combine API data with model results
-    results = combine_results(labels, gainers, losers)
+    results = combine_results(labels, gainers, losers, scores)
 
     return render_template(
         "outliers.html",
@@ -615,6 +590,7 @@ def add_asset():
 
         conn.commit()
         conn.close()
+        invalidate_portfolio_index(user_id)
 
         logger.debug("Asset added successfully.")  # Log success
         return jsonify({"success": True})
@@ -653,6 +629,7 @@ def add_to_portfolio():
 
         conn.commit()
         conn.close()
+        invalidate_portfolio_index(user_id)
         return jsonify({"success": True})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -669,7 +646,6 @@ def allowed_file(filename):
 @api.route('/upload_csv', methods=['POST'])
 def upload_csv():
     user_id = session["user_id"]
-    upload_folder = current_app.config.get('UPLOAD_FOLDER')
     if 'csvFile' not in request.files:
         return jsonify({'error': 'No file part'}), 400
 
@@ -679,39 +655,22 @@ def upload_csv():
         return jsonify({'error': 'No selected file'}), 400
 
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(upload_folder, filename)
-        file.save(filepath)
-
         try:
-            # Open the database connection
-            cursor, conn = get_db_cursor()
-
-            # Process the CSV file
-            with open(filepath, newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    # Insert each row into the transactions table
-                    cursor.execute('''
-                        INSERT INTO transactions (
-                            user_id, name, abbreviation, transaction_date, 
-                            amount, price, transaction_id, rate
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        user_id, row['name'], row['abbreviation'], row['transaction_date'],
-                        float(row['amount']), float(row['price']), row['transaction_id'], float(row['rate'])
-                    ))
-
-            conn.commit()
-            conn.close()
-            os.remove(filepath)
-
-            return jsonify({'message': 'File successfully processed'}), 200
-
+            # Parse straight from the upload stream, no temporary file
+            stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+            report = import_transactions(stream, user_id)
+        except (ValueError, UnicodeDecodeError) as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
-            conn.rollback()
-            conn.close()
-            os.remove(filepath)
+            logger.error(f"Error importing transactions: {e}")
             return jsonify({'error': str(e)}), 500
 
+        message = (
+            f"File successfully processed: {report['inserted']} transactions imported, "
+            f"{report['duplicates']} duplicates skipped, {report['rejected']} rows rejected."
+        )
+        if report['aborted']:
+            message += " The rest of the file could not be read."
+        return jsonify({'message': message, **report}), 200
+
     return jsonify({'error': 'Invalid file type'}), 400
@@ -8,16 +8,31 @@ from flask import (
     session,
     jsonify,
 )
-from werkzeug.security import generate_password_hash, check_password_hash
-from models.db_connection import get_db_cursor
+from models.db_connection import get_db_connection, get_db_cursor
 from services.email import send_email
-from utils.auditing import log_audit_event
+from services.passwords import hash_password, verify_and_update_password
+from services.principals import invalidate_principal
+from services.rate_limit import rate_limiter
+from utils.auditing import get_client_ip, log_audit_event
+from math import ceil
 import uuid
 from datetime import datetime, timedelta, timezone
 
 login_api = Blueprint("login_api", __name__)
 
 
+def too_many_attempts(template, retry_after):
+    """Render `template` with a 429 status telling the client when to retry."""
+    retry_after = max(1, ceil(retry_after))
+    message = f"Too many attempts. Please try again in {retry_after} seconds."
+    flash(message, "error")
+    return (
+        render_template(template, error=message),
+        429,
+        {"Retry-After": str(retry_after)},
+    )
+
+
 def send_confirmation_email(username, email, token):
     confirm_link = url_for(
         "login_api.confirm_email", token=token, email=email, _external=True
@@ -59,6 +74,7 @@ def confirm_email():
             (token,),
         )
         conn.commit()  # Commit the email confirmation update
+        invalidate_principal(user["user_id"])
 
         return render_template("email_confirmed.html")
 
@@ -77,6 +93,11 @@ def register():
         email = request.form.get("email")
         password = request.form.get("password")
 
+        # Throttle before any hashing or database work
+        allowed, retry_after = rate_limiter.check([("register_ip", get_client_ip())])
+        if not allowed:
+            return too_many_attempts("register.html", retry_after)
+
         if not username or not email or not password:
             log_audit_event(
                 request,
@@ -88,7 +109,7 @@ def register():
             return render_template("register.html", error="All fields are required.")
 
         # Hash the password before storing it
-        password_hash = generate_password_hash(password)
+        password_hash = hash_password(password)
         token = str(uuid.uuid4())  # Generate a unique token
         expiration_time = datetime.now(timezone.utc) + timedelta(
             minutes=5
@@ -139,6 +160,7 @@ def register():
                         ),
                     )
                     conn.commit()
+                    invalidate_principal(existing_user["user_id"])
 
                     # Render the HTML email template
                     confirm_link = url_for(
@@ -213,6 +235,19 @@ def login():
         username = request.form.get("username")
         password = request.form.get("password")
 
+        # Throttle before any hashing or database work
+        client_ip = get_client_ip()
+        login_name = (username or "").strip().lower()
+        allowed, retry_after = rate_limiter.check(
+            [
+                ("login_ip", client_ip),
+                ("login_username_ip", login_name and f"{login_name}|{client_ip}"),
+                ("login_username", login_name),
+            ]
+        )
+        if not allowed:
+            return too_many_attempts("login.html", retry_after)
+
         if not username or not password:
             log_audit_event(
                 request,
@@ -243,8 +278,19 @@ def login():
                 (username,),
             )
             user = cursor.fetchone()
+            conn.close()  # Don't hold a pooled connection while hashing
 
-            if user and check_password_hash(user[1], password):
+            matches, new_hash = (
+                verify_and_update_password(user[1], password) if user else (False, None)
+            )
+            if matches:
+                if new_hash:
+                    # Hashing parameters changed since this hash was made
+                    with get_db_connection() as update_conn:
+                        update_conn.execute(
+                            "UPDATE users SET password_hash = ? WHERE user_id = ?",
+                            (new_hash, user[2]),
+                        )
                 session["user_id"] = user[
                     2
                 ]  # Store user_id in session, not just username
@@ -1,11 +1,29 @@
+import json
+import os
 import sqlite3
-from flask import Blueprint, jsonify, session
+import time
+from flask import Blueprint, Response, jsonify, request, session
 from models.db_connection import get_db_cursor
+from services.notification_bus import notification_bus
+from utils.pagination import decode_cursor, encode_cursor
 from utils.login_required import login_required
 from utils.logger import logger
 
 notification_api = Blueprint("notification_api", __name__)
 
+STREAM_HEARTBEAT = 15  # Seconds between keep-alive comments on an idle stream
+STREAM_MAX_DURATION = 300  # Seconds before a stream is closed and the client reconnects
+STREAM_RETRY_MS = 3000  # Reconnect delay suggested to EventSource clients
+# Each open stream holds a request thread, so only half the threads may stream
+STREAM_MAX_OPEN = max(1, int(os.getenv("GUNICORN_THREADS", 32)) // 2)
+
+NOTIFICATIONS_PAGE_SIZE = 20
+NOTIFICATIONS_MAX_PAGE_SIZE = 100
+MAX_BULK_MARK_READ = 1000  # Ids accepted by one bulk mark-read request
+
+# Maintained by triggers on the notifications table (migration 4)
+UNREAD_COUNT_QUERY = "SELECT unread FROM notification_counters WHERE user_id = ?;"
+
 
 def execute_query(query, params=None):
     """
@@ -19,45 +37,83 @@ def execute_query(query, params=None):
         return cursor, conn
     except sqlite3.Error as e:
         logger.error(f"Database error: {e}")
+        conn.close()
         return None, conn
 
 
-def get_notification_ownership(notification_id: int):
-    """
-    Returns the SQL query to check if a notification belongs to the current user.
-    """
-    return "SELECT user_id FROM notifications WHERE id = ?;"
+def fetch_unread_count(cursor, user_id):
+    """Read the unread counter that triggers keep in sync with notifications."""
+    cursor.execute(UNREAD_COUNT_QUERY, (user_id,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
 
 
 @notification_api.route("/notifications", methods=["GET"])
 @login_required
 def get_notifications():
+    """
+    Return one page of the user's notifications, newest first.
+
+    Query parameters: `limit` (page size), `cursor` (the `next_cursor` of the
+    previous page) and `unread=1` to list unread notifications only. Pages
+    are keyset-paginated on (created_at, id), so each page is an index range
+    scan however deep the user pages.
+    """
     user_id = session.get("user_id")
     if not user_id:
         return jsonify({"error": "User not logged in"}), 403
 
-    query = "SELECT * FROM notifications WHERE user_id = ? ORDER BY created_at DESC;"
-    cursor, conn = execute_query(query, (user_id,))
+    try:
+        limit = min(
+            max(int(request.args.get("limit", NOTIFICATIONS_PAGE_SIZE)), 1),
+            NOTIFICATIONS_MAX_PAGE_SIZE,
+        )
+        position = request.args.get("cursor")
+        position = decode_cursor(position) if position else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conditions = ["user_id = ?"]
+    params = [user_id]
+    if request.args.get("unread") in ("1", "true"):
+        conditions.append("is_read = 0")
+    if position is not None:
+        conditions.append("(created_at, id) < (?, ?)")
+        params.extend(position)
+
+    # Fetch one extra row to know whether another page follows
+    query = f"""
+        SELECT id, user_id, alert_id, created_at, notification_text, current_price, is_read
+        FROM notifications
+        WHERE {' AND '.join(conditions)}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """
+    cursor, conn = execute_query(query, (*params, limit + 1))
     if cursor is None:
         return jsonify({"error": "Database connection failed"}), 500
 
-    notifications = cursor.fetchall()
+    rows = cursor.fetchall()
     conn.close()
 
-    # Format notifications into a list of dictionaries for JSON response
-    notifications_dict = [
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    notifications = [
         {
-            "id": row[0],
-            "user_id": row[1],
-            "alert_id": row[2],
-            "notification_text": row[4],
-            "current_price": row[5],
-            "is_read": bool(row[6]),
-            "created_at": row[3],
+            "id": row["id"],
+            "user_id": row["user_id"],
+            "alert_id": row["alert_id"],
+            "notification_text": row["notification_text"],
+            "current_price": row["current_price"],
+            "is_read": bool(row["is_read"]),
+            "created_at": row["created_at"],
         }
-        for row in notifications
+        for row in rows
     ]
-    return jsonify(notifications_dict)
+    next_cursor = (
+        encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if has_more else None
+    )
+    return jsonify({"notifications": notifications, "next_cursor": next_cursor})
 
 
 @notification_api.route(
@@ -69,27 +125,83 @@ def mark_notification_as_read(notification_id):
     if not user_id:
         return jsonify({"error": "User not logged in"}), 403
 
-    check_query = get_notification_ownership(notification_id)
-
-    cursor, conn = execute_query(check_query, (notification_id,))
+    # The ownership check is part of the UPDATE itself
+    query = "UPDATE notifications SET is_read = 1 WHERE id = ? AND user_id = ?;"
+    cursor, conn = execute_query(query, (notification_id, user_id))
     if cursor is None:
         return jsonify({"error": "Database connection failed"}), 500
 
-    result = cursor.fetchone()
-    if not result or result[0] != user_id:
+    if cursor.rowcount == 0:
+        conn.close()
         return (
             jsonify({"error": "Notification does not belong to the current user"}),
             403,
         )
 
-    query = "UPDATE notifications SET is_read = 1 WHERE id = ?;"
-    cursor.execute(query, (notification_id,))
     conn.commit()
+    unread_count = fetch_unread_count(cursor, user_id)
     conn.close()
 
+    # Keep the badge in the user's other open tabs in sync
+    notification_bus.publish(user_id, "unread-count", {"unread_count": unread_count})
+
     return jsonify({"message": "Notification marked as read."})
 
 
+@notification_api.route("/notifications/mark-read", methods=["POST"])
+@login_required
+def mark_notifications_as_read():
+    """
+    Mark many notifications as read in one statement.
+
+    The JSON body holds one of: `ids` (a list of notification ids), `before`
+    (a cursor; that notification and every older one are marked) or
+    `all: true`.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 403
+
+    data = request.get_json(silent=True) or {}
+    conditions = ["user_id = ?", "is_read = 0"]
+    params = [user_id]
+    try:
+        if "ids" in data:
+            ids = data["ids"]
+            if not isinstance(ids, list) or not all(
+                isinstance(notification_id, int) for notification_id in ids
+            ):
+                raise ValueError("'ids' must be a list of integers")
+            if len(ids) > MAX_BULK_MARK_READ:
+                raise ValueError(f"At most {MAX_BULK_MARK_READ} ids per request")
+            conditions.append("id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(ids))
+        elif "before" in data:
+            conditions.append("(created_at, id) <= (?, ?)")
+            params.extend(decode_cursor(str(data["before"])))
+        elif data.get("all") is not True:
+            raise ValueError("Provide 'ids', 'before' or 'all'")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = f"UPDATE notifications SET is_read = 1 WHERE {' AND '.join(conditions)};"
+    cursor, conn = execute_query(query, params)
+    if cursor is None:
+        return jsonify({"error": "Database connection failed"}), 500
+
+    updated = cursor.rowcount
+    conn.commit()
+    unread_count = fetch_unread_count(cursor, user_id)
+    conn.close()
+
+    if updated:
+        notification_bus.publish(
+            user_id, "unread-count", {"unread_count": unread_count}
+        )
+
+    return jsonify({"updated": updated, "unread_count": unread_count})
+
+
 @notification_api.route("/notifications/unread-count", methods=["GET"])
 @login_required
 def get_unread_count():
@@ -97,12 +209,68 @@ def get_unread_count():
     if not user_id:
         return jsonify({"error": "User not logged in"}), 403
 
-    query = "SELECT COUNT(*) FROM notifications WHERE is_read = 0 and user_id = ?;"
-    cursor, conn = execute_query(query, (user_id,))
+    cursor, conn = get_db_cursor()
     if cursor is None:
         return jsonify({"error": "Database connection failed"}), 500
 
-    count = cursor.fetchone()[0]
+    count = fetch_unread_count(cursor, user_id)
     conn.close()
 
     return jsonify({"unread_count": count})
+
+
+def format_sse(event, data):
+    """Encode an event in the text/event-stream wire format."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@notification_api.route("/notifications/stream", methods=["GET"])
+@login_required
+def stream_notifications():
+    """
+    Push the user's notifications as Server-Sent Events.
+
+    The stream opens with the current unread count, then relays events
+    published by save_notification and mark-read without touching the
+    database. Streams close after STREAM_MAX_DURATION so worker threads are
+    recycled; EventSource reconnects on its own. Once STREAM_MAX_OPEN streams
+    are open in this process, new ones get a 503 and the client polls instead.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "User not logged in"}), 403
+
+    # Subscribe before counting so no notification falls between the two
+    subscription = notification_bus.subscribe(user_id, max_listeners=STREAM_MAX_OPEN)
+    if subscription is None:
+        return (
+            jsonify({"error": "Too many open notification streams"}),
+            503,
+            {"Retry-After": str(STREAM_MAX_DURATION)},
+        )
+    cursor, conn = get_db_cursor()
+    if cursor is None:
+        notification_bus.unsubscribe(subscription)
+        return jsonify({"error": "Database connection failed"}), 500
+    unread_count = fetch_unread_count(cursor, user_id)
+    conn.close()
+
+    def events():
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        yield format_sse("unread-count", {"unread_count": unread_count})
+        deadline = time.monotonic() + STREAM_MAX_DURATION
+        while time.monotonic() < deadline:
+            event = subscription.get(timeout=STREAM_HEARTBEAT)
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield format_sse(event["event"], event["data"])
+
+    response = Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Runs when the stream ends or the client disconnects, even before the first event
+    response.call_on_close(lambda: notification_bus.unsubscribe(subscription))
+    return response
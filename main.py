@@ -1,6 +1,7 @@
 import os
 from flask import Flask
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 load_dotenv()
 
@@ -10,8 +11,15 @@ from api.login_api import login_api
 from api.alert_api import alert_api
 from api.notification_api import notification_api
 from models.database import init_db
+from models.db_connection import release_thread_connection
 from utils.scheduler import configure_scheduler
 from services.alerts import check_alerts
+from services.alert_index import alert_index
+from services.anomaly import refresh_anomaly_model
+from services.audit import archive_audit_log
+from services.portfolio import snapshot_all_portfolios
+from services.portfolio_history import apply_history_retention
+from utils.coingecko import refresh_market_data
 from flask_session import Session
 from utils.logger import logger
 
@@ -22,9 +30,16 @@ app.config["SESSION_TYPE"] = "filesystem"
 app.config["SESSION_FILE_DIR"] = "./sessions"
 app.config["ALERT_CHECK_INTERVAL"] = 2  # Check alerts every 2 minutes
 app.config["ALERT_MAX_INSTANCES"] = 2
-app.config['UPLOAD_FOLDER'] = './uploads'
+app.config["MARKET_REFRESH_INTERVAL"] = 120  # Refresh market data every 2 minutes
+app.config["PORTFOLIO_SNAPSHOT_INTERVAL"] = 1  # Record portfolio values every minute
+
+# Number of reverse proxies in front of the app whose X-Forwarded-For is trusted
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", 0))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
 
 Session(app)
+app.teardown_appcontext(release_thread_connection)
 
 app.register_blueprint(api)
 app.register_blueprint(admin_api)
@@ -36,22 +51,34 @@ app.register_blueprint(notification_api)
 API_KEY = os.getenv("API_KEY")
 if not API_KEY:
     raise EnvironmentError("API_KEY is not set in the environment variables.")
-logger.info("App is starting...")
-
-try:
-    logger.info("Initializing database.")
-    init_db()
-    logger.info("Database initialized successfully.")
-except Exception as e:
-    raise RuntimeError(f"Failed to initialize the database: {e}")
-
-
-try:
-    logger.info("Adding jobs to schedule.")
-    configure_scheduler(app, check_alerts)
-    logger.info("Scheduler configured successfully.")
-except Exception as e:
-    raise RuntimeError(f"Failed to configure the scheduler: {e}")
+
+# Password hashing workers are spawned, and re-import this module as "__mp_main__"
+# when the app is run with `python main.py`; only the app process starts up
+if __name__ != "__mp_main__":
+    logger.info("App is starting...")
+
+    try:
+        logger.info("Initializing database.")
+        init_db()
+        alert_index.rebuild()
+        logger.info("Database initialized successfully.")
+    except Exception as e:
+        raise RuntimeError(f"Failed to initialize the database: {e}")
+
+    try:
+        logger.info("Adding jobs to schedule.")
+        configure_scheduler(
+            app,
+            check_alerts,
+            refresh_market_data,
+            snapshot_all_portfolios,
+            apply_history_retention,
+            refresh_anomaly_model,
+            archive_audit_log,
+        )
+        logger.info("Scheduler configured successfully.")
+    except Exception as e:
+        raise RuntimeError(f"Failed to configure the scheduler: {e}")
 
 
 # Run the Flask web server on port 8000
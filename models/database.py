@@ -1,7 +1,9 @@
 import os
 import sqlite3
-from werkzeug.security import generate_password_hash
 from models.db_connection import get_db_connection
+from models.migrations import run_migrations
+from services.ledger import update_ledger
+from services.passwords import hash_password
 from utils.csv_loader import load_portfolio_from_csv, load_transactions_from_csv
 from utils.logger import logger
 
@@ -75,14 +77,6 @@ def create_tables(cursor: sqlite3.Cursor) -> None:
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE(user_id, date)
             );
-            CREATE TABLE IF NOT EXISTS gainers_losers_cache (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL REFERENCES users(user_id),
-                owned_coins TEXT,
-                gainers TEXT,
-                losers TEXT,
-                timestamp TEXT
-            );
             CREATE TABLE IF NOT EXISTS transactions (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 user_id INTEGER NOT NULL REFERENCES users(user_id),
@@ -142,7 +136,7 @@ def ensure_admin_account(cursor: sqlite3.Cursor, conn: sqlite3.Connection) -> in
         if not all([username, email, password]):
             raise ValueError("Admin credentials not set in environment variables.")
 
-        password_hash = generate_password_hash(password)
+        password_hash = hash_password(password)
         cursor.execute(
             """
             INSERT INTO users (username, email, password_hash, is_admin, is_active)
@@ -190,11 +184,16 @@ def init_db() -> None:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             create_tables(cursor)
+            schema_version = run_migrations(conn)
+            logger.info(f"Database schema is at version {schema_version}.")
             admin_user_id = ensure_admin_account(cursor, conn)
 
             if admin_user_id > 0:
                 load_initial_data(cursor, admin_user_id)
             else:
                 logger.warning("Admin user not created; skipping data load.")
+
+            # Catch up ledgers for transactions that predate the ledger tables
+            update_ledger()
     except sqlite3.Error as e:
         logger.error(f"Database initialization failed: {e}")
@@ -1,36 +1,264 @@
+import os
 import sqlite3
-from typing import Optional, Tuple
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from utils.logger import logger
 
 
 DATABASE = "crypto_portfolio.db"
+# Connections used outside request threads: the scheduler jobs that query the
+# database (check_alerts runs up to 2 instances; market refresh, portfolio snapshots,
+# history retention and audit archival one each) plus the audit log writer thread.
+# Notification streams release their connection before streaming.
+DB_BACKGROUND_CONNECTIONS = 7
+# Max open connections per process; defaults to one per gunicorn request thread plus
+# the background connections, so background work never waits on request traffic
+DB_POOL_SIZE = int(
+    os.getenv(
+        "DB_POOL_SIZE",
+        int(os.getenv("GUNICORN_THREADS", 10)) + DB_BACKGROUND_CONNECTIONS,
+    )
+)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))  # Seconds to wait for a free connection
 
+# Applied once when a connection is opened, not on every checkout
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON;",  # Enforce foreign key constraints
+    "PRAGMA journal_mode = WAL;",  # Enable Write-Ahead Logging for better concurrency
+    "PRAGMA synchronous = NORMAL;",  # Safe with WAL, avoids an fsync per commit
+    "PRAGMA cache_size = -20000;",  # ~20MB page cache per connection
+    "PRAGMA mmap_size = 268435456;",  # Memory-map up to 256MB of the database file
+    "PRAGMA busy_timeout = 5000;",  # Wait up to 5s on a locked database instead of failing
+)
 
-def get_db_connection() -> sqlite3.Connection:
+
+class PooledConnection:
     """
-    Establish and configure a database connection.
+    Thin wrapper around a pooled sqlite3.Connection.
 
-    Returns:
-        sqlite3.Connection: Configured SQLite database connection.
+    Behaves like the underlying connection, except that `close()` returns it to
+    the pool, and using it as a context manager commits (or rolls back) and then
+    returns it to the pool. A nested checkout shares the outer one's connection
+    and transaction, so only the outermost context manager commits or rolls back.
     """
-    try:
-        conn = sqlite3.connect(DATABASE)
-        conn.execute("PRAGMA foreign_keys = ON;")  # Enforce foreign key constraints
-        conn.execute(
-            "PRAGMA journal_mode = WAL;"
-        )  # Enable Write-Ahead Logging for better concurrency
+
+    def __init__(self, pool: "ConnectionPool", conn: sqlite3.Connection):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    def close(self) -> None:
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if self._released or not self._pool.is_outermost(self._conn):
+                return
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self.close()
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections with per-thread reuse.
+
+    Nested checkouts on the same thread share one connection, and a thread
+    returning to the pool gets its previous connection back when it is idle.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        max_size: int = DB_POOL_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+    ):
+        self.database = database
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._idle: List[sqlite3.Connection] = []
+        self._open = 0
+        self._stats = {
+            "created": 0,
+            "checkouts": 0,
+            "thread_reuses": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "discarded": 0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
         conn.row_factory = sqlite3.Row  # Return rows as dictionary-like objects
         return conn
-    except sqlite3.Error as e:
-        raise RuntimeError(f"Failed to establish database connection: {e}")
+
+    def _check_fork(self) -> None:
+        # Connections must never be shared across processes (e.g. gunicorn workers)
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._reset_state()
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Check out a connection, reusing the one already held by this thread.
+
+        Raises:
+            RuntimeError: If no connection becomes available within the timeout.
+        """
+        self._check_fork()
+        local = self._local
+        if getattr(local, "depth", 0) > 0:
+            local.depth += 1
+            return local.conn
+
+        preferred = getattr(local, "last_conn", None)
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._stats["checkouts"] += 1
+            while True:
+                if preferred is not None and preferred in self._idle:
+                    self._idle.remove(preferred)
+                    self._stats["thread_reuses"] += 1
+                    conn = preferred
+                    break
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise RuntimeError(
+                        "Failed to establish database connection: pool exhausted"
+                    )
+                self._stats["waits"] += 1
+                self._cond.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except sqlite3.Error as e:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise RuntimeError(f"Failed to establish database connection: {e}")
+            with self._cond:
+                self._stats["created"] += 1
+
+        local.conn = conn
+        local.last_conn = conn
+        local.depth = 1
+        return conn
+
+    def is_outermost(self, conn: sqlite3.Connection) -> bool:
+        """Return whether `conn` is held by this thread's outermost checkout only."""
+        local = self._local
+        return getattr(local, "conn", None) is not conn or local.depth <= 1
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection checked out with `acquire`."""
+        local = self._local
+        if getattr(local, "conn", None) is conn and local.depth > 1:
+            local.depth -= 1
+            return
+        if getattr(local, "conn", None) is conn:
+            local.depth = 0
+            local.conn = None
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # Discard uncommitted work, as close() would
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding broken database connection: {e}")
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def release_thread(self) -> None:
+        """Return the connection held by the current thread, however deeply nested."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.depth = 1
+            self.release(conn)
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def close_all(self) -> None:
+        """Close every idle connection."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        """Return a snapshot of the pool counters for monitoring."""
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                **self._stats,
+            }
+
+
+pool = ConnectionPool(DATABASE)
 
 
-def get_db_cursor() -> Tuple[Optional[sqlite3.Cursor], Optional[sqlite3.Connection]]:
+def get_db_connection() -> PooledConnection:
+    """
+    Check out a configured database connection from the pool.
+
+    Call `close()` or use it as a context manager to return it to the pool.
+
+    Returns:
+        PooledConnection: Pooled SQLite database connection.
+    """
+    return PooledConnection(pool, pool.acquire())
+
+
+def get_db_cursor() -> Tuple[Optional[sqlite3.Cursor], Optional[PooledConnection]]:
     """
     Create and return a database cursor along with the connection.
 
     Returns:
-        Tuple[Optional[sqlite3.Cursor], Optional[sqlite3.Connection]]: Database cursor and connection, or (None, None) on failure.
+        Tuple[Optional[sqlite3.Cursor], Optional[PooledConnection]]: Database cursor and connection, or (None, None) on failure.
     """
     try:
         conn = get_db_connection()
@@ -42,3 +270,13 @@ def get_db_cursor() -> Tuple[Optional[sqlite3.Cursor], Optional[sqlite3.Connecti
     except sqlite3.Error as e:
         logger.error(f"Error obtaining database cursor: {e}")
         return None, None
+
+
+def release_thread_connection(exception: Optional[BaseException] = None) -> None:
+    """Return any connection still held by the current thread (e.g. at request teardown)."""
+    pool.release_thread()
+
+
+def get_pool_stats() -> Dict[str, int]:
+    """Return the connection pool counters."""
+    return pool.stats()
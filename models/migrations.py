@@ -0,0 +1,223 @@
+import sqlite3
+from typing import List, Tuple
+from utils.logger import logger
+
+
+# Ordered schema migrations, applied once each and tracked via PRAGMA user_version.
+# Append new migrations with the next version number; never edit applied ones.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (
+        1,
+        "Indexes for hot query paths",
+        [
+            # SUM(price) per user is answered from the index alone
+            "CREATE INDEX IF NOT EXISTS idx_transactions_user_price ON transactions (user_id, price)",
+            "CREATE INDEX IF NOT EXISTS idx_notifications_user_read_created ON notifications (user_id, is_read, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_alerts_status ON alerts (status)",
+            "CREATE INDEX IF NOT EXISTS idx_audit_log_created ON audit_log (created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_portfolio_user_name ON portfolio (user_id, name)",
+            "CREATE INDEX IF NOT EXISTS idx_cryptocurrencies_timestamp ON cryptocurrencies (timestamp)",
+        ],
+    ),
+    (
+        2,
+        "Portfolio value time series",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS portfolio_points (
+                user_id INTEGER NOT NULL REFERENCES users(user_id),
+                ts INTEGER NOT NULL,                   -- Unix time, truncated to the minute
+                value REAL NOT NULL,
+                PRIMARY KEY (user_id, ts)
+            ) WITHOUT ROWID
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS portfolio_rollups (
+                user_id INTEGER NOT NULL REFERENCES users(user_id),
+                resolution TEXT NOT NULL,              -- "hour" or "day"
+                bucket INTEGER NOT NULL,               -- Unix time of the bucket start
+                min_value REAL NOT NULL,
+                max_value REAL NOT NULL,
+                last_value REAL NOT NULL,
+                PRIMARY KEY (user_id, resolution, bucket)
+            ) WITHOUT ROWID
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_portfolio_points_ts ON portfolio_points (ts)",
+            "CREATE INDEX IF NOT EXISTS idx_portfolio_rollups_resolution_bucket ON portfolio_rollups (resolution, bucket)",
+        ],
+    ),
+    (
+        3,
+        "Cost-basis ledger",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS ledger_positions (
+                user_id INTEGER NOT NULL REFERENCES users(user_id),
+                name TEXT NOT NULL,
+                abbreviation TEXT NOT NULL,
+                quantity REAL NOT NULL DEFAULT 0,      -- Units still held
+                cost_basis REAL NOT NULL DEFAULT 0,    -- Cost of the units still held
+                total_invested REAL NOT NULL DEFAULT 0,
+                realized_pnl REAL NOT NULL DEFAULT 0,
+                last_transaction_date TEXT NOT NULL,
+                PRIMARY KEY (user_id, name)
+            ) WITHOUT ROWID
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS ledger_lots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL REFERENCES users(user_id),
+                name TEXT NOT NULL,
+                transaction_id INTEGER NOT NULL REFERENCES transactions(id),
+                acquired TEXT NOT NULL,
+                amount REAL NOT NULL,                  -- Units left in the lot
+                cost REAL NOT NULL                     -- Cost of the units left
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS ledger_state (
+                user_id INTEGER PRIMARY KEY REFERENCES users(user_id),
+                last_transaction_id INTEGER NOT NULL   -- Highest transactions.id applied
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_ledger_lots_user_name ON ledger_lots (user_id, name, acquired, id)",
+            "CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions (user_id, id)",
+            "CREATE INDEX IF NOT EXISTS idx_transactions_user_name_date ON transactions (user_id, name, transaction_date)",
+        ],
+    ),
+    (
+        4,
+        "Notification keyset index and unread counters",
+        [
+            # Serves ORDER BY created_at DESC, id DESC pages without a sort
+            "CREATE INDEX IF NOT EXISTS idx_notifications_user_created_id ON notifications (user_id, created_at, id)",
+            """
+            CREATE TABLE IF NOT EXISTS notification_counters (
+                user_id INTEGER PRIMARY KEY REFERENCES users(user_id),
+                unread INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            """
+            INSERT INTO notification_counters (user_id, unread)
+            SELECT user_id, COUNT(*) FROM notifications WHERE is_read = 0 GROUP BY user_id
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_notifications_unread_insert
+            AFTER INSERT ON notifications WHEN NEW.is_read = 0
+            BEGIN
+                INSERT INTO notification_counters (user_id, unread) VALUES (NEW.user_id, 1)
+                ON CONFLICT(user_id) DO UPDATE SET unread = unread + 1;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_notifications_unread_update
+            AFTER UPDATE OF is_read ON notifications
+            WHEN (OLD.is_read = 0) != (NEW.is_read = 0)
+            BEGIN
+                INSERT INTO notification_counters (user_id, unread)
+                VALUES (NEW.user_id, CASE WHEN NEW.is_read = 0 THEN 1 ELSE -1 END)
+                ON CONFLICT(user_id) DO UPDATE SET unread = unread + excluded.unread;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_notifications_unread_delete
+            AFTER DELETE ON notifications WHEN OLD.is_read = 0
+            BEGIN
+                UPDATE notification_counters SET unread = unread - 1
+                WHERE user_id = OLD.user_id;
+            END
+            """,
+        ],
+    ),
+    (
+        5,
+        "Retire the per-user gainers/losers cache",
+        [
+            # Gainers and losers are now ranked from the market snapshot
+            "DROP TABLE IF EXISTS gainers_losers_cache",
+        ],
+    ),
+    (
+        6,
+        "Audit log filters",
+        [
+            # Each serves an equality filter plus the (created_at, id) keyset order;
+            # status and time-range-only filters use idx_audit_log_created
+            "CREATE INDEX IF NOT EXISTS idx_audit_log_username_created ON audit_log (username, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_audit_log_ip_created ON audit_log (ip_address, created_at)",
+            "CREATE INDEX IF NOT EXISTS idx_audit_log_event_created ON audit_log (event_type, created_at)",
+        ],
+    ),
+    (
+        7,
+        "ISO transaction dates",
+        [
+            # Imports now store YYYY-MM-DD; rewrite basic-format YYYYMMDD dates so
+            # that the ledger's string ordering stays chronological
+            f"""
+            UPDATE {table} SET {column} =
+                substr({column}, 1, 4) || '-' || substr({column}, 5, 2) || '-' || substr({column}, 7, 2)
+            WHERE {column} GLOB '[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]'
+            """
+            for table, column in (
+                ("transactions", "transaction_date"),
+                ("ledger_lots", "acquired"),
+                ("ledger_positions", "last_transaction_date"),
+            )
+        ],
+    ),
+    (
+        8,
+        "Deactivate alerts with invalid thresholds",
+        [
+            # set_alert stored thresholds unchecked; the alert index needs finite ones
+            """
+            UPDATE alerts SET status = 'inactive'
+            WHERE status = 'active' AND (
+                typeof(threshold) NOT IN ('integer', 'real') OR abs(threshold) = 9e999
+            )
+            """,
+        ],
+    ),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the schema version recorded in the database."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Apply every migration newer than the database's schema version.
+
+    Each migration runs in its own write transaction together with the
+    user_version bump, so a failed migration leaves no partial changes and
+    concurrent workers starting up apply each migration only once.
+
+    Args:
+        conn (sqlite3.Connection): Database connection.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    for version, description, statements in MIGRATIONS:
+        if version <= get_schema_version(conn):
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Re-check under the write lock in case another worker got here first
+            if version <= get_schema_version(conn):
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+            logger.info(f"Applied migration {version}: {description}")
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Migration {version} ({description}) failed: {e}")
+            raise
+
+    return get_schema_version(conn)
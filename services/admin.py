@@ -2,7 +2,7 @@ from functools import wraps
 from flask import session, redirect, url_for
 from typing import Callable, Any
 from utils.logger import logger
-from models.db_connection import get_db_cursor
+from services.principals import get_principal
 
 
 def admin_required(f: Callable) -> Callable:
@@ -37,25 +37,11 @@ def is_admin(user_id: int) -> bool:
         user_id (int): The ID of the user to check.
 
     Returns:
-        bool: True if the user is an admin, otherwise False.
+        bool: True if the user is an admin and not deleted, otherwise False.
     """
     try:
-        cursor, conn = get_db_cursor()
-        if cursor is None:
-            logger.error("Database cursor is None. Cannot verify admin status.")
-            return False
-
-        cursor.execute("SELECT is_admin FROM users WHERE user_id = ?", (user_id,))
-        user = cursor.fetchone()
-
-        if not user:
-            logger.warning(f"User ID {user_id} not found in database.")
-            return False
-
-        return user[0] == 1
+        principal = get_principal(user_id)
     except Exception as e:
         logger.error(f"Error checking admin status for user {user_id}: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
+    return principal is not None and principal.is_admin and not principal.is_deleted
@@ -0,0 +1,179 @@
+import math
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from models.database import get_db_connection
+from utils.logger import logger
+
+
+ALERT_COLUMNS = ("id", "user_id", "name", "cryptocurrency", "alert_type", "threshold")
+ALERT_TYPES = ("more", "less")
+
+
+class ThresholdBook:
+    """
+    Active alerts on a single coin, kept sorted by threshold per alert type.
+
+    "more" alerts fire when the price rises above their threshold and "less"
+    alerts when it falls below it, so for a given price the triggered alerts
+    are a prefix of the "more" book and a suffix of the "less" book.
+    """
+
+    def __init__(self):
+        self.more: List[Tuple[float, int]] = []  # (threshold, alert_id), ascending
+        self.less: List[Tuple[float, int]] = []
+
+    def _side(self, alert_type: str) -> List[Tuple[float, int]]:
+        if alert_type == "more":
+            return self.more
+        if alert_type == "less":
+            return self.less
+        raise ValueError(f"Unknown alert type: {alert_type!r}")
+
+    def add(self, alert_type: str, threshold: float, alert_id: int) -> None:
+        insort(self._side(alert_type), (threshold, alert_id))
+
+    def remove(self, alert_type: str, threshold: float, alert_id: int) -> None:
+        side = self._side(alert_type)
+        i = bisect_left(side, (threshold, alert_id))
+        if i < len(side) and side[i] == (threshold, alert_id):
+            del side[i]
+
+    def triggered(self, price: float) -> List[int]:
+        """Return the ids of alerts whose condition is met at `price`, in O(log n + k)."""
+        more_end = bisect_left(self.more, (price,))  # thresholds < price
+        less_start = bisect_right(self.less, (price, float("inf")))  # thresholds > price
+        return [alert_id for _, alert_id in self.more[:more_end]] + [
+            alert_id for _, alert_id in self.less[less_start:]
+        ]
+
+    def __len__(self) -> int:
+        return len(self.more) + len(self.less)
+
+
+class AlertIndex:
+    """In-memory index of active alerts, grouped by coin name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._books: Dict[str, ThresholdBook] = {}
+        self._alerts: Dict[int, Dict[str, Any]] = {}
+        self._skipped: Set[int] = set()  # Active alerts that cannot be evaluated
+
+    def rebuild(self, alerts: Optional[Iterable[Dict[str, Any]]] = None) -> None:
+        """
+        Replace the index contents, loading active alerts from the database if none are given.
+
+        Args:
+            alerts (Optional[Iterable[Dict[str, Any]]]): Active alerts to index.
+        """
+        if alerts is None:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT {', '.join(ALERT_COLUMNS)} FROM alerts WHERE status = 'active'"
+                )
+                alerts = [dict(row) for row in cursor.fetchall()]
+
+        with self._lock:
+            self._books = {}
+            self._alerts = {}
+            self._skipped = set()
+            for alert in alerts:
+                try:
+                    self._add(alert)
+                except (TypeError, ValueError) as e:
+                    # Rows stored before set_alert validated its input
+                    logger.warning(f"Alert {alert['id']} is not indexed: {e}")
+                    self._skipped.add(alert["id"])
+        logger.info(f"Alert index rebuilt with {len(self)} active alerts.")
+
+    def _add(self, alert: Dict[str, Any]) -> None:
+        alert = {column: alert[column] for column in ALERT_COLUMNS}
+        alert["threshold"] = float(alert["threshold"])
+        if not math.isfinite(alert["threshold"]):
+            raise ValueError(f"Threshold is not finite: {alert['threshold']}")
+        if alert["alert_type"] not in ALERT_TYPES:
+            raise ValueError(f"Unknown alert type: {alert['alert_type']!r}")
+        if alert["id"] in self._alerts:
+            self._remove(alert["id"])
+        self._alerts[alert["id"]] = alert
+        book = self._books.setdefault(alert["name"].lower(), ThresholdBook())
+        book.add(alert["alert_type"], alert["threshold"], alert["id"])
+
+    def _remove(self, alert_id: int) -> None:
+        self._skipped.discard(alert_id)
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return
+        coin = alert["name"].lower()
+        book = self._books[coin]
+        book.remove(alert["alert_type"], alert["threshold"], alert_id)
+        if not book:
+            del self._books[coin]
+
+    def add(self, alert: Dict[str, Any]) -> None:
+        """Index a newly created alert."""
+        with self._lock:
+            self._add(alert)
+
+    def remove(self, alert_id: int) -> None:
+        """Drop an alert that was deleted or deactivated."""
+        with self._lock:
+            self._remove(alert_id)
+
+    def remove_many(self, alert_ids: Iterable[int]) -> None:
+        """Drop several alerts at once."""
+        with self._lock:
+            for alert_id in alert_ids:
+                self._remove(alert_id)
+
+    def sync(self) -> None:
+        """
+        Rebuild the index if it drifted from the database.
+
+        Alerts created or deleted through another worker process are not seen
+        by this process's index, so compare the active count and highest id.
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT COUNT(*), MAX(id) FROM alerts WHERE status = 'active'"
+            )
+            count, max_id = cursor.fetchone()
+
+        with self._lock:
+            # Skipped alerts are still active in the database
+            indexed = self._alerts.keys() | self._skipped
+            in_sync = count == len(indexed) and max_id == max(indexed, default=None)
+        if not in_sync:
+            logger.info("Alert index out of sync with the database, rebuilding.")
+            self.rebuild()
+
+    def coins(self) -> List[str]:
+        """Return the lowercased names of coins with at least one active alert."""
+        with self._lock:
+            return list(self._books)
+
+    def triggered(self, coin: str, price: float) -> List[Dict[str, Any]]:
+        """
+        Return the alerts on `coin` whose condition is met at `price`.
+
+        Args:
+            coin (str): Lowercased coin name.
+            price (float): The current price of the coin.
+
+        Returns:
+            List[Dict[str, Any]]: Triggered alerts.
+        """
+        with self._lock:
+            book = self._books.get(coin)
+            if book is None:
+                return []
+            return [dict(self._alerts[alert_id]) for alert_id in book.triggered(price)]
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+
+alert_index = AlertIndex()
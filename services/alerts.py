@@ -1,11 +1,56 @@
+import time
 from datetime import datetime
 from models.database import get_db_connection
 from utils.logger import logger
 from typing import List, Dict, Any
-from utils.coingecko import get_current_price
+from utils.coingecko import get_current_prices
+from services.alert_index import alert_index
 from services.notifications import save_notification, send_notification
 
 
+_tick_metrics = {
+    "last_tick_at": None,
+    "last_tick_duration": None,
+    "alerts_checked": 0,
+    "coins_priced": 0,
+    "notifications_triggered": 0,
+}
+
+
+def deactivate_orphaned_alerts(cursor) -> List[int]:
+    """
+    Deactivate active alerts for coins no longer in the user's portfolio.
+
+    Runs as a single set-based UPDATE (anti-join against the portfolio) and
+    commits once, instead of checking the portfolio alert by alert.
+
+    Args:
+        cursor: SQLite cursor.
+
+    Returns:
+        List[int]: IDs of the alerts that were deactivated.
+    """
+    cursor.execute(
+        """
+        UPDATE alerts SET status = 'inactive'
+        WHERE status = 'active' AND NOT EXISTS (
+            SELECT 1 FROM portfolio
+            WHERE portfolio.user_id = alerts.user_id AND portfolio.name = alerts.name
+        )
+        RETURNING id
+        """
+    )
+    deactivated = [row[0] for row in cursor.fetchall()]
+    cursor.connection.commit()
+
+    if deactivated:
+        logger.warning(
+            f"{len(deactivated)} alerts marked as inactive due to portfolio change."
+        )
+        alert_index.remove_many(deactivated)
+    return deactivated
+
+
 def get_active_alerts() -> List[Dict[str, Any]]:
     """
     Fetch active alerts from the database and deactivate any alerts for coins no longer in the user's portfolio.
@@ -15,68 +60,40 @@ def get_active_alerts() -> List[Dict[str, Any]]:
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        deactivate_orphaned_alerts(cursor)
 
         # Fetch only active alerts
         cursor.execute("SELECT * FROM alerts WHERE status = 'active'")
         active_alerts = cursor.fetchall()
 
-        for alert in active_alerts:
-            # Check if the coin is still in the user's portfolio
-            cursor.execute(
-                "SELECT * FROM portfolio WHERE user_id = ? AND name = ?",
-                (alert["user_id"], alert["name"]),
-            )
-            portfolio_record = cursor.fetchone()
-
-            if not portfolio_record:
-                # Coin is no longer in the portfolio, mark the alert as inactive
-                cursor.execute(
-                    "UPDATE alerts SET status = ? WHERE id = ?",
-                    ("inactive", alert["id"]),
-                )
-                conn.commit()
-                logger.warning(
-                    f"Alert for {alert['name']} is marked as inactive due to portfolio change."
-                )
-
     return active_alerts
 
 
-def is_alert_condition_met(alert: Dict[str, Any], current_price: float) -> bool:
-    """
-    Check whether an alert condition is met based on the current price.
-
-    Args:
-        alert (Dict[str, Any]): The alert to check.
-        current_price (float): The current price of the cryptocurrency.
-
-    Returns:
-        bool: True if the alert condition is met, otherwise False.
-    """
-    if alert["alert_type"] == "more" and current_price > alert["threshold"]:
-        return True
-    if alert["alert_type"] == "less" and current_price < alert["threshold"]:
-        return True
-    return False
-
-
 def check_alerts() -> None:
     """
     Check all active alerts and trigger notifications if alert conditions are met.
     """
     logger.info(f"Checking alerts at {datetime.now()}")
-    active_alerts = get_active_alerts()
+    started = time.monotonic()
+    with get_db_connection() as conn:
+        deactivate_orphaned_alerts(conn.cursor())
+    alert_index.sync()
 
-    for alert in active_alerts:
-        price_data = get_current_price(alert["name"].lower(), target_currency="usd")
+    # One price lookup per distinct coin, shared by every alert on it
+    coins = alert_index.coins()
+    prices = get_current_prices(coins, target_currency="usd")
 
-        if price_data is None:
-            logger.error(f"No price data available for {alert['name']}")
-            continue
+    triggered = 0
+    for coin in coins:
+        current_price = prices.get(coin)
 
-        current_price = price_data
+        if current_price is None:
+            logger.error(f"No price data available for {coin}")
+            continue
 
-        if is_alert_condition_met(alert, current_price):
+        # Only the alerts whose threshold was crossed are visited
+        for alert in alert_index.triggered(coin, current_price):
+            triggered += 1
             try:
                 save_notification(alert, current_price)
                 send_notification(alert, current_price)
@@ -85,3 +102,23 @@ def check_alerts() -> None:
                 )
             except Exception as e:
                 logger.error(f"Error processing alert {alert['id']}: {e}")
+
+    duration = time.monotonic() - started
+    _tick_metrics.update(
+        {
+            "last_tick_at": datetime.now().isoformat(),
+            "last_tick_duration": round(duration, 3),
+            "alerts_checked": len(alert_index),
+            "coins_priced": len(prices),
+            "notifications_triggered": triggered,
+        }
+    )
+    logger.info(
+        f"Checked {len(alert_index)} alerts across {len(prices)} priced coins "
+        f"in {duration:.2f} seconds ({triggered} triggered)."
+    )
+
+
+def get_alert_metrics() -> Dict[str, Any]:
+    """Return counters from the most recent alert check."""
+    return dict(_tick_metrics)
@@ -0,0 +1,170 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from services.valuation import get_valuation_engine
+from utils.anomaly_detection import extract_features, fit_isolation_forest
+from utils.coingecko import MarketSnapshot, get_market_snapshot
+from utils.logger import logger
+
+
+ANOMALY_CONTAMINATION = 0.1  # Expected share of outliers in the market
+
+
+class AnomalyModel:
+    """
+    Isolation Forest fitted on a whole market snapshot.
+
+    Every coin in the snapshot is scored once at fit time, so scoring a
+    user's coins is a lookup; only coins missing from the snapshot go
+    through the model.
+    """
+
+    def __init__(self, snapshot: MarketSnapshot):
+        self.version = snapshot.version
+        self._engine = get_valuation_engine(snapshot)
+        features = extract_features(snapshot.coins)
+        self.model = fit_isolation_forest(features, ANOMALY_CONTAMINATION)
+        self.scores = self.model.score_samples(features)
+        self.labels = self.model.predict(features)
+
+    def score(
+        self, coins: Sequence[Mapping[str, Any]]
+    ) -> Tuple[List[int], List[float]]:
+        """
+        Label and score coins against the market.
+
+        Args:
+            coins (Sequence[Mapping[str, Any]]): Coins with name and symbol, plus
+                the market fields used for coins not in the snapshot.
+
+        Returns:
+            Tuple[List[int], List[float]]: Labels (-1 for outliers, 1 for inliers)
+            and anomaly scores (lower is more anomalous), in the order given.
+        """
+        labels, scores, missing = [], [], []
+        for i, coin in enumerate(coins):
+            index = self._engine.lookup(coin.get("name") or "", coin.get("symbol"))
+            if index < len(self.scores):
+                labels.append(int(self.labels[index]))
+                scores.append(float(self.scores[index]))
+            else:
+                labels.append(1)
+                scores.append(0.0)
+                missing.append(i)
+
+        if missing:
+            features = extract_features([coins[i] for i in missing])
+            for i, label, score in zip(
+                missing,
+                self.model.predict(features).tolist(),
+                self.model.score_samples(features).tolist(),
+            ):
+                labels[i] = label
+                scores[i] = score
+        return labels, scores
+
+
+_model: Optional[AnomalyModel] = None
+_fit_lock = threading.Lock()  # Held by the single in-flight fit
+_fit_metrics = {"fits": 0, "failures": 0, "last_duration": None, "last_fit_at": None}
+
+
+def refresh_anomaly_model(
+    snapshot: Optional[MarketSnapshot] = None,
+) -> Optional[AnomalyModel]:
+    """
+    Fit the anomaly model on the current market snapshot if it changed.
+
+    Only one fit runs at a time; concurrent callers wait for it and share
+    its result.
+
+    Args:
+        snapshot (Optional[MarketSnapshot]): Snapshot to fit on, defaults to the current one.
+
+    Returns:
+        Optional[AnomalyModel]: The current model, or None if there is no market data.
+    """
+    global _model
+    snapshot = snapshot or get_market_snapshot()
+    with _fit_lock:
+        if not snapshot.coins or (_model and _model.version >= snapshot.version):
+            return _model
+
+        started = time.monotonic()
+        try:
+            _model = AnomalyModel(snapshot)
+            _fit_metrics["fits"] += 1
+            _fit_metrics["last_fit_at"] = datetime.now().isoformat()
+            logger.info(
+                f"Fitted anomaly model on {len(snapshot.coins)} coins "
+                f"(market snapshot v{snapshot.version})."
+            )
+        except Exception as e:
+            _fit_metrics["failures"] += 1
+            logger.error(f"Error fitting anomaly model: {e}")
+        finally:
+            _fit_metrics["last_duration"] = round(time.monotonic() - started, 3)
+        return _model
+
+
+def refresh_anomaly_model_in_background(snapshot: MarketSnapshot) -> None:
+    """Start a model fit on a background thread unless one is already running."""
+    if _fit_lock.locked():
+        return
+    threading.Thread(
+        target=refresh_anomaly_model, args=(snapshot,), name="anomaly-fit", daemon=True
+    ).start()
+
+
+def get_anomaly_model(snapshot: MarketSnapshot) -> Optional[AnomalyModel]:
+    """
+    Return the anomaly model for a snapshot without fitting on the request path.
+
+    A model fitted on an older snapshot is served while a background fit
+    catches up; only a cold start with no model at all fits in the caller.
+
+    Args:
+        snapshot (MarketSnapshot): The market snapshot the caller is using.
+
+    Returns:
+        Optional[AnomalyModel]: The model, or None if there is no market data.
+    """
+    model = _model
+    if model is None:
+        return refresh_anomaly_model(snapshot)
+    if model.version < snapshot.version:
+        refresh_anomaly_model_in_background(snapshot)
+    return model
+
+
+def score_coins(
+    coins: Sequence[Mapping[str, Any]], snapshot: MarketSnapshot
+) -> Tuple[List[int], List[float]]:
+    """
+    Label and score coins with the cached anomaly model.
+
+    Args:
+        coins (Sequence[Mapping[str, Any]]): Coins to score.
+        snapshot (MarketSnapshot): The market snapshot the caller is using.
+
+    Returns:
+        Tuple[List[int], List[float]]: Labels (-1 for outliers, 1 for inliers)
+        and anomaly scores, or all inliers scored 0 if no model is available.
+    """
+    model = get_anomaly_model(snapshot)
+    if model is None:
+        return [1] * len(coins), [0.0] * len(coins)
+    return model.score(coins)
+
+
+def get_anomaly_metrics() -> Dict[str, Any]:
+    """Return model fit counters along with the fitted snapshot version."""
+    model = _model
+    return {
+        **_fit_metrics,
+        "in_flight": _fit_lock.locked(),
+        "model_version": model.version if model else 0,
+        "outliers": int(np.sum(model.labels == -1)) if model else 0,
+    }
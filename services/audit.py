@@ -0,0 +1,287 @@
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+from dateutil.parser import parse
+from models.db_connection import get_db_connection
+from utils.logger import logger
+from utils.pagination import decode_cursor, encode_cursor
+
+
+AUDIT_PAGE_SIZE = 50
+AUDIT_MAX_PAGE_SIZE = 500
+AUDIT_EXPORT_CHUNK = 1000  # Rows per keyset query while streaming an export
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", 90))  # Kept in audit_log
+AUDIT_ARCHIVE_RETENTION_DAYS = int(os.getenv("AUDIT_ARCHIVE_RETENTION_DAYS", 730))
+AUDIT_ARCHIVE_BATCH_SIZE = 5000  # Rows moved per transaction
+ARCHIVE_TABLE_PREFIX = "audit_log_archive_"  # Followed by YYYY_MM
+
+AUDIT_COLUMNS = (
+    "id",
+    "event_type",
+    "username",
+    "ip_address",
+    "user_agent",
+    "status",
+    "error_message",
+    "created_at",
+)
+AUDIT_EQUALITY_FILTERS = ("event_type", "status", "username", "ip_address")
+
+CREATE_ARCHIVE_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY,
+        event_type TEXT NOT NULL,
+        username TEXT,
+        ip_address TEXT,
+        user_agent TEXT,
+        status TEXT NOT NULL,
+        error_message TEXT,
+        created_at DATETIME
+    )
+"""
+
+
+def to_audit_timestamp(value: str) -> str:
+    """
+    Normalize a date or datetime to the audit log's UTC "YYYY-MM-DD HH:MM:SS" format.
+
+    Raises:
+        ValueError: If the value cannot be parsed.
+    """
+    try:
+        moment = parse(value)
+    except (ValueError, OverflowError):
+        raise ValueError(f"Invalid timestamp: {value}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def build_audit_filters(args: Mapping[str, str]) -> Tuple[List[str], List[Any]]:
+    """
+    Turn request arguments into SQL conditions on the audit log.
+
+    Supports equality on event_type, status, username and ip_address, and a
+    time range on created_at: `since` (inclusive) and `until` (exclusive).
+
+    Args:
+        args (Mapping[str, str]): Request arguments; empty values are ignored.
+
+    Returns:
+        Tuple[List[str], List[Any]]: Conditions to AND together, and their parameters.
+
+    Raises:
+        ValueError: If `since` or `until` is not a valid timestamp.
+    """
+    conditions, params = [], []
+    for column in AUDIT_EQUALITY_FILTERS:
+        if args.get(column):
+            conditions.append(f"{column} = ?")
+            params.append(args[column])
+    if args.get("since"):
+        conditions.append("created_at >= ?")
+        params.append(to_audit_timestamp(args["since"]))
+    if args.get("until"):
+        conditions.append("created_at < ?")
+        params.append(to_audit_timestamp(args["until"]))
+    return conditions, params
+
+
+def _fetch_audit_rows(
+    conn,
+    conditions: List[str],
+    params: List[Any],
+    limit: int,
+    position: Optional[Tuple[str, int]] = None,
+) -> List[sqlite3.Row]:
+    conditions = list(conditions)
+    params = list(params)
+    if position is not None:
+        conditions.append("(created_at, id) < (?, ?)")
+        params.extend(position)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+        SELECT {', '.join(AUDIT_COLUMNS)}
+        FROM audit_log
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """
+    return conn.execute(query, (*params, limit)).fetchall()
+
+
+def get_audit_page(
+    conditions: List[str],
+    params: List[Any],
+    limit: int = AUDIT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> Tuple[List[sqlite3.Row], Optional[str]]:
+    """
+    Return one page of audit events, newest first.
+
+    Pages are keyset-paginated on (created_at, id), so each page is an index
+    range scan however deep the admin pages.
+
+    Args:
+        conditions (List[str]): Conditions from `build_audit_filters`.
+        params (List[Any]): Their parameters.
+        limit (int): Page size, clamped to 1..AUDIT_MAX_PAGE_SIZE.
+        cursor (Optional[str]): The `next_cursor` of the previous page.
+
+    Returns:
+        Tuple[List[sqlite3.Row], Optional[str]]: The events, and the cursor of the
+        next page or None if this is the last one.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    limit = min(max(limit, 1), AUDIT_MAX_PAGE_SIZE)
+    position = decode_cursor(cursor) if cursor else None
+
+    # Fetch one extra row to know whether another page follows
+    with get_db_connection() as conn:
+        rows = _fetch_audit_rows(conn, conditions, params, limit + 1, position)
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+
+def iter_audit_rows(
+    conditions: List[str], params: List[Any], chunk_size: int = AUDIT_EXPORT_CHUNK
+) -> Iterator[sqlite3.Row]:
+    """
+    Yield every matching audit event, newest first, for streaming exports.
+
+    Rows are read in keyset chunks, each on a short-lived connection, so an
+    export never holds a connection or read transaction while the client
+    is downloading.
+
+    Args:
+        conditions (List[str]): Conditions from `build_audit_filters`.
+        params (List[Any]): Their parameters.
+        chunk_size (int): Rows per query.
+
+    Yields:
+        sqlite3.Row: Audit events.
+    """
+    position = None
+    while True:
+        with get_db_connection() as conn:
+            rows = _fetch_audit_rows(conn, conditions, params, chunk_size, position)
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        position = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+def audit_row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    """Return an audit event as a plain dict, in AUDIT_COLUMNS order."""
+    return {column: row[column] for column in AUDIT_COLUMNS}
+
+
+def audit_row_to_json(row: sqlite3.Row) -> str:
+    """Return an audit event as one line of NDJSON."""
+    return json.dumps(audit_row_to_dict(row)) + "\n"
+
+
+def archive_table_name(created_at: str) -> str:
+    """Return the monthly archive table for an audit timestamp."""
+    year, month = created_at[:4], created_at[5:7]
+    if not (year + month).isdigit():
+        # Table names are built from the data, never let anything else through
+        year, month = "0000", "00"
+    return f"{ARCHIVE_TABLE_PREFIX}{year}_{month}"
+
+
+def archive_audit_log(now: Optional[datetime] = None) -> int:
+    """
+    Move audit events past retention into monthly archive tables.
+
+    Events older than AUDIT_RETENTION_DAYS are moved, AUDIT_ARCHIVE_BATCH_SIZE
+    at a time so writers are never locked out for long, into
+    audit_log_archive_YYYY_MM tables. Archive tables whose whole month is
+    older than AUDIT_ARCHIVE_RETENTION_DAYS are dropped.
+
+    Args:
+        now (Optional[datetime]): Current UTC time, defaults to now.
+
+    Returns:
+        int: The number of events archived.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = now - timedelta(days=AUDIT_RETENTION_DAYS)
+    cutoff = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+    archived = 0
+
+    try:
+        while True:
+            with get_db_connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, created_at FROM audit_log "
+                    "WHERE created_at < ? ORDER BY created_at LIMIT ?",
+                    (cutoff, AUDIT_ARCHIVE_BATCH_SIZE),
+                ).fetchall()
+                if not rows:
+                    break
+
+                partitions = defaultdict(list)
+                for row in rows:
+                    partitions[archive_table_name(row["created_at"])].append(row["id"])
+                for table, ids in partitions.items():
+                    conn.execute(CREATE_ARCHIVE_TABLE_QUERY.format(table=table))
+                    conn.execute(
+                        f"INSERT OR REPLACE INTO {table} "
+                        f"SELECT {', '.join(AUDIT_COLUMNS)} FROM audit_log "
+                        "WHERE id IN (SELECT value FROM json_each(?))",
+                        (json.dumps(ids),),
+                    )
+                conn.execute(
+                    "DELETE FROM audit_log WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps([row["id"] for row in rows]),),
+                )
+            archived += len(rows)
+
+        dropped = drop_expired_archives(now)
+    except sqlite3.Error as e:
+        logger.error(f"Error archiving audit log: {e}")
+        return archived
+
+    if archived or dropped:
+        logger.info(
+            f"Archived {archived} audit events and dropped {dropped} archive tables."
+        )
+    return archived
+
+
+def drop_expired_archives(now: datetime) -> int:
+    """
+    Drop archive tables whose whole month is past AUDIT_ARCHIVE_RETENTION_DAYS.
+
+    Args:
+        now (datetime): Current UTC time.
+
+    Returns:
+        int: The number of tables dropped.
+    """
+    # Tables named for a month before this one only hold expired events
+    expired_before = archive_table_name(
+        (now - timedelta(days=AUDIT_ARCHIVE_RETENTION_DAYS)).strftime("%Y-%m-%d")
+    )
+    with get_db_connection() as conn:
+        tables = [
+            row["name"]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?",
+                (f"{ARCHIVE_TABLE_PREFIX}%",),
+            )
+            if row["name"].startswith(ARCHIVE_TABLE_PREFIX)
+            and row["name"] < expired_before
+        ]
+        for table in tables:
+            conn.execute(f"DROP TABLE {table}")
+    return len(tables)
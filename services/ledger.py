@@ -0,0 +1,276 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from models.db_connection import get_db_connection
+from utils.logger import logger
+
+
+TRANSACTION_COLUMNS = "id, user_id, name, abbreviation, transaction_date, amount, price"
+
+UPSERT_POSITION_QUERY = """
+    INSERT INTO ledger_positions (
+        user_id, name, abbreviation, quantity, cost_basis, total_invested,
+        realized_pnl, last_transaction_date
+    )
+    VALUES (:user_id, :name, :abbreviation, :quantity, :cost_basis, :total_invested,
+        :realized_pnl, :last_transaction_date)
+    ON CONFLICT(user_id, name) DO UPDATE SET
+        abbreviation = excluded.abbreviation,
+        quantity = excluded.quantity,
+        cost_basis = excluded.cost_basis,
+        total_invested = excluded.total_invested,
+        realized_pnl = excluded.realized_pnl,
+        last_transaction_date = excluded.last_transaction_date
+"""
+INSERT_LOT_QUERY = """
+    INSERT INTO ledger_lots (user_id, name, transaction_id, acquired, amount, cost)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+UPSERT_STATE_QUERY = """
+    INSERT INTO ledger_state (user_id, last_transaction_id) VALUES (?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET last_transaction_id = excluded.last_transaction_id
+"""
+
+# Quantities below this are rounding noise from fully sold lots
+DUST = 1e-12
+
+
+def empty_position(user_id: int, name: str, abbreviation: str) -> Dict[str, Any]:
+    """Return a ledger position for an asset with no transactions applied."""
+    return {
+        "user_id": user_id,
+        "name": name,
+        "abbreviation": abbreviation,
+        "quantity": 0.0,
+        "cost_basis": 0.0,
+        "total_invested": 0.0,
+        "realized_pnl": 0.0,
+        "last_transaction_date": "",
+    }
+
+
+def apply_transaction(
+    position: Dict[str, Any], lots: List[Dict[str, Any]], transaction
+) -> None:
+    """
+    Apply one transaction to a position and its open FIFO lots, in place.
+
+    A positive amount is a buy that opens a lot costing `price`. A negative
+    amount is a sell for `price` that closes the oldest lots first and books
+    the difference between proceeds and their cost as realized P&L.
+
+    Args:
+        position (Dict[str, Any]): Position row for the transaction's asset.
+        lots (List[Dict[str, Any]]): Open lots of the asset, oldest first.
+        transaction: Transaction row with id, transaction_date, amount and price.
+    """
+    amount = transaction["amount"]
+    price = abs(transaction["price"])
+    position["abbreviation"] = transaction["abbreviation"]
+    position["last_transaction_date"] = max(
+        position["last_transaction_date"], transaction["transaction_date"]
+    )
+
+    if amount >= 0:
+        lots.append(
+            {
+                "transaction_id": transaction["id"],
+                "acquired": transaction["transaction_date"],
+                "amount": amount,
+                "cost": price,
+            }
+        )
+        position["quantity"] += amount
+        position["cost_basis"] += price
+        position["total_invested"] += price
+        return
+
+    remaining = -amount
+    cost_sold = 0.0
+    while remaining > DUST and lots:
+        lot = lots[0]
+        taken = min(lot["amount"], remaining)
+        cost = lot["cost"] * taken / lot["amount"] if lot["amount"] else 0.0
+        lot["amount"] -= taken
+        lot["cost"] -= cost
+        remaining -= taken
+        cost_sold += cost
+        if lot["amount"] <= DUST:
+            lots.pop(0)
+
+    # Units sold beyond what the ledger holds have no known cost
+    position["quantity"] = max(position["quantity"] + amount, 0.0)
+    position["cost_basis"] = max(position["cost_basis"] - cost_sold, 0.0)
+    position["realized_pnl"] += price - cost_sold
+
+
+def apply_new_transactions(cursor, user_id: Optional[int]) -> Tuple[int, int, int]:
+    """
+    Apply transactions past each user's watermark, inside the caller's transaction.
+
+    Args:
+        cursor: SQLite cursor whose connection holds the write lock.
+        user_id (Optional[int]): Update only this user's ledger; all users if None.
+
+    Returns:
+        Tuple[int, int, int]: Transactions applied, users updated and assets replayed.
+    """
+    query = f"""
+        SELECT {TRANSACTION_COLUMNS} FROM transactions t
+        WHERE t.id > COALESCE(
+            (SELECT last_transaction_id FROM ledger_state s WHERE s.user_id = t.user_id), 0
+        )
+    """
+    params = ()
+    if user_id is not None:
+        query += " AND t.user_id = ?"
+        params = (user_id,)
+    cursor.execute(query + " ORDER BY t.transaction_date, t.id", params)
+    new_transactions = cursor.fetchall()
+    if not new_transactions:
+        return 0, 0, 0
+
+    by_asset = defaultdict(list)
+    watermarks: Dict[int, int] = {}
+    for transaction in new_transactions:
+        owner = transaction["user_id"]
+        by_asset[(owner, transaction["name"])].append(transaction)
+        watermarks[owner] = max(watermarks.get(owner, 0), transaction["id"])
+
+    replayed = 0
+    for (owner, name), transactions in by_asset.items():
+        cursor.execute(
+            "SELECT * FROM ledger_positions WHERE user_id = ? AND name = ?",
+            (owner, name),
+        )
+        row = cursor.fetchone()
+        position = (
+            dict(row)
+            if row
+            else empty_position(owner, name, transactions[0]["abbreviation"])
+        )
+
+        backdated = (
+            transactions[0]["transaction_date"] < position["last_transaction_date"]
+        )
+        if backdated:
+            replayed += 1
+            position = empty_position(owner, name, transactions[0]["abbreviation"])
+            cursor.execute(
+                f"""
+                SELECT {TRANSACTION_COLUMNS} FROM transactions
+                WHERE user_id = ? AND name = ?
+                ORDER BY transaction_date, id
+                """,
+                (owner, name),
+            )
+            transactions = cursor.fetchall()
+
+        # Buys only append lots; existing lots are loaded only for sells
+        load_lots = not backdated and any(t["amount"] < 0 for t in transactions)
+        rewrite_lots = backdated or load_lots
+        lots = []
+        if load_lots:
+            cursor.execute(
+                """
+                SELECT transaction_id, acquired, amount, cost FROM ledger_lots
+                WHERE user_id = ? AND name = ?
+                ORDER BY acquired, id
+                """,
+                (owner, name),
+            )
+            lots = [dict(lot) for lot in cursor.fetchall()]
+
+        for transaction in transactions:
+            apply_transaction(position, lots, transaction)
+
+        if rewrite_lots:
+            cursor.execute(
+                "DELETE FROM ledger_lots WHERE user_id = ? AND name = ?",
+                (owner, name),
+            )
+        cursor.executemany(
+            INSERT_LOT_QUERY,
+            [
+                (
+                    owner,
+                    name,
+                    lot["transaction_id"],
+                    lot["acquired"],
+                    lot["amount"],
+                    lot["cost"],
+                )
+                for lot in lots
+            ],
+        )
+        cursor.execute(UPSERT_POSITION_QUERY, position)
+
+    cursor.executemany(UPSERT_STATE_QUERY, list(watermarks.items()))
+
+    return len(new_transactions), len(watermarks), replayed
+
+
+def update_ledger(user_id: Optional[int] = None) -> int:
+    """
+    Fold transactions added since the last update into the ledger.
+
+    Each user's ledger remembers the highest transaction id it has applied,
+    so only new transactions are read. Assets whose new transactions are all
+    dated on or after their latest applied transaction are updated in place;
+    a backdated transaction changes the FIFO order, so that asset alone is
+    replayed from its full history.
+
+    Args:
+        user_id (Optional[int]): Update only this user's ledger; all users if None.
+
+    Returns:
+        int: Number of transactions applied.
+    """
+    with get_db_connection() as conn:
+        # Take the write lock before reading the watermarks, so that concurrent
+        # runs (CSV imports, workers starting up) never apply the same rows twice.
+        # A caller's open transaction has already written, so it holds the lock.
+        owns_transaction = not conn.in_transaction
+        if owns_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            applied, users, replayed = apply_new_transactions(conn.cursor(), user_id)
+            if owns_transaction:
+                conn.commit()
+        except Exception:
+            if owns_transaction:
+                conn.rollback()
+            raise
+
+    if not applied:
+        return 0
+    logger.info(
+        f"Ledger updated with {applied} transactions for "
+        f"{users} users ({replayed} assets replayed)."
+    )
+    return applied
+
+
+def get_ledger_positions(user_id: int) -> List[Dict[str, Any]]:
+    """
+    Return a user's ledger positions, one row per asset.
+
+    Reads the materialized ledger, never the transactions themselves.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        List[Dict[str, Any]]: Positions with name, abbreviation, quantity,
+        cost_basis, total_invested and realized_pnl.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT name, abbreviation, quantity, cost_basis, total_invested, realized_pnl
+            FROM ledger_positions WHERE user_id = ?
+            ORDER BY name
+            """,
+            (user_id,),
+        )
+        return [dict(row) for row in cursor.fetchall()]
@@ -0,0 +1,102 @@
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from services.valuation import get_valuation_engine
+from utils.coingecko import MarketSnapshot
+
+
+class MarketMovers:
+    """
+    Coins of one market snapshot ranked by 24h price change.
+
+    The ranking is computed once per snapshot, so a user's gainers and
+    losers are found by looking up their coins' ranks: O(owned coins), with
+    no API calls.
+    """
+
+    def __init__(self, snapshot: MarketSnapshot):
+        self.version = snapshot.version
+        self._coins = snapshot.coins
+        self._engine = get_valuation_engine(snapshot)
+        # Coins without a 24h change are left unranked
+        ranked = sorted(
+            (
+                i
+                for i, coin in enumerate(snapshot.coins)
+                if coin["price_change_percentage_24h"] is not None
+            ),
+            key=lambda i: snapshot.coins[i]["price_change_percentage_24h"],
+            reverse=True,
+        )
+        self._rank: Dict[int, int] = {index: rank for rank, index in enumerate(ranked)}
+
+    def gainers_and_losers(
+        self, owned_coins: Iterable[str]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Return the top gainers and losers among the given coins.
+
+        Up to three of each are returned, fewer when only a few coins are
+        ranked, so that gainers and losers overlap as little as possible.
+
+        Args:
+            owned_coins (Iterable[str]): Lowercased names of the coins owned.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: Gainers (best first)
+            and losers (worst first), as copies of the snapshot rows.
+        """
+        indexes = {self._engine.lookup(name, None) for name in owned_coins}
+        ranked = sorted(
+            (self._rank[index], index) for index in indexes if index in self._rank
+        )
+        if len(ranked) < 4:
+            count = 1
+        elif len(ranked) < 6:
+            count = 2
+        else:
+            count = 3
+
+        gainers = [dict(self._coins[index]) for _, index in ranked[:count]]
+        losers = [dict(self._coins[index]) for _, index in ranked[::-1][:count]]
+        return gainers, losers
+
+
+_movers: Optional[MarketMovers] = None
+_movers_lock = threading.Lock()
+
+
+def get_market_movers(snapshot: MarketSnapshot) -> MarketMovers:
+    """
+    Return the 24h change ranking for `snapshot`, building it once per snapshot version.
+
+    Args:
+        snapshot (MarketSnapshot): The market snapshot to rank.
+
+    Returns:
+        MarketMovers: Ranking for the snapshot.
+    """
+    global _movers
+    movers = _movers
+    if movers is not None and movers.version == snapshot.version:
+        return movers
+
+    with _movers_lock:
+        if _movers is None or _movers.version != snapshot.version:
+            _movers = MarketMovers(snapshot)
+        return _movers
+
+
+def get_gainers_and_losers(
+    owned_coins: Iterable[str], snapshot: MarketSnapshot
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Return the top gainers and losers among a user's coins.
+
+    Args:
+        owned_coins (Iterable[str]): Lowercased names of the coins owned.
+        snapshot (MarketSnapshot): The market snapshot to rank against.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: Gainers and losers.
+    """
+    return get_market_movers(snapshot).gainers_and_losers(owned_coins)
@@ -0,0 +1,107 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from math import ceil
+from typing import Any, Dict, Tuple
+from flask import render_template
+from markupsafe import Markup
+from services.search import search_market
+from utils.coingecko import MarketSnapshot
+
+
+MARKET_PAGE_CACHE_SIZE = 256  # Rendered pages kept per market snapshot
+MARKET_MAX_PER_PAGE = 1000
+
+
+@dataclass(frozen=True)
+class MarketPage:
+    """A rendered page of the market table."""
+
+    html: Markup
+    page: int
+    total_pages: int
+
+
+# (page, per_page, search) -> MarketPage, for the snapshot version below
+_pages: "OrderedDict[Tuple[int, int, str], MarketPage]" = OrderedDict()
+_pages_version = 0
+_pages_lock = threading.Lock()
+_page_metrics = {"hits": 0, "misses": 0}
+
+
+def render_market_page(
+    snapshot: MarketSnapshot, page: int, per_page: int, search: str
+) -> MarketPage:
+    """
+    Render one page of the market table, with its pagination links.
+
+    Args:
+        snapshot (MarketSnapshot): The market snapshot to render.
+        page (int): 1-based page number.
+        per_page (int): Coins per page.
+        search (str): Lowercased search text, or "" for the whole market.
+
+    Returns:
+        MarketPage: The rendered page.
+    """
+    rows = search_market(snapshot, search) if search else snapshot.rows
+    total_pages = ceil(len(rows) / per_page)
+    start = (page - 1) * per_page
+    html = render_template(
+        "market_table.html",
+        coins=rows[start : start + per_page],
+        page=page,
+        total_pages=total_pages,
+        search=search,
+    )
+    return MarketPage(html=Markup(html), page=page, total_pages=total_pages)
+
+
+def get_market_page(
+    snapshot: MarketSnapshot, page: int, per_page: int, search: str
+) -> MarketPage:
+    """
+    Return a rendered page of the market table, rendering it once per snapshot.
+
+    The cache is cleared whenever a newer snapshot is seen, and holds at most
+    MARKET_PAGE_CACHE_SIZE pages, evicting the least recently used.
+
+    Args:
+        snapshot (MarketSnapshot): The market snapshot to render.
+        page (int): 1-based page number, clamped to at least 1.
+        per_page (int): Coins per page, clamped to 1..MARKET_MAX_PER_PAGE.
+        search (str): Search text.
+
+    Returns:
+        MarketPage: The rendered page.
+    """
+    global _pages_version
+    page = max(page, 1)
+    per_page = min(max(per_page, 1), MARKET_MAX_PER_PAGE)
+    search = search.strip().lower()
+    key = (page, per_page, search)
+
+    with _pages_lock:
+        if _pages_version == snapshot.version and key in _pages:
+            _pages.move_to_end(key)
+            _page_metrics["hits"] += 1
+            return _pages[key]
+        _page_metrics["misses"] += 1
+
+    market_page = render_market_page(snapshot, page, per_page, search)
+
+    with _pages_lock:
+        if snapshot.version > _pages_version:
+            _pages.clear()
+            _pages_version = snapshot.version
+        if snapshot.version == _pages_version:
+            _pages[key] = market_page
+            while len(_pages) > MARKET_PAGE_CACHE_SIZE:
+                _pages.popitem(last=False)
+    return market_page
+
+
+def get_market_page_metrics() -> Dict[str, Any]:
+    """Return page cache hit/miss counters and the cached snapshot version."""
+    with _pages_lock:
+        return {**_page_metrics, "pages": len(_pages), "version": _pages_version}
@@ -0,0 +1,129 @@
+import queue
+import threading
+from typing import Any, Dict, Optional, Set
+from utils.logger import logger
+
+
+SUBSCRIBER_QUEUE_SIZE = 100  # Events buffered per listener before it is told to resync
+
+
+class Subscription:
+    """A single listener's queue of events for one user."""
+
+    def __init__(self, user_id: int, maxsize: int = SUBSCRIBER_QUEUE_SIZE):
+        self.user_id = user_id
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event: Dict[str, Any]) -> bool:
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next event.
+
+        Returns:
+            Optional[Dict[str, Any]]: The event, or None if none arrived within `timeout`.
+        """
+        if self.overflowed:
+            # Events were dropped, tell the client to reload its state
+            self.overflowed = False
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return {"event": "resync", "data": {}}
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class NotificationBus:
+    """
+    In-process publish/subscribe of notification events, keyed by user.
+
+    Publishing never blocks: a listener that falls behind loses its buffered
+    events and receives a single "resync" event instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._listeners = 0
+        self._stats = {"published": 0, "delivered": 0, "dropped": 0, "rejected": 0}
+
+    def subscribe(
+        self, user_id: int, max_listeners: Optional[int] = None
+    ) -> Optional[Subscription]:
+        """
+        Start listening to a user's events.
+
+        Args:
+            user_id (int): The user whose events to receive.
+            max_listeners (Optional[int]): Refuse the subscription if this many
+                listeners, across all users, are already subscribed.
+
+        Returns:
+            Optional[Subscription]: The subscription, or None if it was refused.
+        """
+        subscription = Subscription(user_id)
+        with self._lock:
+            if max_listeners is not None and self._listeners >= max_listeners:
+                self._stats["rejected"] += 1
+                return None
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._listeners += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._listeners -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id: int, event: str, data: Dict[str, Any]) -> int:
+        """
+        Send an event to every listener of a user.
+
+        Args:
+            user_id (int): The user the event belongs to.
+            event (str): Event name, e.g. "notification" or "unread-count".
+            data (Dict[str, Any]): JSON-serializable event payload.
+
+        Returns:
+            int: The number of listeners the event was delivered to.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self._stats["published"] += 1
+
+        delivered = sum(
+            subscription.put({"event": event, "data": data})
+            for subscription in subscribers
+        )
+        dropped = len(subscribers) - delivered
+        if dropped:
+            logger.warning(f"Dropped '{event}' event for {dropped} slow listeners.")
+        with self._lock:
+            self._stats["delivered"] += delivered
+            self._stats["dropped"] += dropped
+        return delivered
+
+    def stats(self) -> Dict[str, int]:
+        """Return listener and event counters for monitoring."""
+        with self._lock:
+            return {
+                "users": len(self._subscribers),
+                "listeners": self._listeners,
+                **self._stats,
+            }
+
+
+notification_bus = NotificationBus()
@@ -1,4 +1,5 @@
 from models.database import get_db_connection
+from services.notification_bus import notification_bus
 import sqlite3
 from utils.logger import logger
 from typing import Dict, Any
@@ -23,7 +24,8 @@ def send_notification(alert: Dict[str, Any], current_price: float) -> None:
 
 def save_notification(alert: Dict[str, Any], current_price: float) -> None:
     """
-    Save a notification in the database if the price conditions match the alert.
+    Save a notification in the database if the price conditions match the alert,
+    and publish it to the user's open notification streams.
 
     Args:
         alert (Dict[str, Any]): The alert details including 'id', 'user_id', 'name', 'threshold', 'alert_type'.
@@ -65,17 +67,34 @@ def save_notification(alert: Dict[str, Any], current_price: float) -> None:
             # Insert a new notification
             query = """
             INSERT INTO notifications (alert_id, user_id, notification_text, current_price)
-            VALUES (?, ?, ?, ?);
+            VALUES (?, ?, ?, ?)
+            RETURNING id, created_at;
             """
             values = (alert["id"], user_id, notification_text, current_price)
 
             try:
                 cursor.execute(query, values)
-                notification_id = cursor.lastrowid
+                notification_id, created_at = cursor.fetchone()
                 conn.commit()
                 logger.info(f"Notification saved with ID {notification_id}")
             except sqlite3.Error as e:
                 logger.error(f"Error saving notification: {e}")
+                return
+
+        # Push to open notification streams once the row is committed
+        notification_bus.publish(
+            user_id,
+            "notification",
+            {
+                "id": notification_id,
+                "user_id": user_id,
+                "alert_id": alert["id"],
+                "notification_text": notification_text,
+                "current_price": current_price,
+                "is_read": False,
+                "created_at": created_at,
+            },
+        )
 
     except sqlite3.Error as e:
         logger.error(f"Database connection error: {e}")
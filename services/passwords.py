@@ -0,0 +1,204 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+from werkzeug.security import check_password_hash, generate_password_hash
+from utils.logger import logger
+
+
+# Werkzeug method, e.g. "scrypt", "scrypt:65536:8:1" or "pbkdf2:sha256:1000000".
+# Changing it rehashes each user's password on their next successful login.
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", 16))
+# Worker processes per app process; 0 hashes on the calling thread
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+# Hashes queued before further callers wait for a slot
+PASSWORD_HASH_MAX_PENDING = PASSWORD_HASH_WORKERS * 8
+PASSWORD_HASH_TIMEOUT = 30.0  # Seconds a caller waits for a slot and its result
+# Workers are spawned, not forked: a fork of a multithreaded gunicorn worker copies
+# locks held by other threads (logging, the connection pool) into the child
+PASSWORD_HASH_START_METHOD = "spawn"
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords in a bounded pool of worker processes.
+
+    Key derivation is CPU-bound and would otherwise hold the GIL of the
+    request threads; in worker processes it runs in parallel with them. At
+    most `max_pending` hashes are queued or running, further callers wait
+    for a slot. A hash whose caller timed out keeps its slot until it ends.
+    If the pool breaks, it is shut down and hashing falls back to the
+    calling thread until a new pool is started.
+    """
+
+    def __init__(
+        self,
+        method: str = PASSWORD_HASH_METHOD,
+        salt_length: int = PASSWORD_SALT_LENGTH,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+    ):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.max_pending = max(max_pending, 1)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._method_prefix: Optional[str] = None
+        self._stats = {"hashed": 0, "verified": 0, "rehashed": 0, "inline": 0}
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            # Worker processes are not inherited by forks (e.g. gunicorn workers)
+            if self._executor is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(PASSWORD_HASH_START_METHOD),
+                )
+            return self._executor
+
+    def start(self) -> None:
+        """Start the worker processes now rather than on the first hash."""
+        executor = self._get_executor()
+        if executor is not None:
+            executor.submit(int).result()
+
+    def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        executor = self._get_executor()
+        if executor is None:
+            return func(*args)
+
+        if not self._slots.acquire(timeout=PASSWORD_HASH_TIMEOUT):
+            raise TimeoutError("Password hashing is overloaded, try again later.")
+        try:
+            try:
+                future: Future = executor.submit(func, *args)
+            except BaseException:
+                self._slots.release()
+                raise
+            # The slot is held until the work is done, even if the caller gives up
+            future.add_done_callback(lambda _: self._slots.release())
+            try:
+                return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+            except TimeoutError:
+                future.cancel()  # Only succeeds if no worker has picked it up yet
+                raise
+        except BrokenProcessPool as e:
+            logger.error(f"Password hashing pool broke, hashing inline: {e}")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+                self._stats["inline"] += 1
+            executor.shutdown(wait=False, cancel_futures=True)
+            return func(*args)
+
+    def hash(self, password: str) -> str:
+        """
+        Hash a password with the configured method.
+
+        Args:
+            password (str): The plaintext password.
+
+        Returns:
+            str: The Werkzeug password hash.
+        """
+        password_hash = self._run(
+            generate_password_hash, password, self.method, self.salt_length
+        )
+        with self._lock:
+            self._stats["hashed"] += 1
+        return password_hash
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """
+        Check a password against a hash produced by any supported method.
+
+        Args:
+            password_hash (str): The stored Werkzeug password hash.
+            password (str): The plaintext password to check.
+
+        Returns:
+            bool: True if the password matches.
+        """
+        matches = self._run(check_password_hash, password_hash, password)
+        with self._lock:
+            self._stats["verified"] += 1
+        return matches
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Return whether a hash was made with other than the current parameters."""
+        if self._method_prefix is None:
+            # Expand shorthands like "scrypt" into the full parameter string
+            self._method_prefix = self.hash("").split("$", 1)[0]
+        return password_hash.split("$", 1)[0] != self._method_prefix
+
+    def verify_and_update(
+        self, password_hash: str, password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password and, if it matches an outdated hash, hash it again.
+
+        Args:
+            password_hash (str): The stored Werkzeug password hash.
+            password (str): The plaintext password to check.
+
+        Returns:
+            Tuple[bool, Optional[str]]: Whether the password matches, and the
+            replacement hash to store, or None if the stored one is current.
+        """
+        if not self.verify(password_hash, password):
+            return False, None
+        if not self.needs_rehash(password_hash):
+            return True, None
+        new_hash = self.hash(password)
+        with self._lock:
+            self._stats["rehashed"] += 1
+        return True, new_hash
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hashing counters and the pool configuration."""
+        with self._lock:
+            return {
+                **self._stats,
+                "method": self.method,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+            }
+
+
+password_hasher = PasswordHasher()
+
+
+def hash_password(password: str) -> str:
+    """Hash a password in the hashing pool with the configured method."""
+    return password_hasher.hash(password)
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    """Check a password against its stored hash in the hashing pool."""
+    return password_hasher.verify(password_hash, password)
+
+
+def verify_and_update_password(
+    password_hash: str, password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Check a password, returning a new hash if the stored one uses old parameters.
+
+    Args:
+        password_hash (str): The stored Werkzeug password hash.
+        password (str): The plaintext password to check.
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether the password matches, and the
+        replacement hash to store, or None if no update is needed.
+    """
+    return password_hasher.verify_and_update(password_hash, password)
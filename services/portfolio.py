@@ -1,5 +1,18 @@
+from datetime import datetime
 from models.database import get_db_connection
-import sqlite3
+from services.ledger import get_ledger_positions
+from services.portfolio_history import record_portfolio_points
+from services.search import get_portfolio_search_index
+from services.valuation import get_valuation_engine
+from utils.coingecko import get_market_snapshot
+from utils.logger import logger
+
+
+UPSERT_PORTFOLIO_DAILY_QUERY = """
+    INSERT INTO portfolio_daily (user_id, date, portfolio_value)
+    VALUES (?, ?, ?)
+    ON CONFLICT(user_id, date) DO UPDATE SET portfolio_value = excluded.portfolio_value
+"""
 
 
 # Fetch portfolio from SQLite
@@ -23,78 +36,117 @@ def read_portfolio(user_id):
     return portfolio
 
 
-def calculate_portfolio_value(portfolio, top_1000):
+def calculate_portfolio_value(portfolio, snapshot):
     """
     Calculate the total value of a user's portfolio based on current crypto prices.
 
+    Each asset is annotated with its current price, value, rank, image and
+    allocation percentage.
+
     Args:
         portfolio (list): The user's portfolio (list of assets).
-        top_1000 (list): A list of the top 1000 cryptocurrencies.
+        snapshot (MarketSnapshot): The market snapshot to price against.
 
     Returns:
         float: The total value of the portfolio.
     """
-    # Build a lookup dictionary for fast access by both name and symbol
-    price_lookup = {
-        crypto["name"].lower(): {
-            "price": crypto["current_price"],
-            "rank": crypto["market_cap_rank"],
-            "image": crypto["image"],
-        }
-        for crypto in top_1000
+    return get_valuation_engine(snapshot).value_portfolio(portfolio)
+
+
+def calculate_ledger_pnl(user_id, snapshot):
+    """
+    Price a user's cost-basis ledger and compute realized and unrealized P&L.
+
+    Args:
+        user_id (int): The ID of the user.
+        snapshot (MarketSnapshot): The market snapshot to price against.
+
+    Returns:
+        dict: `positions`, each annotated with current_price, average_cost,
+        market_value and unrealized_pnl, and `totals` summed over positions
+        plus the overall ROI percentage.
+    """
+    positions = get_ledger_positions(user_id)
+    engine = get_valuation_engine(snapshot)
+    totals = {
+        "total_invested": 0.0,
+        "cost_basis": 0.0,
+        "market_value": 0.0,
+        "realized_pnl": 0.0,
+        "unrealized_pnl": 0.0,
     }
-    price_lookup.update(
-        {
-            crypto["symbol"].upper(): {
-                "price": crypto["current_price"],
-                "rank": crypto["market_cap_rank"],
-                "image": crypto["image"],
-            }
-            for crypto in top_1000
-        }
+    for position in positions:
+        index = engine.lookup(position["name"], position["abbreviation"])
+        price = float(engine.prices[index])
+        market_value = position["quantity"] * price
+        position["current_price"] = price
+        position["average_cost"] = (
+            position["cost_basis"] / position["quantity"] if position["quantity"] else 0
+        )
+        position["market_value"] = round(market_value, 2)
+        position["unrealized_pnl"] = round(market_value - position["cost_basis"], 2)
+        for key in totals:
+            totals[key] += position[key]
+
+    totals = {key: round(value, 2) for key, value in totals.items()}
+    invested = totals["total_invested"]
+    totals["roi"] = (
+        (totals["realized_pnl"] + totals["unrealized_pnl"]) / invested * 100
+        if invested > 0
+        else 0
     )
+    return {"positions": positions, "totals": totals}
 
-    total_value = 0.0
-    for asset in portfolio:
-        name = asset["name"].lower()
-        symbol = asset["abbreviation"]
-        amount = asset["amount"]
 
-        # Try to look up by name first, then fallback to symbol
-        crypto_data = price_lookup.get(name) or price_lookup.get(
-            symbol, {"price": 0, "rank": None, "image": None}
-        )
+def snapshot_all_portfolios(snapshot=None):
+    """
+    Value every user's portfolio, upsert today's row in portfolio_daily and
+    append a point to the intraday history.
 
-        current_price = crypto_data["price"]
-        asset_value = amount * current_price
+    All portfolios are valued against a single market snapshot in one
+    vectorized pass and written in one transaction.
 
-        asset.update(
-            {
-                "current_price": current_price,
-                "value": round(asset_value, 2),
-                "rank": crypto_data["rank"],
-                "image": crypto_data["image"],
-            }
-        )
+    Args:
+        snapshot (MarketSnapshot, optional): Snapshot to price against, defaults to the current one.
 
-        total_value += asset_value
+    Returns:
+        int: The number of users whose portfolio value was recorded.
+    """
+    snapshot = snapshot or get_market_snapshot()
+    if not snapshot.coins:
+        logger.warning("No market data available; skipping portfolio snapshot.")
+        return 0
+
+    today_date = datetime.now().strftime("%Y-%m-%d")
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id, name, abbreviation, amount FROM portfolio")
+        values = get_valuation_engine(snapshot).value_portfolios(cursor.fetchall())
+        cursor.executemany(
+            UPSERT_PORTFOLIO_DAILY_QUERY,
+            [(user_id, today_date, value) for user_id, value in values.items()],
+        )
+        record_portfolio_points(cursor, values)
 
-    return round(total_value, 2)
+    logger.info(
+        f"Recorded {len(values)} portfolio values for {today_date} "
+        f"(market snapshot v{snapshot.version})."
+    )
+    return len(values)
 
 
-def fetch_owned_coins_from_db(user_id, db_path="crypto_portfolio.db"):
+def fetch_owned_coins_from_db(user_id):
     """
     Fetch the abbreviations of the coins in the portfolio from the database based on user_id.
 
     Args:
-        db_path (str): The path to the SQLite database.
         user_id (int): The ID of the user.
 
     Returns:
         list: List of coin abbreviations owned (e.g., ["bitcoin", "ethereum"]).
     """
-    with sqlite3.connect(db_path) as connection:
-        cursor = connection.cursor()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             "SELECT name FROM portfolio WHERE user_id = ?", (user_id,)
         )
@@ -107,21 +159,17 @@ def get_assets_by_query(query, user_id):
     Search for assets in the portfolio based on a query.
 
     Args:
-        query (str): The search query (can be part of the asset name).
+        query (str): The search query (part of the asset name or abbreviation, typos allowed).
         user_id (int): The ID of the user.
 
     Returns:
-        list: A list of assets matching the query (each asset is represented as a dictionary).
+        list: A list of assets matching the query, best matches first
+        (each asset is represented as a dictionary).
     """
-    with sqlite3.connect("crypto_portfolio.db") as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, user_id, name, amount FROM portfolio WHERE name LIKE ? AND user_id = ?",
-            ("%" + query + "%", user_id),
-        )
-        assets = cursor.fetchall()
+    index, assets = get_portfolio_search_index(user_id)
 
     # Return the results in a structured format (list of dictionaries)
     return [
-        {"id": asset[0], "asset_name": asset[2], "amount": asset[3]} for asset in assets
+        {"id": asset["id"], "asset_name": asset["name"], "amount": asset["amount"]}
+        for asset in (assets[doc] for doc in index.search(query))
     ]
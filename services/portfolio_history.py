@@ -0,0 +1,142 @@
+import time
+from typing import Any, Dict, List, Optional
+from models.database import get_db_connection
+from utils.logger import logger
+
+
+# Bucket width in seconds per resolution
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+ROLLUP_RESOLUTIONS = ("hour", "day")
+
+# How long each resolution is kept, in seconds (None keeps it forever)
+RETENTION = {"minute": 2 * 86400, "hour": 90 * 86400, "day": None}
+
+UPSERT_POINT_QUERY = """
+    INSERT INTO portfolio_points (user_id, ts, value)
+    VALUES (?, ?, ?)
+    ON CONFLICT(user_id, ts) DO UPDATE SET value = excluded.value
+"""
+UPSERT_ROLLUP_QUERY = """
+    INSERT INTO portfolio_rollups (user_id, resolution, bucket, min_value, max_value, last_value)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, resolution, bucket) DO UPDATE SET
+        min_value = MIN(min_value, excluded.min_value),
+        max_value = MAX(max_value, excluded.max_value),
+        last_value = excluded.last_value
+"""
+
+
+def bucket_start(ts: int, resolution: str) -> int:
+    """Return the start of the `resolution` bucket containing Unix time `ts`."""
+    width = RESOLUTIONS[resolution]
+    return ts - ts % width
+
+
+def record_portfolio_points(
+    cursor, values: Dict[int, float], ts: Optional[int] = None
+) -> None:
+    """
+    Store one point per user and fold it into the hourly and daily rollups.
+
+    Args:
+        cursor: SQLite cursor; the caller commits.
+        values (Dict[int, float]): Portfolio value per user_id.
+        ts (Optional[int]): Unix time of the valuation, defaults to now.
+    """
+    ts = bucket_start(int(ts if ts is not None else time.time()), "minute")
+    cursor.executemany(
+        UPSERT_POINT_QUERY,
+        [(user_id, ts, value) for user_id, value in values.items()],
+    )
+    for resolution in ROLLUP_RESOLUTIONS:
+        bucket = bucket_start(ts, resolution)
+        cursor.executemany(
+            UPSERT_ROLLUP_QUERY,
+            [
+                (user_id, resolution, bucket, value, value, value)
+                for user_id, value in values.items()
+            ],
+        )
+
+
+def pick_resolution(start: int, end: int) -> str:
+    """Choose the finest resolution that keeps a chart over [start, end] small."""
+    span = end - start
+    if span <= 86400 and start >= time.time() - RETENTION["minute"]:
+        return "minute"
+    if span <= 31 * 86400 and start >= time.time() - RETENTION["hour"]:
+        return "hour"
+    return "day"
+
+
+def get_portfolio_history(
+    user_id: int, start: int, end: int, resolution: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fetch a user's portfolio value series between two Unix times.
+
+    Minute resolution reads the raw points; hour and day read the
+    pre-aggregated rollups, so long ranges never scan raw points.
+
+    Args:
+        user_id (int): The ID of the user.
+        start (int): Range start, Unix time (inclusive).
+        end (int): Range end, Unix time (inclusive).
+        resolution (Optional[str]): "minute", "hour" or "day"; picked from the range if None.
+
+    Returns:
+        List[Dict[str, Any]]: Points with ts, min, max and last, oldest first.
+
+    Raises:
+        ValueError: If the resolution is not supported.
+    """
+    resolution = resolution or pick_resolution(start, end)
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unsupported resolution: {resolution}")
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if resolution == "minute":
+            cursor.execute(
+                """
+                SELECT ts, value, value, value FROM portfolio_points
+                WHERE user_id = ? AND ts BETWEEN ? AND ?
+                ORDER BY ts
+                """,
+                (user_id, start, end),
+            )
+        else:
+            cursor.execute(
+                """
+                SELECT bucket, min_value, max_value, last_value FROM portfolio_rollups
+                WHERE user_id = ? AND resolution = ? AND bucket BETWEEN ? AND ?
+                ORDER BY bucket
+                """,
+                (user_id, resolution, bucket_start(start, resolution), end),
+            )
+        rows = cursor.fetchall()
+
+    return [
+        {"ts": row[0], "min": row[1], "max": row[2], "last": row[3]} for row in rows
+    ]
+
+
+def apply_history_retention(now: Optional[int] = None) -> None:
+    """Delete raw points and rollups that are older than their retention period."""
+    now = int(now if now is not None else time.time())
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM portfolio_points WHERE ts < ?", (now - RETENTION["minute"],)
+        )
+        deleted = cursor.rowcount
+        for resolution in ROLLUP_RESOLUTIONS:
+            if RETENTION[resolution] is None:
+                continue
+            cursor.execute(
+                "DELETE FROM portfolio_rollups WHERE resolution = ? AND bucket < ?",
+                (resolution, now - RETENTION[resolution]),
+            )
+            deleted += cursor.rowcount
+
+    logger.info(f"Portfolio history retention removed {deleted} rows.")
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from models.db_connection import get_db_connection
+from utils.logger import logger
+
+
+# Seconds a cached principal is trusted, bounding staleness from other workers' writes
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+PRINCIPAL_CACHE_SIZE = 10000  # Users cached per process, least recently used evicted
+
+PRINCIPAL_QUERY = (
+    "SELECT user_id, is_admin, is_active, is_deleted FROM users WHERE user_id = ?"
+)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authorization-relevant state of a user."""
+
+    user_id: int
+    is_admin: bool
+    is_active: bool
+    is_deleted: bool
+
+
+class PrincipalCache:
+    """
+    TTL and LRU bounded cache of user principals, keyed by user id.
+
+    Missing users are cached too (as None), so a stale session costs one
+    query per TTL rather than one per request. Writes to the users table in
+    this process call `invalidate`; the TTL covers writes made elsewhere.
+    """
+
+    def __init__(
+        self, ttl: float = PRINCIPAL_CACHE_TTL, maxsize: int = PRINCIPAL_CACHE_SIZE
+    ):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        # user_id -> (expires_at, principal)
+        self._entries: "OrderedDict[int, Tuple[float, Optional[Principal]]]" = (
+            OrderedDict()
+        )
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._generation = 0  # Bumped by invalidate, so racing loads are not cached
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        """
+        Return the principal of a user, loading it from the database on a miss.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            Optional[Principal]: The principal, or None if the user does not exist.
+
+        Raises:
+            sqlite3.Error: If the user cannot be loaded.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+            generation = self._generation
+
+        principal = load_principal(user_id)
+        with self._lock:
+            if generation != self._generation:
+                return principal
+            self._entries[user_id] = (now + self.ttl, principal)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        """Forget one user's principal, or every principal if no user is given."""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the number of cached principals."""
+        with self._lock:
+            return {**self._stats, "size": len(self._entries), "ttl": self.ttl}
+
+
+def load_principal(user_id: int) -> Optional[Principal]:
+    """
+    Read a user's principal from the database.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        Optional[Principal]: The principal, or None if the user does not exist.
+    """
+    with get_db_connection() as conn:
+        row = conn.execute(PRINCIPAL_QUERY, (user_id,)).fetchone()
+    if row is None:
+        logger.warning(f"User ID {user_id} not found in database.")
+        return None
+    return Principal(
+        user_id=row["user_id"],
+        is_admin=bool(row["is_admin"]),
+        is_active=bool(row["is_active"]),
+        is_deleted=bool(row["is_deleted"]),
+    )
+
+
+principal_cache = PrincipalCache()
+
+
+def get_principal(user_id: int) -> Optional[Principal]:
+    """
+    Return the cached principal of a user.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        Optional[Principal]: The principal, or None if the user does not exist.
+    """
+    return principal_cache.get(user_id)
+
+
+def invalidate_principal(user_id: Optional[int] = None) -> None:
+    """Drop a user's cached principal (every principal if None) after a write."""
+    principal_cache.invalidate(user_id)
@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+RATE_LIMIT_MAX_KEYS = 100000  # Buckets kept in memory, least recently used evicted
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """A token bucket of `capacity` attempts, refilled over `period` seconds."""
+
+    capacity: int
+    period: float
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.period
+
+
+# Rule name -> limit. Each attempt takes one token from every bucket it is keyed by.
+# Guessing one user's password from one address is limited tightly; the looser
+# per-username limit caps distributed guessing without letting a single
+# attacker lock the real user out.
+RATE_LIMITS = {
+    "login_ip": RateLimit(int(os.getenv("RATE_LIMIT_LOGIN_IP", 20)), 60),
+    "login_username_ip": RateLimit(
+        int(os.getenv("RATE_LIMIT_LOGIN_USERNAME_IP", 5)), 60
+    ),
+    "login_username": RateLimit(int(os.getenv("RATE_LIMIT_LOGIN_USERNAME", 30)), 300),
+    "register_ip": RateLimit(int(os.getenv("RATE_LIMIT_REGISTER_IP", 5)), 300),
+}
+
+
+class InMemoryBucketStore:
+    """
+    Token buckets held in this process.
+
+    This is the default backend. A store shared between processes (for
+    example one backed by Redis) only has to provide the same `take` method
+    and be installed with `set_backend`.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # key -> (tokens, updated_at)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, limit: RateLimit) -> Tuple[bool, float]:
+        """
+        Take one token from a bucket, refilling it for the time elapsed.
+
+        Args:
+            key (str): Bucket key.
+            limit (RateLimit): The bucket's capacity and refill period.
+
+        Returns:
+            Tuple[bool, float]: Whether a token was available, and the seconds
+            until one will be if not.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (limit.capacity, now))
+            elapsed = now - updated_at
+            tokens = min(limit.capacity, tokens + elapsed * limit.refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / limit.refill_rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """Applies the RATE_LIMITS rules on top of a bucket store, counting outcomes."""
+
+    def __init__(self, backend: Optional[Any] = None):
+        self.backend = backend or InMemoryBucketStore()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {
+            rule: {"allowed": 0, "rejected": 0} for rule in RATE_LIMITS
+        }
+
+    def check(
+        self, attempts: Iterable[Tuple[str, Optional[str]]]
+    ) -> Tuple[bool, float]:
+        """
+        Take a token for each (rule, key) of an attempt.
+
+        Keys that are empty are skipped. Rules are checked in order and the
+        first one out of tokens rejects the attempt.
+
+        Args:
+            attempts (Iterable[Tuple[str, Optional[str]]]): Rule names and the key
+                (e.g. client IP or username) to rate limit by.
+
+        Returns:
+            Tuple[bool, float]: Whether the attempt is allowed, and the seconds
+            to wait before retrying if not.
+        """
+        for rule, key in attempts:
+            if not key:
+                continue
+            allowed, retry_after = self.backend.take(
+                f"{rule}:{key}", RATE_LIMITS[rule]
+            )
+            with self._lock:
+                self._stats[rule]["allowed" if allowed else "rejected"] += 1
+            if not allowed:
+                return False, retry_after
+        return True, 0.0
+
+    def set_backend(self, backend: Any) -> None:
+        """Replace the bucket store, e.g. with one shared between workers."""
+        self.backend = backend
+
+    def stats(self) -> Dict[str, Any]:
+        """Return allowed/rejected counters per rule."""
+        with self._lock:
+            stats = {rule: dict(counts) for rule, counts in self._stats.items()}
+        if hasattr(self.backend, "__len__"):
+            stats["buckets"] = len(self.backend)
+        return stats
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from models.database import get_db_connection
+from utils.coingecko import MarketRow, MarketSnapshot
+from utils.search_index import SearchIndex
+
+
+# Seconds before a portfolio index is rebuilt, to pick up other workers' writes
+PORTFOLIO_INDEX_TTL = 300
+PORTFOLIO_INDEX_CACHE_SIZE = 1000  # Users' indexes kept, least recently used evicted
+
+
+class MarketSearchIndex(SearchIndex):
+    """Search index over the coins of one market snapshot."""
+
+    def __init__(self, snapshot: MarketSnapshot):
+        super().__init__((coin["name"], coin["symbol"]) for coin in snapshot.coins)
+        self.version = snapshot.version
+
+
+_market_index: Optional[MarketSearchIndex] = None
+_market_index_lock = threading.Lock()
+
+# (expires_at, index, portfolio rows)
+PortfolioIndexEntry = Tuple[float, SearchIndex, List[Dict[str, Any]]]
+
+# user_id -> entry, least recently used first
+_portfolio_indexes: "OrderedDict[int, PortfolioIndexEntry]" = OrderedDict()
+_portfolio_indexes_lock = threading.Lock()
+_portfolio_generation = 0  # Bumped by invalidation, so racing builds are not cached
+
+
+def get_market_search_index(snapshot: MarketSnapshot) -> MarketSearchIndex:
+    """
+    Return the search index for `snapshot`, building it once per snapshot version.
+
+    Args:
+        snapshot (MarketSnapshot): The market snapshot to search.
+
+    Returns:
+        MarketSearchIndex: Index whose document ids are positions in `snapshot.coins`.
+    """
+    global _market_index
+    index = _market_index
+    if index is not None and index.version == snapshot.version:
+        return index
+
+    with _market_index_lock:
+        if _market_index is None or _market_index.version != snapshot.version:
+            _market_index = MarketSearchIndex(snapshot)
+        return _market_index
+
+
+def search_market(snapshot: MarketSnapshot, query: str) -> List[MarketRow]:
+    """
+    Return the snapshot's rows matching `query`, best matches first.
+
+    Args:
+        snapshot (MarketSnapshot): The market snapshot to search.
+        query (str): Search text matched against coin names and symbols.
+
+    Returns:
+        List[MarketRow]: Matching display rows.
+    """
+    index = get_market_search_index(snapshot)
+    return [snapshot.rows[doc] for doc in index.search(query)]
+
+
+def get_portfolio_search_index(
+    user_id: int,
+) -> Tuple[SearchIndex, List[Dict[str, Any]]]:
+    """
+    Return the search index over a user's portfolio, building it on first use.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        Tuple[SearchIndex, List[Dict[str, Any]]]: The index and the portfolio rows
+        (id, name, abbreviation, amount) its document ids refer to.
+    """
+    now = time.monotonic()
+    with _portfolio_indexes_lock:
+        entry = _portfolio_indexes.get(user_id)
+        if entry is not None and entry[0] > now:
+            _portfolio_indexes.move_to_end(user_id)
+            return entry[1], entry[2]
+        generation = _portfolio_generation
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT id, name, abbreviation, amount FROM portfolio "
+            "WHERE user_id = ? ORDER BY id",
+            (user_id,),
+        )
+        rows = [dict(row) for row in cursor.fetchall()]
+
+    index = SearchIndex((row["name"], row["abbreviation"]) for row in rows)
+    with _portfolio_indexes_lock:
+        if generation == _portfolio_generation:
+            _portfolio_indexes[user_id] = (now + PORTFOLIO_INDEX_TTL, index, rows)
+            _portfolio_indexes.move_to_end(user_id)
+            while len(_portfolio_indexes) > PORTFOLIO_INDEX_CACHE_SIZE:
+                _portfolio_indexes.popitem(last=False)
+    return index, rows
+
+
+def invalidate_portfolio_index(user_id: int) -> None:
+    """Drop a user's portfolio index after their portfolio changed."""
+    global _portfolio_generation
+    with _portfolio_indexes_lock:
+        _portfolio_generation += 1
+        _portfolio_indexes.pop(user_id, None)
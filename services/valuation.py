@@ -0,0 +1,154 @@
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+import numpy as np
+from utils.coingecko import MarketSnapshot
+
+
+class ValuationEngine:
+    """
+    Values portfolios against one market snapshot.
+
+    The name/symbol lookup maps and the price array are built once per
+    snapshot, so valuing a portfolio is a dictionary lookup per holding plus
+    a vectorized multiply, and many portfolios can be valued in one pass.
+    """
+
+    def __init__(self, snapshot: MarketSnapshot):
+        self.version = snapshot.version
+        self._by_name: Dict[str, int] = {}
+        self._by_symbol: Dict[str, int] = {}
+        for i, crypto in enumerate(snapshot.coins):
+            # Coins are ordered by market cap, so the largest coin wins a name clash
+            self._by_name.setdefault(crypto["name"].lower(), i)
+            self._by_symbol.setdefault(crypto["symbol"].upper(), i)
+
+        # The extra trailing slot prices unknown coins at 0
+        self._unknown = len(snapshot.coins)
+        self.prices = np.array(
+            [crypto["current_price"] or 0.0 for crypto in snapshot.coins] + [0.0],
+            dtype=np.float64,
+        )
+        self.ranks = [crypto["market_cap_rank"] for crypto in snapshot.coins] + [None]
+        self.images = [crypto["image"] for crypto in snapshot.coins] + [None]
+
+    def lookup(self, name: str, symbol: Optional[str]) -> int:
+        """
+        Return the snapshot position of a coin, by name first and then by symbol.
+
+        Args:
+            name (str): Coin name.
+            symbol (Optional[str]): Coin symbol/abbreviation.
+
+        Returns:
+            int: Position in the price arrays (the unknown slot if not found).
+        """
+        index = self._by_name.get(name.lower())
+        if index is None and symbol:
+            index = self._by_symbol.get(symbol.upper())
+        return self._unknown if index is None else index
+
+    def value_portfolio(self, portfolio: List[Dict[str, Any]]) -> float:
+        """
+        Value a portfolio and annotate each asset in place.
+
+        Adds `current_price`, `value`, `rank`, `image` and
+        `allocation_percentage` to every asset.
+
+        Args:
+            portfolio (List[Dict[str, Any]]): Assets with name, abbreviation and amount.
+
+        Returns:
+            float: The total value of the portfolio.
+        """
+        if not portfolio:
+            return 0.0
+
+        indexes = np.fromiter(
+            (self.lookup(asset["name"], asset["abbreviation"]) for asset in portfolio),
+            dtype=np.intp,
+            count=len(portfolio),
+        )
+        amounts = np.fromiter(
+            (asset["amount"] or 0.0 for asset in portfolio),
+            dtype=np.float64,
+            count=len(portfolio),
+        )
+        prices = self.prices[indexes]
+        values = amounts * prices
+        total_value = float(values.sum())
+        allocations = (
+            values / total_value * 100 if total_value > 0 else np.zeros_like(values)
+        )
+
+        for asset, index, price, value, allocation in zip(
+            portfolio,
+            indexes.tolist(),
+            prices.tolist(),
+            values.tolist(),
+            allocations.tolist(),
+        ):
+            asset.update(
+                {
+                    "current_price": price,
+                    "value": round(value, 2),
+                    "rank": self.ranks[index],
+                    "image": self.images[index],
+                    "allocation_percentage": round(allocation, 2),
+                }
+            )
+
+        return round(total_value, 2)
+
+    def value_portfolios(
+        self, holdings: Iterable[Mapping[str, Any]]
+    ) -> Dict[int, float]:
+        """
+        Value the portfolios of many users in one vectorized pass.
+
+        Args:
+            holdings (Iterable[Mapping[str, Any]]): Rows with user_id, name, abbreviation and amount.
+
+        Returns:
+            Dict[int, float]: Total portfolio value per user_id.
+        """
+        user_ids, indexes, amounts = [], [], []
+        for holding in holdings:
+            user_ids.append(holding["user_id"])
+            indexes.append(self.lookup(holding["name"], holding["abbreviation"]))
+            amounts.append(holding["amount"] or 0.0)
+
+        if not user_ids:
+            return {}
+
+        users, positions = np.unique(np.array(user_ids), return_inverse=True)
+        values = np.array(amounts, dtype=np.float64) * self.prices[np.array(indexes)]
+        totals = np.bincount(positions, weights=values, minlength=len(users))
+        return {
+            int(user_id): round(float(total), 2)
+            for user_id, total in zip(users.tolist(), totals.tolist())
+        }
+
+
+_engine: Optional[ValuationEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_valuation_engine(snapshot: MarketSnapshot) -> ValuationEngine:
+    """
+    Return the valuation engine for `snapshot`, building it once per snapshot version.
+
+    Args:
+        snapshot (MarketSnapshot): The market snapshot to price against.
+
+    Returns:
+        ValuationEngine: Engine for the snapshot.
+    """
+    global _engine
+    engine = _engine
+    if engine is not None and engine.version == snapshot.version:
+        return engine
+
+    with _engine_lock:
+        if _engine is None or _engine.version != snapshot.version:
+            _engine = ValuationEngine(snapshot)
+        return _engine
@@ -1,86 +1,133 @@
+const UNREAD_POLL_INTERVAL = 60000;  // Fallback polling when streaming is unavailable
+let unreadCount = 0;
+
+// Show or hide the unread badge
+function renderUnreadCount(count) {
+  unreadCount = count;
+  const badge = document.getElementById('unread-count');
+
+  if (unreadCount > 0) {
+    badge.textContent = unreadCount;
+    badge.style.display = 'inline';  // Make the badge visible
+  } else {
+    badge.style.display = 'none';  // Hide the badge if no unread notifications
+  }
+}
+
 // Function to update the unread notifications count
 function updateUnreadCount() {
   fetch('/notifications/unread-count')
     .then(response => response.json())
-    .then(data => {
-      const unreadCount = data.unread_count;
-      const badge = document.getElementById('unread-count');
-
-      if (unreadCount > 0) {
-        badge.textContent = unreadCount;
-        badge.style.display = 'inline';  // Make the badge visible
-      } else {
-        badge.style.display = 'none';  // Hide the badge if no unread notifications
-      }
-    })
+    .then(data => renderUnreadCount(data.unread_count))
     .catch(error => {
       console.error('Error fetching unread notifications:', error);
     });
 }
 
-// Call the function to update the count when the page loads
-window.addEventListener('load', updateUnreadCount);
-
-document.getElementById('notification-bell').addEventListener('click', function(event) {
-  event.preventDefault();  // Prevent default behavior, like page navigation
-
-  // Open the modal with the list of notifications
-  fetch('/notifications')
-    .then(response => response.json())
-    .then(notifications => {
-      const notificationList = document.getElementById('notification-list');
-      notificationList.innerHTML = '';  // Clear existing list
-
-      // Loop through notifications and create a list item for each
-      notifications.forEach(notification => {
-        const listItem = document.createElement('li');
-
-        // Add class for unread notifications
-        if (!notification.is_read) {
-          listItem.classList.add('unread');
-        }
+// Receive unread counts and new notifications as they happen
+function subscribeToNotifications() {
+  if (!window.EventSource) {
+    updateUnreadCount();
+    setInterval(updateUnreadCount, UNREAD_POLL_INTERVAL);
+    return;
+  }
 
+  const source = new EventSource('/notifications/stream');
+  source.addEventListener('unread-count', event => {
+    renderUnreadCount(JSON.parse(event.data).unread_count);
+  });
+  source.addEventListener('notification', () => {
+    renderUnreadCount(unreadCount + 1);
+  });
+  // Events were dropped server-side, reload the count
+  source.addEventListener('resync', updateUnreadCount);
+  // EventSource reconnects by itself; the stream resends the count on reconnect
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED) {
+      console.error('Notification stream closed, falling back to polling.');
+      setInterval(updateUnreadCount, UNREAD_POLL_INTERVAL);
+    }
+  };
+}
 
-        // Add notification text
-        const textElement = document.createElement('p');
-        textElement.textContent = notification.notification_text;
+window.addEventListener('load', subscribeToNotifications);
 
-        // Add timestamp (formatting the timestamp as needed)
-        const timestampElement = document.createElement('small');
-        const timestamp = new Date(notification.created_at);  // Assuming timestamp is in UTC
-        timestampElement.textContent = `Received on: ${timestamp.toLocaleString()}`;
+let nextCursor = null;  // Keyset cursor of the next notifications page
 
-        // Add alert ID (optional, if relevant for your use case)
-        const alertIdElement = document.createElement('small');
-        alertIdElement.textContent = `Alert ID: ${notification.alert_id}`;
+// Build the list item for one notification
+function renderNotification(notification) {
+  const listItem = document.createElement('li');
 
-        // Append the elements to the list item
-        listItem.appendChild(textElement);
-        listItem.appendChild(timestampElement);
-        listItem.appendChild(alertIdElement);
+  // Add class for unread notifications
+  if (!notification.is_read) {
+    listItem.classList.add('unread');
+  }
 
+  // Add notification text
+  const textElement = document.createElement('p');
+  textElement.textContent = notification.notification_text;
+
+  // Add timestamp (formatting the timestamp as needed)
+  const timestampElement = document.createElement('small');
+  const timestamp = new Date(notification.created_at);  // Assuming timestamp is in UTC
+  timestampElement.textContent = `Received on: ${timestamp.toLocaleString()}`;
+
+  // Add alert ID (optional, if relevant for your use case)
+  const alertIdElement = document.createElement('small');
+  alertIdElement.textContent = `Alert ID: ${notification.alert_id}`;
+
+  // Append the elements to the list item
+  listItem.appendChild(textElement);
+  listItem.appendChild(timestampElement);
+  listItem.appendChild(alertIdElement);
+
+  // Add event listener to mark notification as read when clicked
+  listItem.addEventListener('click', function() {
+    if (!listItem.classList.contains('unread')) {
+      return;
+    }
+    fetch(`/notifications/${notification.id}/mark-read`, { method: 'POST' })
+      .then(response => response.json())
+      .then(data => {
+        // Update the modal or UI to reflect the read status
+        listItem.classList.remove('unread');
+
+        // Update the unread notifications count
+        updateUnreadCount();
+      })
+      .catch(error => console.error('Error marking as read:', error));
+  });
+
+  return listItem;
+}
 
-//        // Set the text content of the list item
-//        listItem.textContent = notification.notification_text;
+// Append the next page of notifications to the list
+function loadNotifications(cursor) {
+  const params = new URLSearchParams();
+  if (cursor) {
+    params.set('cursor', cursor);
+  }
 
-        // Add event listener to mark notification as read when clicked
-        listItem.addEventListener('click', function() {
-          fetch(`/notifications/${notification.id}/mark-read`, { method: 'POST' })
-            .then(response => response.json())
-            .then(data => {
-              // Update the modal or UI to reflect the read status
-              listItem.classList.remove('unread');
+  return fetch(`/notifications?${params}`)
+    .then(response => response.json())
+    .then(page => {
+      const notificationList = document.getElementById('notification-list');
+      page.notifications.forEach(notification => {
+        notificationList.appendChild(renderNotification(notification));
+      });
 
-              // Update the unread notifications count
-              updateUnreadCount();
-            })
-            .catch(error => console.error('Error marking as read:', error));
-        });
+      nextCursor = page.next_cursor;
+      document.getElementById('load-more-notifications').style.display = nextCursor ? 'inline' : 'none';
+    });
+}
 
-        // Append the list item to the notification list
-        notificationList.appendChild(listItem);
-      });
+document.getElementById('notification-bell').addEventListener('click', function(event) {
+  event.preventDefault();  // Prevent default behavior, like page navigation
 
+  // Open the modal with the first page of notifications
+  document.getElementById('notification-list').innerHTML = '';  // Clear existing list
+  loadNotifications(null)
+    .then(() => {
       // Show the modal
       document.getElementById('notification-modal').style.display = 'block';
     })
@@ -88,6 +135,30 @@ document.getElementById('notification-bell').addEventListener('click', function(
       console.error('Error fetching notifications:', error);
     });
 });
+
+document.getElementById('load-more-notifications').addEventListener('click', function() {
+  loadNotifications(nextCursor).catch(error => {
+    console.error('Error fetching notifications:', error);
+  });
+});
+
+// Mark every notification as read with a single request
+document.getElementById('mark-all-read').addEventListener('click', function() {
+  fetch('/notifications/mark-read', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ all: true })
+  })
+    .then(response => response.json())
+    .then(data => {
+      document.querySelectorAll('#notification-list li.unread').forEach(item => {
+        item.classList.remove('unread');
+      });
+      renderUnreadCount(data.unread_count);
+    })
+    .catch(error => console.error('Error marking all as read:', error));
+});
+
 // Close the modal when the close button is clicked
 document.getElementById('close-modal').addEventListener('click', function() {
   document.getElementById('notification-modal').style.display = 'none';
@@ -15,7 +15,10 @@ document.addEventListener('DOMContentLoaded', function () {
         if (data.error) {
           alert(`Error: ${data.error}`);
         } else {
-          alert(data.message);
+          const rowErrors = (data.errors || [])
+            .slice(0, 10)
+            .map(rowError => `Line ${rowError.line}: ${rowError.error}`);
+          alert([data.message, ...rowErrors].join('\n'));
           location.reload();
         }
       })
@@ -0,0 +1,65 @@
+import os
+import pytest
+import models.db_connection as db_connection
+from models.database import create_tables
+from models.migrations import run_migrations
+from services.principals import principal_cache
+import utils.auditing as auditing
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A migrated database in a temporary directory, served by its own pool."""
+    pool = db_connection.ConnectionPool(str(tmp_path / "test.db"))
+    monkeypatch.setattr(db_connection, "pool", pool)
+    with db_connection.get_db_connection() as conn:
+        create_tables(conn.cursor())
+        run_migrations(conn)
+        conn.execute(
+            "INSERT INTO users (username, email, password_hash, is_active) "
+            "VALUES ('alice', 'alice@example.com', 'x', 1)"
+        )
+    principal_cache.invalidate()
+    # A writer of its own, so no audit event outlives this database
+    writer = auditing.AuditWriter()
+    monkeypatch.setattr(auditing, "audit_writer", writer)
+    yield pool
+    writer.close()
+    pool.release_thread()
+    pool.close_all()
+
+
+@pytest.fixture
+def app(db):
+    """A Flask app with every blueprint, backed by the test database."""
+    from flask import Flask
+    from api.admin_api import admin_api
+    from api.alert_api import alert_api
+    from api.api import api
+    from api.login_api import login_api
+    from api.notification_api import notification_api
+
+    app = Flask(
+        __name__,
+        template_folder=os.path.join(ROOT, "templates"),
+        static_folder=os.path.join(ROOT, "static"),
+    )
+    app.secret_key = "test"
+    app.config["TESTING"] = True
+    for blueprint in (api, admin_api, login_api, alert_api, notification_api):
+        app.register_blueprint(blueprint)
+    app.teardown_appcontext(db_connection.release_thread_connection)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as the user created by the `db` fixture."""
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = 1
+        session["username"] = "alice"
+    return client
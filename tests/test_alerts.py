@@ -0,0 +1,85 @@
+import pytest
+from models.db_connection import get_db_connection
+from models.migrations import MIGRATIONS
+from services.alert_index import AlertIndex, ThresholdBook, alert_index
+
+
+def alert(threshold):
+    return {
+        "name": "Bitcoin",
+        "cryptocurrency": "BTC",
+        "alert_type": "more",
+        "threshold": threshold,
+    }
+
+
+def test_set_alert_stores_a_numeric_threshold(client):
+    response = client.post("/api/set_alert", json=alert("100.5"))
+    assert response.status_code == 201
+
+    with get_db_connection() as conn:
+        (threshold,) = conn.execute("SELECT threshold FROM alerts").fetchone()
+    assert threshold == 100.5
+    assert response.get_json()["alert_id"] in alert_index._alerts
+
+
+@pytest.mark.parametrize("threshold", ["abc", None, "nan", "inf", "-Infinity", []])
+def test_set_alert_rejects_invalid_thresholds(client, threshold):
+    response = client.post("/api/set_alert", json=alert(threshold))
+    assert response.status_code == 400
+
+    with get_db_connection() as conn:
+        (count,) = conn.execute("SELECT COUNT(*) FROM alerts").fetchone()
+    assert count == 0
+
+
+def test_invalid_stored_thresholds_are_deactivated(db):
+    with get_db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO alerts (user_id, name, cryptocurrency, alert_type, threshold) "
+            "VALUES (1, 'Bitcoin', 'BTC', 'more', ?)",
+            [("abc",), (float("inf"),), (100,)],
+        )
+        migration = next(m for m in MIGRATIONS if m[1].startswith("Deactivate alerts"))
+        for statement in migration[2]:
+            conn.execute(statement)
+
+    index = AlertIndex()
+    index.rebuild()
+    assert len(index) == 1
+    assert [a["threshold"] for a in index.triggered("bitcoin", 150)] == [100.0]
+
+
+@pytest.mark.parametrize("alert_type", ["above", "MORE", "", None])
+def test_set_alert_rejects_unknown_alert_types(client, alert_type):
+    body = {**alert(100), "alert_type": alert_type}
+    response = client.post("/api/set_alert", json=body)
+    assert response.status_code == 400
+
+    with get_db_connection() as conn:
+        (count,) = conn.execute("SELECT COUNT(*) FROM alerts").fetchone()
+    assert count == 0
+
+
+def test_unknown_stored_alert_types_are_skipped_without_resyncing(db):
+    with get_db_connection() as conn:
+        conn.executemany(
+            "INSERT INTO alerts (user_id, name, cryptocurrency, alert_type, threshold) "
+            "VALUES (1, 'Bitcoin', 'BTC', ?, 100)",
+            [("less",), ("above",)],
+        )
+
+    index = AlertIndex()
+    index.rebuild()
+    assert len(index) == 1
+    # A price above the threshold must not fire the "above" alert as a less-than
+    assert index.triggered("bitcoin", 150) == []
+    assert [a["alert_type"] for a in index.triggered("bitcoin", 50)] == ["less"]
+
+    index.rebuild = lambda: pytest.fail("index rebuilt although nothing changed")
+    index.sync()
+
+
+def test_threshold_book_rejects_unknown_alert_types():
+    with pytest.raises(ValueError):
+        ThresholdBook().add("above", 100.0, 1)
@@ -0,0 +1,35 @@
+import numpy as np
+from utils.anomaly_detection import FEATURE_NAMES, combine_results, extract_features
+
+
+def test_features_are_column_wise_and_missing_values_are_zero():
+    coins = [
+        {
+            "current_price": 50.0,
+            "market_cap": 1000.0,
+            "total_volume": 250.0,
+            "price_change_percentage_24h": 5.0,
+            "ath": 100.0,
+        },
+        # Nothing known, and a zero market cap that must not divide
+        {"market_cap": 0, "ath": 0},
+    ]
+
+    features = extract_features(coins)
+
+    assert features.shape == (2, len(FEATURE_NAMES))
+    np.testing.assert_allclose(
+        features[0], [np.log1p(1000.0), np.log1p(250.0), 5.0, -0.5, 0.25]
+    )
+    np.testing.assert_array_equal(features[1], np.zeros(len(FEATURE_NAMES)))
+
+
+def test_combine_results_keeps_first_occurrence_of_each_coin():
+    gainers = [{"id": "btc", "name": "Bitcoin"}, {"id": "eth", "name": "Ethereum"}]
+    losers = [{"id": "eth", "name": "Ethereum"}, {"id": "sol", "name": "Solana"}]
+
+    result = combine_results([-1, 1, -1, 1], gainers, losers, [-0.7, -0.4, -0.6, -0.3])
+
+    assert [coin["id"] for coin in result["outliers"]] == ["btc"]
+    assert [coin["id"] for coin in result["inliers"]] == ["eth", "sol"]
+    assert result["inliers"][0]["anomaly_score"] == -0.4
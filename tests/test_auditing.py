@@ -0,0 +1,29 @@
+from models.db_connection import get_db_connection
+from utils.auditing import AuditWriter
+
+
+def event(i):
+    return (
+        "login_attempt",
+        f"user{i}",
+        "127.0.0.1",
+        "pytest",
+        "success",
+        None,
+        "2026-01-01 00:00:00",
+    )
+
+
+def test_close_writes_every_queued_event_in_batches(db):
+    writer = AuditWriter(batch_size=10, flush_interval=0.05)
+    for i in range(25):
+        assert writer.submit(event(i))
+    writer.close()
+
+    with get_db_connection() as conn:
+        usernames = [row[0] for row in conn.execute("SELECT username FROM audit_log")]
+    assert sorted(usernames) == sorted(f"user{i}" for i in range(25))
+    stats = writer.stats()
+    assert (stats["queued"], stats["written"], stats["dropped"]) == (25, 25, 0)
+    assert stats["batches"] >= 3
+    assert not stats["running"]
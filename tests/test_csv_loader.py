@@ -0,0 +1,118 @@
+import csv
+import io
+import pytest
+from models.db_connection import get_db_connection
+from models.migrations import MIGRATIONS
+from services.ledger import get_ledger_positions
+from utils.csv_loader import (
+    import_transactions,
+    parse_transaction_date,
+    parse_transaction_row,
+)
+
+
+HEADER = "name,abbreviation,transaction_date,amount,price,transaction_id,rate\n"
+
+
+def row(**overrides):
+    values = {
+        "name": "Bitcoin",
+        "abbreviation": "btc",
+        "transaction_date": "2024-10-08",
+        "amount": "1",
+        "price": "100",
+        "transaction_id": "t1",
+        "rate": "100",
+    }
+    values.update(overrides)
+    return values
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("20241008", "2024-10-08"),
+        ("2024-10-08", "2024-10-08"),
+        ("2024-10-08T09:30:00", "2024-10-08 09:30:00"),
+        ("2024-10-08 09:30:00+02:00", "2024-10-08 07:30:00"),
+    ],
+)
+def test_dates_are_normalized(value, expected):
+    assert parse_transaction_date(value) == expected
+
+
+@pytest.mark.parametrize("value", ["08/10/2024", "2024-13-01", "yesterday"])
+def test_invalid_dates_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_transaction_row(row(transaction_date=value), 1)
+
+
+@pytest.mark.parametrize("field", ["amount", "price", "rate"])
+@pytest.mark.parametrize("value", ["nan", "inf", "-Infinity", "abc"])
+def test_non_finite_numbers_are_rejected(field, value):
+    with pytest.raises(ValueError):
+        parse_transaction_row(row(**{field: value}), 1)
+
+
+def test_bad_rows_do_not_abort_their_chunk(db):
+    csv_text = HEADER + (
+        "Bitcoin,BTC,20241008,1,100,t1,100\n"
+        "Bitcoin,BTC,20241009,nan,100,t2,100\n"
+        "Bitcoin,BTC,20241010,1,inf,t3,100\n"
+        "Bitcoin,BTC,20241011,-0.5,80,t4,160\n"
+    )
+    report = import_transactions(io.StringIO(csv_text), 1)
+
+    assert report["inserted"] == 2
+    assert report["rejected"] == 2
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+    with get_db_connection() as conn:
+        dates = [
+            row["transaction_date"]
+            for row in conn.execute("SELECT transaction_date FROM transactions")
+        ]
+    assert dates == ["2024-10-08", "2024-10-11"]
+
+
+def test_basic_format_dates_are_migrated(db):
+    with get_db_connection() as conn:
+        conn.execute(
+            "INSERT INTO transactions (user_id, name, abbreviation, transaction_date, "
+            "amount, price, transaction_id, rate) "
+            "VALUES (1, 'Bitcoin', 'BTC', '20241008', 1, 100, 't1', 100)"
+        )
+        iso_dates = next(m for m in MIGRATIONS if m[1] == "ISO transaction dates")
+        for statement in iso_dates[2]:
+            conn.execute(statement)
+        (date,) = conn.execute("SELECT transaction_date FROM transactions").fetchone()
+    assert date == "2024-10-08"
+
+
+def test_unreadable_rest_of_file_keeps_committed_chunks(db):
+    # Enough rows that the undecodable bytes lie past the stream's first read
+    rows = "".join(f"Bitcoin,BTC,2024-10-08,1,100,t{i},100\n" for i in range(2000))
+    upload = io.BytesIO((HEADER + rows).encode() + b"Bitcoin,BTC,\xff\xfe\n")
+    stream = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+
+    report = import_transactions(stream, 1, chunk_size=500)
+
+    assert report["aborted"]
+    assert 0 < report["inserted"] <= 2000
+    assert "Unreadable CSV" in report["errors"][-1]["error"]
+    # The ledger caught up with every committed row
+    (position,) = get_ledger_positions(1)
+    assert position["quantity"] == report["inserted"]
+
+
+def test_malformed_csv_stops_the_import(db):
+    csv_text = HEADER + "Bitcoin,BTC,2024-10-08,1,100,t1,100\n" + "x" * 200 + "\n"
+    field_size_limit = csv.field_size_limit(100)
+    try:
+        report = import_transactions(io.StringIO(csv_text), 1)
+    finally:
+        csv.field_size_limit(field_size_limit)
+
+    assert report["aborted"]
+    assert report["inserted"] == 1
+    assert [error["line"] for error in report["errors"]] == [3]
+    assert get_ledger_positions(1)[0]["quantity"] == 1
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+from models.db_connection import DB_BACKGROUND_CONNECTIONS
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRINT_POOL_SIZE = "import models.db_connection as d; print(d.pool.max_size)"
+
+
+def pool_size(**env):
+    """The default pool size of a fresh process with `env` set."""
+    result = subprocess.run(
+        [sys.executable, "-c", PRINT_POOL_SIZE],
+        cwd=ROOT,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return int(result.stdout)
+
+
+def test_pool_leaves_room_for_background_work_beside_request_threads():
+    assert pool_size(GUNICORN_THREADS="32") == 32 + DB_BACKGROUND_CONNECTIONS
+    assert pool_size(GUNICORN_THREADS="32", DB_POOL_SIZE="12") == 12
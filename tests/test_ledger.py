@@ -0,0 +1,82 @@
+import threading
+from models.db_connection import get_db_connection
+from services.ledger import get_ledger_positions, update_ledger
+
+
+def add_transactions(conn, rows):
+    conn.executemany(
+        "INSERT INTO transactions (user_id, name, abbreviation, transaction_date, "
+        "amount, price, transaction_id, rate) VALUES (1, 'Bitcoin', 'BTC', ?, ?, ?, ?, 1)",
+        rows,
+    )
+
+
+def test_fifo_cost_basis_and_realized_pnl(db):
+    with get_db_connection() as conn:
+        add_transactions(
+            conn,
+            [
+                ("2024-01-01", 1, 100, "t1"),
+                ("2024-02-01", 1, 200, "t2"),
+                ("2024-03-01", -1.5, 450, "t3"),
+            ],
+        )
+    assert update_ledger(1) == 3
+
+    (position,) = get_ledger_positions(1)
+    assert position["quantity"] == 0.5
+    assert position["cost_basis"] == 100  # Half of the second lot
+    assert position["realized_pnl"] == 450 - 200
+
+
+def test_backdated_transaction_replays_the_asset(db):
+    with get_db_connection() as conn:
+        add_transactions(conn, [("2024-02-01", 1, 200, "t1")])
+    update_ledger(1)
+    with get_db_connection() as conn:
+        add_transactions(
+            conn, [("2024-01-01", 1, 100, "t2"), ("2024-03-01", -1, 300, "t3")]
+        )
+    update_ledger(1)
+
+    (position,) = get_ledger_positions(1)
+    # The backdated lot is the oldest, so it is the one sold
+    assert position["cost_basis"] == 200
+    assert position["realized_pnl"] == 200
+
+
+def test_concurrent_updates_apply_each_transaction_once(db):
+    with get_db_connection() as conn:
+        add_transactions(
+            conn, [(f"2024-01-{day:02d}", 1, 100, f"t{day}") for day in range(1, 29)]
+        )
+
+    barrier = threading.Barrier(4)
+    applied = []
+
+    def run():
+        barrier.wait()
+        applied.append(update_ledger())
+        db.release_thread()
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(applied) == [0, 0, 0, 28]
+    with get_db_connection() as conn:
+        (lots,) = conn.execute("SELECT COUNT(*) FROM ledger_lots").fetchone()
+    assert lots == 28
+    assert get_ledger_positions(1)[0]["quantity"] == 28
+
+
+def test_update_inside_an_open_transaction_joins_it(db):
+    with get_db_connection() as conn:
+        add_transactions(conn, [("2024-01-01", 1, 100, "t1")])
+        assert conn.in_transaction
+        assert update_ledger(1) == 1
+        conn.rollback()
+
+    assert get_ledger_positions(1) == []
@@ -0,0 +1,24 @@
+import threading
+import time
+import utils.coingecko as coingecko
+
+
+def test_coalesced_refreshes_are_all_counted():
+    expected = coingecko.get_refresh_metrics()["coalesced"] + 20
+    callers = [
+        threading.Thread(target=coingecko.refresh_market_data) for _ in range(20)
+    ]
+    # With a refresh in flight, every caller waits for it instead of refreshing
+    with coingecko._refresh_lock:
+        for caller in callers:
+            caller.start()
+        deadline = time.monotonic() + 5
+        while coingecko.get_refresh_metrics()["coalesced"] < expected:
+            assert time.monotonic() < deadline, "coalesced callers were not counted"
+            time.sleep(0.01)
+    for caller in callers:
+        caller.join()
+
+    metrics = coingecko.get_refresh_metrics()
+    assert metrics["coalesced"] == expected
+    assert not metrics["in_flight"]
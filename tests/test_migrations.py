@@ -0,0 +1,104 @@
+import pytest
+from models.database import create_tables
+from models.db_connection import get_db_connection
+from models.migrations import MIGRATIONS, get_schema_version, run_migrations
+
+
+# Hot queries and the index each one must be answered from
+HOT_QUERIES = [
+    (
+        "SELECT id, user_id, name, abbreviation, amount FROM portfolio WHERE user_id = ?",
+        (1,),
+        "idx_portfolio_user_name",
+    ),
+    (
+        "SELECT MAX(timestamp) FROM cryptocurrencies",
+        (),
+        "idx_cryptocurrencies_timestamp",
+    ),
+    (
+        "SELECT id FROM alerts WHERE status = 'active'",
+        (),
+        "idx_alerts_status",
+    ),
+    (
+        "SELECT COUNT(*) FROM notifications WHERE user_id = ? AND is_read = 0",
+        (1,),
+        "idx_notifications_user_read_created",
+    ),
+    (
+        "SELECT id, created_at FROM notifications WHERE user_id = ? "
+        "AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT 21",
+        (1, "2026-01-01 00:00:00", 10),
+        "idx_notifications_user_created_id",
+    ),
+    (
+        "SELECT * FROM transactions WHERE user_id = ? AND id > ? ORDER BY id",
+        (1, 0),
+        "idx_transactions_user_id",
+    ),
+    (
+        "SELECT * FROM transactions WHERE user_id = ? AND name = ? "
+        "ORDER BY transaction_date, id",
+        (1, "Bitcoin"),
+        "idx_transactions_user_name_date",
+    ),
+    (
+        "SELECT * FROM ledger_lots WHERE user_id = ? AND name = ? ORDER BY acquired, id",
+        (1, "Bitcoin"),
+        "idx_ledger_lots_user_name",
+    ),
+    (
+        "SELECT id FROM audit_log WHERE created_at < ? ORDER BY created_at LIMIT 5000",
+        ("2026-01-01 00:00:00",),
+        "idx_audit_log_created",
+    ),
+    (
+        "SELECT * FROM audit_log WHERE username = ? "
+        "ORDER BY created_at DESC, id DESC LIMIT 51",
+        ("alice",),
+        "idx_audit_log_username_created",
+    ),
+    (
+        "SELECT * FROM audit_log WHERE ip_address = ? "
+        "ORDER BY created_at DESC, id DESC LIMIT 51",
+        ("127.0.0.1",),
+        "idx_audit_log_ip_created",
+    ),
+    (
+        "SELECT * FROM audit_log WHERE event_type = ? "
+        "ORDER BY created_at DESC, id DESC LIMIT 51",
+        ("login_attempt",),
+        "idx_audit_log_event_created",
+    ),
+]
+
+
+def query_plan(conn, query, params):
+    return [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def test_migrations_reach_latest_version(db):
+    with get_db_connection() as conn:
+        assert get_schema_version(conn) == MIGRATIONS[-1][0]
+        # Startup is idempotent: tables are kept and applied migrations not rerun
+        create_tables(conn.cursor())
+        assert run_migrations(conn) == MIGRATIONS[-1][0]
+        tables = {
+            row["name"] for row in conn.execute("SELECT name FROM sqlite_master")
+        }
+    assert "gainers_losers_cache" not in tables
+    assert "idx_gainers_losers_cache_user_coins" not in tables
+
+
+@pytest.mark.parametrize("query, params, index", HOT_QUERIES)
+def test_hot_query_uses_index(db, query, params, index):
+    with get_db_connection() as conn:
+        plan = query_plan(conn, query, params)
+
+    assert any(
+        f"USING INDEX {index}" in step or f"USING COVERING INDEX {index}" in step
+        for step in plan
+    ), plan
+    assert not any(step.startswith("SCAN") and "INDEX" not in step for step in plan)
+    assert not any("USE TEMP B-TREE" in step for step in plan), plan
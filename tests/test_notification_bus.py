@@ -0,0 +1,43 @@
+from services.notification_bus import SUBSCRIBER_QUEUE_SIZE, NotificationBus
+
+
+def test_publish_reaches_every_listener_of_the_user_only():
+    bus = NotificationBus()
+    tabs = [bus.subscribe(1), bus.subscribe(1)]
+    other = bus.subscribe(2)
+
+    assert bus.publish(1, "unread-count", {"count": 3}) == 2
+
+    for tab in tabs:
+        assert tab.get(timeout=0) == {"event": "unread-count", "data": {"count": 3}}
+    assert other.get(timeout=0) is None
+    assert bus.stats() == {
+        "users": 2,
+        "listeners": 3,
+        "published": 1,
+        "delivered": 2,
+        "dropped": 0,
+        "rejected": 0,
+    }
+
+
+def test_slow_listener_gets_one_resync_instead_of_stale_events():
+    bus = NotificationBus()
+    slow = bus.subscribe(1)
+    for i in range(SUBSCRIBER_QUEUE_SIZE + 5):
+        bus.publish(1, "notification", {"id": i})
+
+    assert bus.stats()["dropped"] == 5
+    assert slow.get(timeout=0) == {"event": "resync", "data": {}}
+    # The buffered backlog is discarded along with the overflow
+    assert slow.get(timeout=0) is None
+
+
+def test_unsubscribe_removes_the_listener():
+    bus = NotificationBus()
+    subscription = bus.subscribe(1)
+    bus.unsubscribe(subscription)
+    bus.unsubscribe(subscription)
+
+    assert bus.publish(1, "notification", {}) == 0
+    assert bus.stats()["users"] == 0
@@ -0,0 +1,100 @@
+import pytest
+import api.notification_api as notification_api
+from models.db_connection import get_db_connection
+from services.notification_bus import NotificationBus, notification_bus
+from utils.pagination import decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def notifications(db):
+    """25 unread notifications for user 1, several sharing a created_at."""
+    with get_db_connection() as conn:
+        conn.execute(
+            "INSERT INTO alerts (user_id, name, cryptocurrency, alert_type, threshold) "
+            "VALUES (1, 'bitcoin', 'BTC', 'more', 100)"
+        )
+        conn.executemany(
+            "INSERT INTO notifications "
+            "(user_id, alert_id, created_at, notification_text, current_price) "
+            "VALUES (1, 1, ?, ?, 100)",
+            [(f"2026-01-01 00:00:{i // 3:02d}", f"n{i}") for i in range(25)],
+        )
+    return 25
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2026-01-01 12:00:00", 42)
+    assert decode_cursor(cursor) == ("2026-01-01 12:00:00", 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", encode_cursor("x", 1)[:-3]])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_every_notification_once(client, notifications):
+    seen, cursor = [], None
+    while True:
+        query = {"limit": 7, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/notifications", query_string=query).get_json()
+        seen.extend(n["id"] for n in page["notifications"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen)) == notifications
+    # Newest first, ties on created_at broken by id
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_invalid_cursor_returns_400(client, notifications):
+    response = client.get("/notifications", query_string={"cursor": "%%%"})
+    assert response.status_code == 400
+
+
+def test_mark_read_by_ids(client, notifications):
+    response = client.post("/notifications/mark-read", json={"ids": [1, 2, 3, 999]})
+    assert response.get_json() == {"updated": 3, "unread_count": notifications - 3}
+
+    # Marking them again changes nothing
+    response = client.post("/notifications/mark-read", json={"ids": [1, 2, 3]})
+    assert response.get_json()["updated"] == 0
+
+
+def test_mark_read_before_cursor(client, notifications):
+    page = client.get("/notifications", query_string={"limit": 5}).get_json()
+    response = client.post(
+        "/notifications/mark-read", json={"before": page["next_cursor"]}
+    )
+    # The cursor's notification (the page's last) and every older one are marked
+    assert response.get_json()["unread_count"] == 4
+
+
+@pytest.mark.parametrize("body", [{"ids": "1,2"}, {"ids": [1, "2"]}, {}])
+def test_mark_read_rejects_bad_requests(client, notifications, body):
+    response = client.post("/notifications/mark-read", json=body)
+    assert response.status_code == 400
+
+
+def test_streams_beyond_the_limit_get_503(client, monkeypatch):
+    listeners = notification_bus.stats()["listeners"]
+    held = notification_bus.subscribe(2, max_listeners=listeners + 1)
+    try:
+        monkeypatch.setattr(notification_api, "STREAM_MAX_OPEN", listeners + 1)
+        response = client.get("/notifications/stream")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"]
+    finally:
+        notification_bus.unsubscribe(held)
+    assert notification_bus.stats()["listeners"] == listeners
+
+
+def test_unsubscribing_twice_counts_once():
+    bus = NotificationBus()
+    subscription = bus.subscribe(1, max_listeners=1)
+    assert bus.subscribe(1, max_listeners=1) is None
+    bus.unsubscribe(subscription)
+    bus.unsubscribe(subscription)
+    assert bus.stats()["listeners"] == 0
+    assert bus.stats()["rejected"] == 1
@@ -0,0 +1,68 @@
+import sqlite3
+import pytest
+from models.database import create_tables
+from services.alert_index import AlertIndex
+from services import alerts
+
+
+@pytest.fixture
+def cursor():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    create_tables(cursor)
+    cursor.executemany(
+        "INSERT INTO users (username, email, password_hash) VALUES (?, ?, 'x')",
+        [("alice", "alice@example.com"), ("bob", "bob@example.com")],
+    )
+    cursor.executemany(
+        "INSERT INTO portfolio (user_id, name, abbreviation, amount) VALUES (?, ?, ?, 1)",
+        [(1, "Bitcoin", "BTC"), (2, "Ethereum", "ETH")],
+    )
+    yield cursor
+    conn.close()
+
+
+def add_alert(cursor, user_id, name, status="active"):
+    cursor.execute(
+        "INSERT INTO alerts (user_id, name, cryptocurrency, alert_type, threshold, status) "
+        "VALUES (?, ?, ?, 'more', 100, ?)",
+        (user_id, name, name[:3].upper(), status),
+    )
+    return cursor.lastrowid
+
+
+def test_deactivates_only_alerts_on_coins_no_longer_held(cursor, monkeypatch):
+    index = AlertIndex()
+    monkeypatch.setattr(alerts, "alert_index", index)
+    held = add_alert(cursor, 1, "Bitcoin")
+    sold = add_alert(cursor, 1, "Ethereum")  # Held by bob, not by alice
+    other_user = add_alert(cursor, 2, "Bitcoin")
+    already_inactive = add_alert(cursor, 2, "Solana", status="inactive")
+    cursor.connection.commit()
+    index.rebuild(
+        [
+            {
+                "id": alert_id,
+                "user_id": 1,
+                "name": "Bitcoin",
+                "cryptocurrency": "BTC",
+                "alert_type": "more",
+                "threshold": 100,
+            }
+            for alert_id in (held, sold, other_user)
+        ]
+    )
+
+    assert sorted(alerts.deactivate_orphaned_alerts(cursor)) == [sold, other_user]
+
+    statuses = dict(cursor.execute("SELECT id, status FROM alerts").fetchall())
+    assert statuses == {
+        held: "active",
+        sold: "inactive",
+        other_user: "inactive",
+        already_inactive: "inactive",
+    }
+    assert len(index) == 1
+    # Nothing is left to deactivate on a second pass
+    assert alerts.deactivate_orphaned_alerts(cursor) == []
@@ -0,0 +1,121 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from werkzeug.security import generate_password_hash
+import services.passwords as passwords
+from models.db_connection import get_db_connection
+from services.passwords import PasswordHasher
+
+
+OLD_METHOD = "pbkdf2:sha256:1000"
+NEW_METHOD = "pbkdf2:sha256:2000"
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    """A fast, inline hasher installed as the module's default."""
+    hasher = PasswordHasher(method=NEW_METHOD, workers=0)
+    monkeypatch.setattr(passwords, "password_hasher", hasher)
+    return hasher
+
+
+def test_hash_and_verify(hasher):
+    password_hash = hasher.hash("secret")
+    assert password_hash.startswith(NEW_METHOD + "$")
+    assert hasher.verify(password_hash, "secret")
+    assert not hasher.verify(password_hash, "wrong")
+
+
+def test_outdated_hash_is_replaced_only_on_a_match(hasher):
+    old_hash = generate_password_hash("secret", OLD_METHOD)
+    assert hasher.verify_and_update(old_hash, "wrong") == (False, None)
+
+    matches, new_hash = hasher.verify_and_update(old_hash, "secret")
+    assert matches
+    assert new_hash.startswith(NEW_METHOD + "$")
+    assert hasher.verify_and_update(new_hash, "secret") == (True, None)
+    assert hasher.stats()["rehashed"] == 1
+
+
+def test_shorthand_methods_match_their_expanded_hashes():
+    hasher = PasswordHasher(method="scrypt", workers=0)
+    assert not hasher.needs_rehash(generate_password_hash("secret", "scrypt"))
+    assert hasher.needs_rehash(generate_password_hash("secret", OLD_METHOD))
+
+
+def test_hashing_in_worker_processes():
+    hasher = PasswordHasher(method=NEW_METHOD, workers=1)
+    password_hash = hasher.hash("secret")
+    assert hasher.verify(password_hash, "secret")
+
+
+def test_hash_survives_spawned_pool_startup():
+    hasher = PasswordHasher(method=NEW_METHOD, workers=1)
+    hasher.start()
+    executor = hasher._get_executor()
+    try:
+        assert executor._mp_context.get_start_method() == "spawn"
+        assert hasher.verify(hasher.hash("secret"), "secret")
+        assert hasher.stats()["inline"] == 0
+    finally:
+        executor.shutdown()
+
+
+def test_login_rehashes_outdated_password(app, hasher):
+    with get_db_connection() as conn:
+        conn.execute(
+            "UPDATE users SET password_hash = ? WHERE user_id = 1",
+            (generate_password_hash("secret", OLD_METHOD),),
+        )
+
+    response = app.test_client().post(
+        "/login", data={"username": "alice", "password": "secret"}
+    )
+    assert response.status_code == 302
+
+    with get_db_connection() as conn:
+        (stored,) = conn.execute(
+            "SELECT password_hash FROM users WHERE user_id = 1"
+        ).fetchone()
+    assert stored.startswith(NEW_METHOD + "$")
+    assert hasher.verify(stored, "secret")
+
+
+def test_timed_out_work_keeps_its_slot(monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_TIMEOUT", 0.2)
+    hasher = PasswordHasher(workers=1, max_pending=1)
+    hasher.start()
+
+    with pytest.raises(TimeoutError):
+        hasher._run(time.sleep, 1.5)
+    # The sleep still occupies the worker, so its slot is not free yet
+    with pytest.raises(TimeoutError, match="overloaded"):
+        hasher._run(int)
+
+    time.sleep(1.5)
+    assert hasher._run(int) == 0
+
+
+def test_broken_pool_is_shut_down_and_replaced(monkeypatch):
+    hasher = PasswordHasher(method=NEW_METHOD, workers=1)
+    broken = hasher._get_executor()
+    shutdowns = []
+    shutdown = broken.shutdown
+
+    def record_shutdown(**kwargs):
+        shutdowns.append(kwargs)
+        shutdown(**kwargs)
+
+    monkeypatch.setattr(broken, "shutdown", record_shutdown)
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result()
+
+    password_hash = hasher.hash("secret")  # Hashed inline
+    assert hasher.stats()["inline"] == 1
+    assert shutdowns == [{"wait": False, "cancel_futures": True}]
+
+    # The next call starts a new pool
+    assert hasher.verify(password_hash, "secret")
+    assert hasher._get_executor() is not broken
+    assert hasher.stats()["inline"] == 1
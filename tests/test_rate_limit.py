@@ -0,0 +1,113 @@
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+from services.rate_limit import (
+    RATE_LIMITS,
+    InMemoryBucketStore,
+    RateLimit,
+    rate_limiter,
+)
+from utils.auditing import get_client_ip
+
+
+@pytest.fixture(autouse=True)
+def fresh_buckets():
+    previous = rate_limiter.backend
+    rate_limiter.set_backend(InMemoryBucketStore())
+    yield
+    rate_limiter.set_backend(previous)
+
+
+def test_bucket_rejects_once_empty_and_says_when_to_retry():
+    store = InMemoryBucketStore()
+    limit = RateLimit(capacity=3, period=60)
+    assert [store.take("key", limit)[0] for _ in range(4)] == [True] * 3 + [False]
+
+    allowed, retry_after = store.take("key", limit)
+    assert not allowed
+    assert 0 < retry_after <= limit.period / limit.capacity
+
+
+def test_buckets_are_independent_per_key():
+    store = InMemoryBucketStore()
+    limit = RateLimit(capacity=1, period=60)
+    assert store.take("a", limit)[0]
+    assert not store.take("a", limit)[0]
+    assert store.take("b", limit)[0]
+
+
+def test_least_recently_used_buckets_are_evicted():
+    store = InMemoryBucketStore(max_keys=2)
+    limit = RateLimit(capacity=1, period=60)
+    for key in ("a", "b", "c"):
+        store.take(key, limit)
+    assert len(store) == 2
+    # "a" was evicted, so it starts with a full bucket again
+    assert store.take("a", limit)[0]
+
+
+def test_login_returns_429_with_retry_after(app):
+    client = app.test_client()
+    attempts = RATE_LIMITS["login_ip"].capacity
+    for _ in range(attempts):
+        response = client.post("/login", data={"username": "", "password": ""})
+        assert response.status_code == 200
+
+    response = client.post("/login", data={"username": "", "password": ""})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def login(client, username="alice", password="wrong", address="10.0.0.1", **kwargs):
+    return client.post(
+        "/login",
+        data={"username": username, "password": password},
+        environ_base={"REMOTE_ADDR": address},
+        **kwargs,
+    )
+
+
+def test_attacker_cannot_lock_out_a_user_from_other_addresses(app):
+    client = app.test_client()
+    attempts = RATE_LIMITS["login_username_ip"].capacity
+    for _ in range(attempts):
+        assert login(client).status_code == 200
+    assert login(client).status_code == 429
+
+    # The same user from another address is still let through
+    assert login(client, address="10.0.0.2").status_code == 200
+
+
+def test_forwarded_for_header_cannot_bypass_the_ip_limit(app):
+    client = app.test_client()
+    attempts = RATE_LIMITS["login_ip"].capacity
+    for i in range(attempts):
+        response = login(
+            client, username=f"user{i}", headers={"X-Forwarded-For": f"10.1.0.{i}"}
+        )
+        assert response.status_code == 200
+
+    response = login(client, username="other", headers={"X-Forwarded-For": "10.2.0.1"})
+    assert response.status_code == 429
+
+
+def test_forwarded_for_is_used_behind_a_trusted_proxy(app):
+    with app.test_request_context(
+        environ_base={"REMOTE_ADDR": "10.0.0.1"},
+        headers={"X-Forwarded-For": "203.0.113.7"},
+    ):
+        assert get_client_ip() == "10.0.0.1"
+
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    seen = []
+
+    @app.route("/client-ip")
+    def client_ip():
+        seen.append(get_client_ip())
+        return ""
+
+    app.test_client().get(
+        "/client-ip",
+        environ_base={"REMOTE_ADDR": "10.0.0.1"},
+        headers={"X-Forwarded-For": "203.0.113.7"},
+    )
+    assert seen == ["203.0.113.7"]
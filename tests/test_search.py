@@ -0,0 +1,49 @@
+import pytest
+import services.search as search
+from models.db_connection import get_db_connection
+from services.search import get_portfolio_search_index, invalidate_portfolio_index
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(search, "_portfolio_indexes", search.OrderedDict())
+
+
+def add_coin(user_id, name, abbreviation):
+    with get_db_connection() as conn:
+        conn.execute(
+            "INSERT INTO portfolio (user_id, name, abbreviation, amount) "
+            "VALUES (?, ?, ?, 1)",
+            (user_id, name, abbreviation),
+        )
+
+
+def test_portfolio_index_is_cached_until_invalidated(db):
+    add_coin(1, "Bitcoin", "BTC")
+    index, rows = get_portfolio_search_index(1)
+    assert [rows[doc]["name"] for doc in index.search("btc")] == ["Bitcoin"]
+
+    add_coin(1, "Bitcoin Cash", "BCH")
+    assert get_portfolio_search_index(1)[0] is index
+
+    invalidate_portfolio_index(1)
+    index, rows = get_portfolio_search_index(1)
+    assert [rows[doc]["name"] for doc in index.search("bitcoin")] == [
+        "Bitcoin",
+        "Bitcoin Cash",
+    ]
+
+
+def test_portfolio_indexes_expire(db, monkeypatch):
+    monkeypatch.setattr(search, "PORTFOLIO_INDEX_TTL", -1)
+    first = get_portfolio_search_index(1)[0]
+    assert get_portfolio_search_index(1)[0] is not first
+
+
+def test_portfolio_indexes_are_bounded(db, monkeypatch):
+    monkeypatch.setattr(search, "PORTFOLIO_INDEX_CACHE_SIZE", 2)
+    for user_id in (1, 2, 1, 3):
+        get_portfolio_search_index(user_id)
+
+    # User 2 was the least recently used
+    assert list(search._portfolio_indexes) == [1, 3]
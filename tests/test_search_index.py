@@ -0,0 +1,63 @@
+import pytest
+from utils.search_index import SearchIndex
+
+
+COINS = [
+    ("Bitcoin", "btc"),
+    ("Ethereum", "eth"),
+    ("Bitcoin Cash", "bch"),
+    ("Wrapped Bitcoin", "wbtc"),
+    ("Ethereum Classic", "etc"),
+    ("Tether", "usdt"),
+    ("Celo", "celo"),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SearchIndex(COINS)
+
+
+def names(index, query, **kwargs):
+    return [COINS[doc][0] for doc in index.search(query, **kwargs)]
+
+
+def test_ranks_exact_then_prefix_then_word_prefix(index):
+    assert names(index, "bitcoin") == ["Bitcoin", "Bitcoin Cash", "Wrapped Bitcoin"]
+
+
+def test_matches_symbols_case_insensitively(index):
+    assert names(index, "ETH")[:2] == ["Ethereum", "Ethereum Classic"]
+    assert names(index, "usdt") == ["Tether"]
+
+
+def test_substring_matches_in_document_order(index):
+    assert names(index, "her", fuzzy=False) == [
+        "Ethereum",
+        "Ethereum Classic",
+        "Tether",
+    ]
+
+
+@pytest.mark.parametrize(
+    "typo, expected",
+    [("bitcon", "Bitcoin"), ("etherum", "Ethereum"), ("ethreum", "Ethereum"), ("tethr", "Tether")],
+)
+def test_fuzzy_matches_typos(index, typo, expected):
+    assert names(index, typo)[0] == expected
+
+
+def test_fuzzy_matching_can_be_disabled(index):
+    assert names(index, "bitcon", fuzzy=False) == []
+
+
+def test_unrelated_query_matches_nothing(index):
+    assert names(index, "dogecoin") == []
+
+
+def test_empty_query_returns_every_document(index):
+    assert index.search("  ") == list(range(len(COINS)))
+
+
+def test_names_starting_with(index):
+    assert index.names_starting_with("B") == [0, 2]
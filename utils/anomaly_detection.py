@@ -1,67 +1,71 @@
+import numpy as np
 from sklearn.ensemble import IsolationForest
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Mapping, Optional, Sequence
 
 
-def preprocess_data(
-    gainers: List[Dict[str, Any]], losers: List[Dict[str, Any]]
-) -> Tuple[List[List[float]], List[str]]:
-    """
-    Extract features and coin IDs from gainers and losers.
-
-    Args:
-        gainers (List[Dict[str, Any]]): List of gainers.
-        losers (List[Dict[str, Any]]): List of losers.
+FEATURE_NAMES = (
+    "log_market_cap",
+    "log_total_volume",
+    "price_change_percentage_24h",
+    "ath_distance",
+    "volume_to_market_cap",
+)
 
-    Returns:
-        Tuple[List[List[float]], List[str]]: Features for outlier detection and coin IDs.
-    """
-    features = []
-    coin_ids = []
-
-    for coin in gainers + losers:
-        price = coin.get("current_price", 0.0)  # Default to 0.0 if not available
-        market_cap = coin.get("market_cap", 0.0)
-        total_volume = coin.get("total_volume", 0.0)
 
-        features.append([price, market_cap, total_volume])
-        coin_ids.append(coin.get("id", "unknown"))
+def column(coins: Sequence[Mapping[str, Any]], field: str) -> np.ndarray:
+    """Return one field of every coin as a float array, with NaN for missing values."""
+    return np.array([coin.get(field) for coin in coins], dtype=np.float64)
 
-    return features, coin_ids
 
-
-def detect_outliers(
-    features: List[List[float]], contamination: float = 0.1
-) -> List[int]:
+def extract_features(coins: Sequence[Mapping[str, Any]]) -> np.ndarray:
     """
-    Use Isolation Forest to detect outliers.
+    Build the feature matrix used for outlier detection.
+
+    Features are computed column-wise over all coins at once: log-scaled
+    market cap and volume, 24h price change, distance from the all-time high
+    (0 at the ATH, -1 at zero) and the volume to market cap ratio.
 
     Args:
-        features (List[List[float]]): Numerical features for the model.
-        contamination (float): The proportion of outliers in the data.
+        coins (Sequence[Mapping[str, Any]]): Coins as returned by the markets endpoint.
 
     Returns:
-        List[int]: Array of anomaly labels (-1 for outliers, 1 for inliers).
+        np.ndarray: One row of FEATURE_NAMES per coin; missing values are 0.
     """
-    model = IsolationForest(contamination=contamination, random_state=42)
-    model.fit(features)
-    return model.predict(features).tolist()
-
-
-def make_hashable(coin: Any) -> Any:
+    price = column(coins, "current_price")
+    market_cap = column(coins, "market_cap")
+    volume = column(coins, "total_volume")
+    ath = column(coins, "ath")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features = np.column_stack(
+            (
+                np.log1p(np.clip(market_cap, 0, None)),
+                np.log1p(np.clip(volume, 0, None)),
+                column(coins, "price_change_percentage_24h"),
+                np.where(ath > 0, price / ath - 1, np.nan),
+                np.where(market_cap > 0, volume / market_cap, np.nan),
+            )
+        )
+    return np.nan_to_num(features, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def fit_isolation_forest(
+    features: np.ndarray, contamination: float = 0.1
+) -> IsolationForest:
     """
-    Recursively convert dictionaries or lists to hashable tuples.
+    Fit an Isolation Forest for outlier detection.
 
     Args:
-        coin (Any): Data to be converted.
+        features (np.ndarray): Numerical features for the model.
+        contamination (float): The proportion of outliers in the data.
 
     Returns:
-        Any: Hashable representation of the data.
+        IsolationForest: The fitted model; `predict` labels outliers -1 and
+        inliers 1, and `score_samples` is lower for more anomalous rows.
     """
-    if isinstance(coin, dict):
-        return tuple((k, make_hashable(v)) for k, v in coin.items())
-    elif isinstance(coin, list):
-        return tuple(make_hashable(v) for v in coin)
-    return coin  # Return primitive values unchanged
+    model = IsolationForest(contamination=contamination, random_state=42)
+    model.fit(features)
+    return model
 
 
 def format_coin(coin: Dict[str, Any]) -> Dict[str, Any]:
@@ -77,6 +81,7 @@ def format_coin(coin: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "id": coin.get("id", "N/A"),
         "name": coin.get("name", "N/A"),
+        "symbol": coin.get("symbol", "N/A"),
         "rank": coin.get("market_cap_rank", "N/A"),
         "current_price": coin.get("current_price", "N/A"),
         "percentage_gain": coin.get("price_change_percentage_24h", "N/A"),
@@ -87,7 +92,10 @@ def format_coin(coin: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def combine_results(
-    labels: List[int], gainers: List[Dict[str, Any]], losers: List[Dict[str, Any]]
+    labels: List[int],
+    gainers: List[Dict[str, Any]],
+    losers: List[Dict[str, Any]],
+    scores: Optional[List[float]] = None,
 ) -> Dict[str, List[Dict[str, Any]]]:
     """
     Combine gainers and losers with their outlier labels.
@@ -96,6 +104,7 @@ def combine_results(
         labels (List[int]): Outlier labels (-1 for outliers, 1 for inliers).
         gainers (List[Dict[str, Any]]): List of gainers.
         losers (List[Dict[str, Any]]): List of losers.
+        scores (Optional[List[float]]): Anomaly scores, added to each coin as `anomaly_score`.
 
     Returns:
         Dict[str, List[Dict[str, Any]]]: Dictionary with outliers and inliers.
@@ -106,13 +115,17 @@ def combine_results(
     filtered_labels = []
 
     for i, coin in enumerate(combined):
-        formatted_coin = format_coin(coin)
-        coin_tuple = make_hashable(formatted_coin)
+        # A coin can be both a gainer and a loser when few coins are owned
+        coin_id = coin.get("id", coin.get("name"))
+        if coin_id in seen:
+            continue
+        seen.add(coin_id)
 
-        if coin_tuple not in seen:
-            seen.add(coin_tuple)
-            unique_combined.append(formatted_coin)
-            filtered_labels.append(labels[i])  # Keep corresponding label
+        formatted_coin = format_coin(coin)
+        if scores is not None:
+            formatted_coin["anomaly_score"] = round(scores[i], 4)
+        unique_combined.append(formatted_coin)
+        filtered_labels.append(labels[i])  # Keep corresponding label
 
     outliers = [
         unique_combined[i] for i, label in enumerate(filtered_labels) if label == -1
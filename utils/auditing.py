@@ -1,14 +1,206 @@
-from models.db_connection import get_db_cursor
+from models.db_connection import get_db_connection
 from utils.logger import logger
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import os
+import queue
 import sqlite3
+import threading
 import time
 from flask import request
 
 
+# Events buffered before new ones are dropped
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", 10000))
+AUDIT_BATCH_SIZE = 200  # Events written per transaction, at most
+AUDIT_FLUSH_INTERVAL = 1.0  # Seconds an event may wait for its batch to fill
+AUDIT_WRITE_RETRIES = 5
+AUDIT_RETRY_BACKOFF = 0.1  # Base backoff in seconds, doubled on every retry
+AUDIT_RETRY_BACKOFF_MAX = 2.0
+AUDIT_SHUTDOWN_TIMEOUT = 5.0  # Seconds to wait for the writer when the process exits
+
+INSERT_AUDIT_EVENT_QUERY = """
+    INSERT INTO audit_log (event_type, username, ip_address, user_agent, status, error_message, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+AuditEvent = Tuple[str, Optional[str], str, str, str, Optional[str], str]
+
+
+class AuditWriter:
+    """
+    Writes audit events to the database from a background thread.
+
+    Callers only enqueue: events are written in batches of up to
+    `batch_size` rows per transaction, or whatever arrived within
+    `flush_interval` seconds. When the queue is full new events are dropped
+    and counted rather than blocking the request. Lock retries happen on
+    the writer thread.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = AUDIT_QUEUE_SIZE,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._stats = {
+            "queued": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "batches": 0,
+        }
+        self._reset_state()
+
+    def _reset_state(self) -> None:
+        self._pid = os.getpid()
+        self._queue: "queue.Queue[AuditEvent]" = queue.Queue(self._maxsize)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> None:
+        # The writer thread does not survive a fork (e.g. gunicorn workers)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_state()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="audit-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, event: AuditEvent) -> bool:
+        """
+        Enqueue an event for writing without blocking.
+
+        Args:
+            event (AuditEvent): Row values, in INSERT_AUDIT_EVENT_QUERY order.
+
+        Returns:
+            bool: False if the queue was full and the event was dropped.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self._stats["dropped"] += 1
+                dropped = self._stats["dropped"]
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"Audit queue full, {dropped} events dropped so far.")
+            return False
+        with self._lock:
+            self._stats["queued"] += 1
+        return True
+
+    def _next_batch(self) -> List[AuditEvent]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> List[AuditEvent]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[AuditEvent]) -> None:
+        for attempt in range(AUDIT_WRITE_RETRIES):
+            try:
+                with get_db_connection() as conn:
+                    conn.executemany(INSERT_AUDIT_EVENT_QUERY, batch)
+                with self._lock:
+                    self._stats["written"] += len(batch)
+                    self._stats["batches"] += 1
+                logger.debug(f"Wrote {len(batch)} audit events.")
+                return
+            except sqlite3.OperationalError as e:
+                if "database is locked" not in str(e):
+                    logger.error(f"Failed to write {len(batch)} audit events: {e}")
+                    break
+                wait_time = min(
+                    AUDIT_RETRY_BACKOFF * (2**attempt), AUDIT_RETRY_BACKOFF_MAX
+                )
+                logger.warning(
+                    f"Database is locked. Retrying audit write in {wait_time:.2f} "
+                    f"seconds... ({AUDIT_WRITE_RETRIES - attempt - 1} retries left)"
+                )
+                time.sleep(wait_time)
+            except Exception as e:
+                logger.error(f"Unexpected error writing {len(batch)} audit events: {e}")
+                break
+
+        with self._lock:
+            self._stats["failed"] += len(batch)
+
+    def flush(self) -> None:
+        """Write every queued event from the calling thread."""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout: float = AUDIT_SHUTDOWN_TIMEOUT) -> None:
+        """Stop the writer thread and write whatever is still queued."""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and write counters for monitoring."""
+        with self._lock:
+            return {
+                **self._stats,
+                "pending": self._queue.qsize(),
+                "max_size": self._maxsize,
+                "running": self._thread is not None and self._thread.is_alive(),
+            }
+
+
+audit_writer = AuditWriter()
+atexit.register(audit_writer.close)
+
+
 def log_audit_event(
     request, event_type: str, username: str, status: str, error_message: str = None
 ) -> None:
-    """Logs an audit event to the SQLite database with retry logic.
+    """Queues an audit event to be written to the SQLite database.
+
+    The event is timestamped now and written by the background audit writer,
+    so this never waits on the database.
 
     Args:
         request (flask.Request): The Flask request object.
@@ -21,80 +213,32 @@ def log_audit_event(
     user_agent = request.headers.get(
         "User-Agent", "Unknown"
     )  # Default to "Unknown" if missing
-    retries = 5
-    initial_wait_time = 0.1  # Starting backoff time (in seconds)
-    max_wait_time = 2.0  # Cap the backoff time
+    # Same format and timezone (UTC) as the column's CURRENT_TIMESTAMP default
+    created_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
-    while retries > 0:
-        try:
-            # Get the connection and cursor
-            cursor, conn = get_db_cursor()
-            try:
-                cursor.execute(
-                    """
-                    INSERT INTO audit_log (event_type, username, ip_address, user_agent, status, error_message)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """,
-                    (
-                        event_type,
-                        username,
-                        ip_address,
-                        user_agent,
-                        status,
-                        error_message,
-                    ),
-                )
-                conn.commit()
-                logger.info(
-                    f"Audit event logged successfully: event_type={event_type}, username={username}"
-                )
-                return  # Exit after successful logging
-            finally:
-                # Ensure cursor and connection are closed
-                cursor.close()
-                conn.close()
-
-        except sqlite3.OperationalError as e:
-            # Retry only on database lock
-            if "database is locked" in str(e):
-                retries -= 1
-                wait_time = min(
-                    initial_wait_time * (2 ** (5 - retries)), max_wait_time
-                )  # Exponential backoff
-                logger.warning(
-                    f"Database is locked. Retrying in {wait_time:.2f} seconds... "
-                    f"({retries} retries left) - event_type={event_type}, username={username}"
-                )
-                time.sleep(wait_time)
-            else:
-                logger.error(
-                    f"Failed to log audit event: {str(e)} - event_type={event_type}, username={username}"
-                )
-                raise
-
-        except Exception as e:
-            logger.error(
-                f"Unexpected error during audit logging: {str(e)} - event_type={event_type}, username={username}"
-            )
-            raise
-
-    # If retries exhausted
-    logger.error(
-        f"Max retries reached. Could not log audit event: event_type={event_type}, username={username}"
+    event = (
+        event_type,
+        username,
+        ip_address,
+        user_agent,
+        status,
+        error_message,
+        created_at,
     )
+    if audit_writer.submit(event):
+        logger.debug(
+            f"Audit event queued: event_type={event_type}, username={username}"
+        )
 
 
 def get_client_ip() -> str:
     """Retrieve the client's IP address from the request.
 
+    X-Forwarded-For is client-supplied, so it is not read here. Behind a
+    reverse proxy, set TRUSTED_PROXIES so that main.py installs werkzeug's
+    ProxyFix, which sets remote_addr from the proxy's forwarded address.
+
     Returns:
         str: The client's IP address.
     """
-    x_forwarded_for = request.headers.get("X-Forwarded-For")
-    if x_forwarded_for:
-        # Extract the first IP in the list
-        ip = x_forwarded_for.split(",")[0].strip()
-    else:
-        # Fallback to remote_addr if no X-Forwarded-For is present
-        ip = request.remote_addr or "Unknown"  # Default to "Unknown" if missing
-    return ip
+    return request.remote_addr or "Unknown"  # Default to "Unknown" if missing
@@ -1,29 +1,156 @@
 from utils.logger import logger
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Tuple, Optional, Dict, Any
+from types import MappingProxyType
+from typing import List, Tuple, Optional, Dict, Any, Mapping, Iterable
+from urllib.parse import urlparse
+import os
+import random
+import threading
+import time
 import requests
+from dateutil.parser import parse
+from requests.adapters import HTTPAdapter
 from models.database import get_db_connection
 from pydantic import BaseModel, ValidationError
-import json
 
 
 # Constants
 CACHE_EXPIRY = 180  # Cache expiry time in seconds
+MIN_REFRESH_AGE = 60  # Cached data younger than this is reused instead of calling the API
 COINGECKO_API_BASE_URL = "https://api.coingecko.com/api/v3"
+MARKET_PAGES = int(os.getenv("COINGECKO_MARKET_PAGES", 4))  # 250 coins per page
+MARKET_PAGE_SIZE = 250
+MAX_CONCURRENT_REQUESTS = int(os.getenv("COINGECKO_MAX_CONCURRENCY", 4))  # Per host
+REQUEST_TIMEOUT = 10  # Seconds
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0  # Base backoff in seconds, doubled on every retry
+RETRY_BACKOFF_MAX = 10.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+PRICE_BATCH_SIZE = 250  # Coin ids per simple/price request
+
+# Market page fields shown as 0 when the API has no value
+DEFAULT_ZERO_FIELDS = (
+    "price_change_percentage_24h",
+    "max_supply",
+    "high_24h",
+    "low_24h",
+    "price_change_24h",
+    "market_cap_change_24h",
+    "market_cap_change_percentage_24h",
+    "fully_diluted_valuation",
+)
+DATE_FIELDS = ("ath_date", "atl_date", "last_updated")
+
+
+def parse_date(value: str) -> datetime:
+    """Parse an API timestamp, taking the fast path for ISO 8601."""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return parse(value)
+
 
-# SQL Query Constants
-SELECT_CACHE_QUERY = """
-    SELECT gainers, losers FROM gainers_losers_cache
-    WHERE user_id = ? AND owned_coins = ?
-"""
-DELETE_CACHE_QUERY = """
-    DELETE FROM gainers_losers_cache
-    WHERE user_id = ? AND owned_coins = ?
-"""
-INSERT_CACHE_QUERY = """
-    INSERT INTO gainers_losers_cache (user_id, owned_coins, gainers, losers, timestamp)
-    VALUES (?, ?, ?, ?, ?)
-"""
+@dataclass(frozen=True)
+class MarketRow:
+    """
+    A cryptocurrency formatted for display, built once per market snapshot.
+
+    Dates are parsed and the numeric fields the market page compares or rounds
+    default to 0 instead of None.
+    """
+
+    name: str
+    symbol: str
+    image: Optional[str]
+    current_price: Optional[float]
+    market_cap: Optional[int]
+    market_cap_rank: Optional[int]
+    fully_diluted_valuation: float
+    total_volume: Optional[float]
+    high_24h: float
+    low_24h: float
+    price_change_24h: float
+    price_change_percentage_24h: float
+    market_cap_change_24h: float
+    market_cap_change_percentage_24h: float
+    circulating_supply: Optional[float]
+    total_supply: Optional[float]
+    max_supply: float
+    ath: Optional[float]
+    ath_change_percentage: Optional[float]
+    ath_date: Optional[datetime]
+    atl: Optional[float]
+    atl_change_percentage: Optional[float]
+    atl_date: Optional[datetime]
+    last_updated: Optional[datetime]
+
+    @classmethod
+    def from_coin(cls, coin: Mapping[str, Any]) -> "MarketRow":
+        """
+        Build a display row from a cryptocurrency row.
+
+        Args:
+            coin (Mapping[str, Any]): Cryptocurrency row, as stored in the cryptocurrencies table.
+
+        Returns:
+            MarketRow: The formatted row.
+        """
+        row = {field: coin.get(field) for field in cls.__dataclass_fields__}
+        for field in DEFAULT_ZERO_FIELDS:
+            row[field] = row[field] or 0
+        for field in DATE_FIELDS:
+            row[field] = parse_date(row[field]) if row[field] else None
+        return cls(**row)
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """
+    Immutable view of the cached top 1000 cryptocurrencies.
+
+    One snapshot is shared by every request and thread until the market data
+    is refreshed, at which point a new snapshot with a higher version replaces it.
+    `rows` holds the same coins, in the same order, formatted for display.
+    """
+
+    version: int
+    fetched_at: datetime
+    coins: Tuple[Mapping[str, Any], ...]
+    rows: Tuple[MarketRow, ...] = ()
+
+    def age(self) -> float:
+        """Seconds since the underlying market data was fetched."""
+        return (datetime.now() - self.fetched_at).total_seconds()
+
+
+EMPTY_SNAPSHOT = MarketSnapshot(version=0, fetched_at=datetime.min, coins=())
+
+# Shared HTTP session so requests reuse keep-alive connections
+_session = requests.Session()
+_session.headers.update(
+    {"Accept": "application/json", "Accept-Encoding": "gzip, deflate"}
+)
+_session.mount(
+    "https://",
+    HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONCURRENT_REQUESTS),
+)
+_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+_host_limits_lock = threading.Lock()
+
+_snapshot: Optional[MarketSnapshot] = None
+_snapshot_lock = threading.Lock()
+_refresh_lock = threading.Lock()  # Held by the single in-flight refresh
+# Coalesced callers and the metrics view touch the counters outside _refresh_lock
+_refresh_metrics_lock = threading.Lock()
+_refresh_metrics = {
+    "refreshes": 0,
+    "failures": 0,
+    "coalesced": 0,
+    "last_duration": None,
+    "last_refresh_at": None,
+}
 
 
 class CryptoData(BaseModel):
@@ -67,43 +194,74 @@ def fetch_data_from_api(
         Optional[List[Dict[str, Any]]]: API response as a list of dictionaries, or None on failure.
     """
     url = f"{COINGECKO_API_BASE_URL}/{endpoint}"
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"API request failed: {e}")
-        return None
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            with _host_limit(url):
+                response = _session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            if response.status_code in RETRY_STATUS_CODES and attempt < MAX_RETRIES:
+                wait_time = _retry_wait_time(response, attempt)
+                logger.warning(
+                    f"API returned {response.status_code}, retrying in {wait_time:.2f} seconds... "
+                    f"({MAX_RETRIES - attempt} retries left)"
+                )
+                time.sleep(wait_time)
+                continue
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"API request failed: {e}")
+            return None
+    return None
 
 
-def validate_crypto_data(data: List[Dict[str, Any]]) -> List[CryptoData]:
-    valid_data = []
-    for item in data:
-        try:
-            valid_data.append(CryptoData(**item))
-        except ValidationError as e:
-            logger.warning(f"Validation failed for item: {e}")
-    return valid_data
+def _host_limit(url: str) -> threading.BoundedSemaphore:
+    """Return the semaphore capping concurrent requests to the host of `url`."""
+    host = urlparse(url).netloc
+    with _host_limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+        return _host_limits[host]
 
 
-def is_cache_valid(cursor, query: str, params: Tuple) -> bool:
+def _retry_wait_time(response: requests.Response, attempt: int) -> float:
+    """Honour Retry-After when given, otherwise use exponential backoff with jitter."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), RETRY_BACKOFF_MAX)
+    backoff = min(RETRY_BACKOFF * (2**attempt), RETRY_BACKOFF_MAX)
+    return random.uniform(backoff / 2, backoff)
+
+
+def fetch_market_pages(pages: int, params: Dict[str, Any]) -> List[Optional[Any]]:
     """
-    Check if cached data is valid.
+    Fetch pages 1..`pages` of coins/markets concurrently.
 
     Args:
-        cursor: SQLite cursor.
-        query (str): SQL query to fetch timestamp.
-        params (tuple): Query parameters.
+        pages (int): Number of pages to fetch.
+        params (dict): Query parameters shared by every page.
 
     Returns:
-        bool: True if the cache is valid, otherwise False.
+        List[Optional[Any]]: API responses in page order, None for failed pages.
     """
-    cursor.execute(query, params)
-    result = cursor.fetchone()
-    if result and result[0]:
-        last_cache_time = datetime.fromisoformat(result[0])
-        return (datetime.now() - last_cache_time).total_seconds() < CACHE_EXPIRY
-    return False
+
+    def fetch_page(page: int) -> Optional[Any]:
+        return fetch_data_from_api("coins/markets", {**params, "page": page})
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(pages, MAX_CONCURRENT_REQUESTS)),
+        thread_name_prefix="coingecko",
+    ) as executor:
+        return list(executor.map(fetch_page, range(1, pages + 1)))
+
+
+def validate_crypto_data(data: List[Dict[str, Any]]) -> List[CryptoData]:
+    valid_data = []
+    for item in data:
+        try:
+            valid_data.append(CryptoData(**item))
+        except ValidationError as e:
+            logger.warning(f"Validation failed for item: {e}")
+    return valid_data
 
 
 # Function to get current price from CoinGecko API
@@ -127,6 +285,59 @@ def get_current_price(name: str, target_currency: str = "usd") -> Optional[float
     return None
 
 
+def get_current_prices(
+    names: Iterable[str], target_currency: str = "usd"
+) -> Dict[str, float]:
+    """
+    Get the current prices of many cryptocurrencies at once.
+
+    USD prices come from the market snapshot while it is fresh; any coins it
+    does not cover are fetched with batched simple/price requests.
+
+    Args:
+        names (Iterable[str]): Cryptocurrency names (CoinGecko ids).
+        target_currency (str): Target currency (default: 'usd').
+
+    Returns:
+        Dict[str, float]: Current price by lowercased name, for every name a price was found for.
+    """
+    wanted = {name.lower() for name in names}
+    prices: Dict[str, float] = {}
+
+    snapshot = get_market_snapshot()
+    if target_currency == "usd" and snapshot.age() < CACHE_EXPIRY:
+        for crypto in snapshot.coins:
+            name = crypto["name"].lower()
+            if name in wanted and crypto["current_price"] is not None:
+                prices[name] = crypto["current_price"]
+
+    missing = sorted(wanted - prices.keys())
+    batches = [
+        missing[i : i + PRICE_BATCH_SIZE]
+        for i in range(0, len(missing), PRICE_BATCH_SIZE)
+    ]
+
+    def fetch_batch(batch: List[str]) -> Optional[Dict[str, Any]]:
+        params = {"ids": ",".join(batch), "vs_currencies": target_currency}
+        return fetch_data_from_api("simple/price", params)
+
+    if batches:
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(len(batches), MAX_CONCURRENT_REQUESTS)),
+            thread_name_prefix="coingecko",
+        ) as executor:
+            for data in executor.map(fetch_batch, batches):
+                for name, quote in (data or {}).items():
+                    if quote.get(target_currency) is not None:
+                        prices[name] = quote[target_currency]
+
+    logger.info(
+        f"Resolved {len(prices)}/{len(wanted)} prices "
+        f"({len(wanted) - len(missing)} from snapshot, {len(batches)} API batches)."
+    )
+    return prices
+
+
 def cache_cryptos_in_db(cursor, cryptos: List[CryptoData]):
     cursor.execute("DELETE FROM cryptocurrencies")  # Clear old data
     for crypto in cryptos:
@@ -171,36 +382,47 @@ def cache_cryptos_in_db(cursor, cryptos: List[CryptoData]):
         )
 
 
-def get_top_1000_crypto() -> List[Dict[str, Any]]:
+def read_cached_cryptos() -> Tuple[List[Dict[str, Any]], Optional[datetime]]:
     """
-    Fetch the top 1000 cryptocurrencies by market cap.
+    Read the cached cryptocurrencies table, whatever its age.
 
     Returns:
-        List[Dict[str, Any]]: List of cryptocurrency data.
+        Tuple[List[Dict[str, Any]], Optional[datetime]]: Cryptocurrency data and the time it was fetched (None if empty).
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(timestamp) FROM cryptocurrencies")
+        result = cursor.fetchone()
+        if not result or not result[0]:
+            return [], None
+
+        cursor.execute("SELECT * FROM cryptocurrencies ORDER BY id")
+        return [dict(row) for row in cursor.fetchall()], datetime.fromisoformat(
+            result[0]
+        )
+
+
+def fetch_top_1000_crypto(pages: int = MARKET_PAGES) -> List[CryptoData]:
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    Fetch the top cryptocurrencies by market cap from the CoinGecko API.
 
-    if is_cache_valid(cursor, "SELECT MAX(timestamp) FROM cryptocurrencies", ()):
-        logger.info("Using cached data from SQLite.")
-        cursor.execute("SELECT * FROM cryptocurrencies")
-        cryptos = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return cryptos
+    Args:
+        pages (int): Number of 250-coin pages to fetch (4 for the top 1000).
 
-    logger.info("Fetching data from CoinGecko API.")
+    Returns:
+        List[CryptoData]: Validated cryptocurrency data.
+    """
     all_cryptos = []
     params = {
         "vs_currency": "usd",
         "order": "market_cap_desc",
-        "per_page": 250,
+        "per_page": MARKET_PAGE_SIZE,
         "sparkline": "false",
         "price_change_percentage": "24h",
     }
 
-    for page in range(1, 5):
-        params["page"] = page
-        data = fetch_data_from_api("coins/markets", params)
+    # Keep only the leading run of pages that succeeded, so ranks stay contiguous
+    for page, data in enumerate(fetch_market_pages(pages, params), start=1):
         if data:
             validated_data = validate_crypto_data(data)
             all_cryptos.extend(validated_data)
@@ -208,101 +430,146 @@ def get_top_1000_crypto() -> List[Dict[str, Any]]:
             logger.error(f"Error fetching data from page {page}.")
             break
 
-    cache_cryptos_in_db(cursor, all_cryptos)
-    conn.commit()
-    conn.close()
+    return all_cryptos
 
-    return [crypto.model_dump() for crypto in all_cryptos]
 
-
-def fetch_gainers_and_losers_owned(
-    user_id: int, owned_coins: List[str]
-) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+def publish_snapshot(
+    cryptos: List[Dict[str, Any]], fetched_at: datetime
+) -> MarketSnapshot:
     """
-    Fetch the top gainers and losers for owned coins with caching.
+    Replace the shared snapshot, unless it already holds data fetched at `fetched_at`.
 
     Args:
-        user_id (int): User ID.
-        owned_coins (List[str]): List of owned coin IDs.
+        cryptos (List[Dict[str, Any]]): Cryptocurrency rows.
+        fetched_at (datetime): When the rows were fetched from the API.
 
     Returns:
-        Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: Gainers and losers.
+        MarketSnapshot: The current market snapshot.
     """
-    if not owned_coins:
-        logger.info("No owned coins provided.")
-        return [], []
-
-    conn = None
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Check cache validity
-        if is_cache_valid(
-            cursor,
-            "SELECT timestamp FROM gainers_losers_cache WHERE user_id = ? AND owned_coins = ?",
-            (user_id, ",".join(owned_coins)),
-        ):
-            logger.info("Using cached gainers/losers data.")
-            cursor.execute(SELECT_CACHE_QUERY, (user_id, ",".join(owned_coins)))
-            result = cursor.fetchone()
-            if result:
-                return json.loads(result[0]), json.loads(result[1])
-
-        # Fetch data from API
-        logger.info("Fetching gainers and losers from API.")
-        params = {
-            "vs_currency": "usd",
-            "ids": ",".join(owned_coins),
-            "order": "market_cap_desc",
-            "per_page": len(owned_coins),
-            "price_change_percentage": "24h",
-        }
-        data = fetch_data_from_api("coins/markets", params)
-        if not data:
-            logger.error("Failed to fetch data from API.")
-            return [], []
-
-        # Filter and sort data
-        filtered_data = [
-            coin for coin in data if coin.get("price_change_percentage_24h") is not None
-        ]
-        gainers = sorted(
-            filtered_data, key=lambda x: x["price_change_percentage_24h"], reverse=True
+    global _snapshot
+    with _snapshot_lock:
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.fetched_at == fetched_at:
+            return snapshot
+
+        _snapshot = MarketSnapshot(
+            version=(snapshot.version + 1) if snapshot else 1,
+            fetched_at=fetched_at,
+            coins=tuple(MappingProxyType(crypto) for crypto in cryptos),
+            rows=tuple(MarketRow.from_coin(crypto) for crypto in cryptos),
         )
-        losers = sorted(
-            filtered_data, key=lambda x: x["price_change_percentage_24h"]
+        logger.info(
+            f"Market snapshot v{_snapshot.version} loaded with {len(cryptos)} coins."
         )
+        return _snapshot
 
-        # Adjust results based on the number of items
-        if len(filtered_data) < 4:
-            gainers = gainers[:1]
-            losers = losers[:1]
-        elif len(filtered_data) < 6:
-            gainers = gainers[:2]
-            losers = losers[:2]
-        else:
-            gainers = gainers[:3]
-            losers = losers[:3]
 
-        # Cache results
-        cursor.execute(DELETE_CACHE_QUERY, (user_id, ",".join(owned_coins)))
-        cursor.execute(
-            INSERT_CACHE_QUERY,
-            (
-                user_id,
-                ",".join(owned_coins),
-                json.dumps(gainers),
-                json.dumps(losers),
-                datetime.now().isoformat(),
-            ),
-        )
-        conn.commit()
+def _count_refresh(metric: str) -> None:
+    with _refresh_metrics_lock:
+        _refresh_metrics[metric] += 1
+
 
-        return gainers, losers
+def refresh_market_data() -> Optional[MarketSnapshot]:
+    """
+    Refresh the cryptocurrencies table and publish a new market snapshot.
+
+    Only one refresh runs at a time; concurrent callers wait for the in-flight
+    refresh and share its result. Data refreshed less than MIN_REFRESH_AGE ago
+    (e.g. by another worker process) is loaded from SQLite instead of the API.
+
+    Returns:
+        Optional[MarketSnapshot]: The current market snapshot, or None if no data is available.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        _count_refresh("coalesced")
+        with _refresh_lock:
+            return _snapshot
+
+    started = time.monotonic()
+    try:
+        cryptos, fetched_at = read_cached_cryptos()
+        if (
+            fetched_at is None
+            or (datetime.now() - fetched_at).total_seconds() >= MIN_REFRESH_AGE
+        ):
+            logger.info("Fetching data from CoinGecko API.")
+            fetched = fetch_top_1000_crypto()
+            if fetched:
+                with get_db_connection() as conn:
+                    cache_cryptos_in_db(conn.cursor(), fetched)
+                cryptos, fetched_at = read_cached_cryptos()
+            else:
+                _count_refresh("failures")
+                logger.error("Market refresh returned no data; keeping cached data.")
+
+        if fetched_at is None:
+            return _snapshot
+
+        snapshot = publish_snapshot(cryptos, fetched_at)
+        with _refresh_metrics_lock:
+            _refresh_metrics["refreshes"] += 1
+            _refresh_metrics["last_refresh_at"] = datetime.now().isoformat()
+        return snapshot
     except Exception as e:
-        logger.error(f"Error fetching gainers and losers: {e}")
-        return [], []
+        _count_refresh("failures")
+        logger.error(f"Error refreshing market data: {e}")
+        return _snapshot
     finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+        with _refresh_metrics_lock:
+            _refresh_metrics["last_duration"] = round(time.monotonic() - started, 3)
+        _refresh_lock.release()
+
+
+def refresh_market_data_in_background() -> None:
+    """Start a market refresh on a background thread unless one is already running."""
+    if _refresh_lock.locked():
+        return
+    threading.Thread(
+        target=refresh_market_data, name="market-refresh", daemon=True
+    ).start()
+
+
+def get_market_snapshot() -> MarketSnapshot:
+    """
+    Return the shared market snapshot without blocking on the API.
+
+    Stale data is served while a background refresh runs. Only a cold start
+    with an empty cache waits for the API.
+
+    Returns:
+        MarketSnapshot: The current market snapshot (empty if no data could be loaded).
+    """
+    snapshot = _snapshot
+    if snapshot is None:
+        cryptos, fetched_at = read_cached_cryptos()
+        if fetched_at is not None:
+            snapshot = publish_snapshot(cryptos, fetched_at)
+        else:
+            snapshot = refresh_market_data() or EMPTY_SNAPSHOT
+
+    if snapshot.age() >= CACHE_EXPIRY:
+        refresh_market_data_in_background()
+    return snapshot
+
+
+def get_refresh_metrics() -> Dict[str, Any]:
+    """Return market refresh counters along with the current snapshot version and age."""
+    snapshot = _snapshot
+    with _refresh_metrics_lock:
+        metrics = dict(_refresh_metrics)
+    return {
+        **metrics,
+        "in_flight": _refresh_lock.locked(),
+        "snapshot_version": snapshot.version if snapshot else 0,
+        "snapshot_age": round(snapshot.age(), 1) if snapshot else None,
+    }
+
+
+def get_top_1000_crypto() -> List[Dict[str, Any]]:
+    """
+    Fetch the top 1000 cryptocurrencies by market cap.
+
+    Returns:
+        List[Dict[str, Any]]: Mutable copies of the cryptocurrency data in the current snapshot.
+    """
+    return [dict(crypto) for crypto in get_market_snapshot().coins]
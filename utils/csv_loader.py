@@ -1,8 +1,31 @@
 import csv
+import math
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Tuple
 from models.db_connection import get_db_connection
+from services.ledger import update_ledger
 from utils.logger import logger
 
 
+IMPORT_CHUNK_SIZE = 5000  # Rows per executemany/commit
+MAX_REPORTED_ERRORS = 100  # Row errors echoed back to the client
+
+TRANSACTION_FIELDS = (
+    "name",
+    "abbreviation",
+    "transaction_date",
+    "amount",
+    "price",
+    "transaction_id",
+    "rate",
+)
+INSERT_TRANSACTION_QUERY = """
+    INSERT INTO transactions (user_id, name, abbreviation, transaction_date, amount, price, transaction_id, rate)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(transaction_id) DO NOTHING
+"""
+
+
 def load_data_from_csv(csv_file_path: str, query: str, params_func: callable) -> None:
     """
     Generic function to load data from a CSV file into a database.
@@ -53,6 +76,178 @@ def load_portfolio_from_csv(csv_file_path: str, user_id: int) -> None:
     load_data_from_csv(csv_file_path, query, params)
 
 
+def parse_transaction_date(value: str) -> str:
+    """
+    Normalize an ISO 8601 date or datetime to "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS".
+
+    Basic formats such as "20241008" are accepted too. Datetimes with an
+    offset are converted to UTC. The result sorts chronologically as a
+    string, which the ledger relies on to order lots.
+
+    Raises:
+        ValueError: If the value is not an ISO 8601 date or datetime.
+    """
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        pass
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid transaction_date: {value}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_transaction_row(row: Dict[str, str], user_id: int) -> Tuple:
+    """
+    Validate a transactions CSV row and convert it to insert parameters.
+
+    Args:
+        row (Dict[str, str]): Row from csv.DictReader.
+        user_id (int): ID of the user the transaction belongs to.
+
+    Returns:
+        Tuple: Parameters for INSERT_TRANSACTION_QUERY.
+
+    Raises:
+        ValueError: If a field is missing or empty, a number is not finite, or
+            the date is not ISO 8601.
+    """
+    values = {}
+    for field in TRANSACTION_FIELDS:
+        value = (row.get(field) or "").strip()
+        if not value:
+            raise ValueError(f"Missing value for '{field}'")
+        values[field] = value
+
+    numbers = {}
+    for field in ("amount", "price", "rate"):
+        try:
+            numbers[field] = float(values[field])
+        except ValueError as e:
+            raise ValueError(f"Invalid number: {e}")
+        # float() accepts "nan" and "inf", which SQLite cannot store as REAL
+        if not math.isfinite(numbers[field]):
+            raise ValueError(f"Invalid number for '{field}': {values[field]}")
+
+    return (
+        user_id,
+        values["name"],
+        values["abbreviation"].upper(),
+        parse_transaction_date(values["transaction_date"]),
+        numbers["amount"],
+        numbers["price"],
+        values["transaction_id"],
+        numbers["rate"],
+    )
+
+
+def import_transactions(
+    lines: Iterable[str], user_id: int, chunk_size: int = IMPORT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Stream transactions from CSV text into the database.
+
+    Rows are parsed as they are read and inserted with executemany, one
+    transaction per chunk. Rows whose transaction_id already exists are
+    skipped, and invalid rows are reported instead of aborting the import,
+    so re-uploading the same file is safe. If the file stops being readable
+    part way (bad encoding or malformed CSV), the import stops there: the
+    chunks already committed are kept, and the report is marked "aborted"
+    with the error. The user's cost-basis ledger is brought up to date
+    whenever any rows were inserted, even if the import then fails.
+
+    Args:
+        lines (Iterable[str]): CSV text, e.g. an open file or a decoded upload stream.
+        user_id (int): ID of the user the transactions belong to.
+        chunk_size (int): Rows inserted per transaction.
+
+    Returns:
+        Dict[str, Any]: Counts of rows read, inserted, skipped as duplicates and
+        rejected, plus the first MAX_REPORTED_ERRORS row errors and whether the
+        import was aborted.
+
+    Raises:
+        ValueError: If the header cannot be read or lacks a required column.
+    """
+    report = {
+        "rows": 0,
+        "inserted": 0,
+        "duplicates": 0,
+        "rejected": 0,
+        "errors": [],
+        "aborted": False,
+    }
+    reader = csv.DictReader(lines)
+
+    try:
+        columns = reader.fieldnames or []
+    except csv.Error as e:
+        raise ValueError(f"Invalid CSV header: {e}")
+    missing = [field for field in TRANSACTION_FIELDS if field not in columns]
+    if missing:
+        raise ValueError(f"Missing CSV columns: {', '.join(missing)}")
+
+    try:
+        with get_db_connection() as conn:
+
+            def flush(chunk):
+                changes_before = conn.total_changes
+                conn.executemany(INSERT_TRANSACTION_QUERY, chunk)
+                conn.commit()
+                inserted = conn.total_changes - changes_before
+                report["inserted"] += inserted
+                report["duplicates"] += len(chunk) - inserted
+
+            chunk = []
+            line_number = 1  # Line 1 is the header
+            while True:
+                line_number += 1
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    break
+                except (csv.Error, UnicodeDecodeError) as e:
+                    # Nothing after this point can be read; keep what was imported
+                    report["aborted"] = True
+                    report["errors"].append(
+                        {"line": line_number, "error": f"Unreadable CSV: {e}"}
+                    )
+                    logger.warning(
+                        f"Transaction import for user {user_id} stopped at line "
+                        f"{line_number}: {e}"
+                    )
+                    break
+
+                report["rows"] += 1
+                try:
+                    chunk.append(parse_transaction_row(row, user_id))
+                except ValueError as e:
+                    report["rejected"] += 1
+                    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                        report["errors"].append({"line": line_number, "error": str(e)})
+                    continue
+
+                if len(chunk) >= chunk_size:
+                    flush(chunk)
+                    chunk = []
+
+            if chunk:
+                flush(chunk)
+    finally:
+        # Chunks are committed as they go, so the ledger must follow even on failure
+        if report["inserted"]:
+            update_ledger(user_id)
+
+    logger.info(
+        f"Imported transactions for user {user_id}: {report['inserted']} inserted, "
+        f"{report['duplicates']} duplicates, {report['rejected']} rejected."
+    )
+    return report
+
+
 def load_transactions_from_csv(csv_file_path: str, user_id: int) -> None:
     """
     Load transaction data from a CSV file into the database.
@@ -61,21 +256,8 @@ def load_transactions_from_csv(csv_file_path: str, user_id: int) -> None:
         csv_file_path (str): Path to the transactions CSV file.
         user_id (int): ID of the user the data belongs to.
     """
-
-    def params(row):
-        return (
-            user_id,
-            row["name"],
-            row["abbreviation"].upper(),
-            row["transaction_date"],
-            float(row["amount"]),
-            float(row["price"]),
-            row["transaction_id"],
-            float(row["rate"]),
-        )
-
-    query = """
-        INSERT INTO transactions (user_id, name, abbreviation, transaction_date, amount, price, transaction_id, rate)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """
-    load_data_from_csv(csv_file_path, query, params)
+    try:
+        with open(csv_file_path, mode="r", newline="", encoding="utf-8") as file:
+            import_transactions(file, user_id)
+    except Exception as e:
+        logger.error(f"Error loading data from {csv_file_path}: {e}")
@@ -3,6 +3,17 @@ from functools import wraps
 from flask import session, redirect, url_for
 from utils.logger import logger
 from typing import Callable
+from services.principals import get_principal
+
+
+def has_valid_principal(user_id: int) -> bool:
+    """Return whether the user exists and is not deleted."""
+    try:
+        principal = get_principal(user_id)
+    except Exception as e:
+        logger.error(f"Error loading user {user_id}: {e}")
+        return False
+    return principal is not None and not principal.is_deleted
 
 
 def login_required(f: Callable) -> Callable:
@@ -10,8 +21,10 @@ def login_required(f: Callable) -> Callable:
     Decorator to enforce login requirements for a Flask route.
 
     Ensures that the user is logged in by checking for the presence of 'user_id'
-    in the Flask session. If 'user_id' is not found, the user is redirected to
-    the login page, and a warning is logged.
+    in the Flask session, and that the user still exists and is not deleted
+    (checked against the cached principal, so usually without a query). If
+    not, the session is cleared, the user is redirected to the login page,
+    and a warning is logged.
 
     Args:
         f (Callable): The Flask route function to be wrapped by the decorator.
@@ -29,6 +42,12 @@ def login_required(f: Callable) -> Callable:
             return redirect(
                 url_for("login_api.login")
             )  # Redirect to login if user is not logged in
+        if not has_valid_principal(session["user_id"]):
+            logger.warning(
+                "Rejected session of missing or deleted user %s", session["user_id"]
+            )
+            session.clear()
+            return redirect(url_for("login_api.login"))
         return f(*args, **kwargs)
 
     return decorated_function
@@ -0,0 +1,24 @@
+import base64
+import binascii
+from typing import Tuple
+
+
+def encode_cursor(created_at: str, row_id: int) -> str:
+    """Encode a (created_at, id) keyset position as an opaque cursor string."""
+    raw = f"{created_at}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return created_at, int(row_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("Invalid cursor")
@@ -1,10 +1,19 @@
+from datetime import datetime
 from flask_apscheduler import APScheduler
 from utils.logger import logger
 from flask import Flask
-from typing import Callable
+from typing import Callable, Optional
 
 
-def configure_scheduler(app: Flask, check_alerts_func: Callable) -> None:
+def configure_scheduler(
+    app: Flask,
+    check_alerts_func: Callable,
+    refresh_market_func: Optional[Callable] = None,
+    snapshot_portfolios_func: Optional[Callable] = None,
+    history_retention_func: Optional[Callable] = None,
+    anomaly_model_func: Optional[Callable] = None,
+    audit_archival_func: Optional[Callable] = None,
+) -> None:
     """
     Configures and starts the APScheduler for the Flask application.
 
@@ -12,6 +21,16 @@ def configure_scheduler(app: Flask, check_alerts_func: Callable) -> None:
         app (Flask): The Flask application instance.
         check_alerts_func (Callable[[], None]): The function to be scheduled.
             Must take no arguments and return None.
+        refresh_market_func (Optional[Callable[[], Any]]): Refreshes the cached
+            market data. Runs immediately and then every MARKET_REFRESH_INTERVAL seconds.
+        snapshot_portfolios_func (Optional[Callable[[], Any]]): Records every user's
+            portfolio value. Runs every PORTFOLIO_SNAPSHOT_INTERVAL minutes.
+        history_retention_func (Optional[Callable[[], Any]]): Prunes expired
+            portfolio history. Runs every hour.
+        anomaly_model_func (Optional[Callable[[], Any]]): Refits the anomaly model
+            when the market snapshot changed. Runs every MARKET_REFRESH_INTERVAL seconds.
+        audit_archival_func (Optional[Callable[[], Any]]): Moves expired audit events
+            into monthly archive tables. Runs every day.
 
     Raises:
         Exception: If an error occurs during scheduler initialization or job addition.
@@ -28,8 +47,59 @@ def configure_scheduler(app: Flask, check_alerts_func: Callable) -> None:
             replace_existing=True,
             max_instances=int(app.config.get("ALERT_MAX_INSTANCES", 1)),
         )
+        if refresh_market_func is not None:
+            scheduler.add_job(
+                id="refresh_market_data",
+                func=refresh_market_func,
+                trigger="interval",
+                seconds=int(app.config.get("MARKET_REFRESH_INTERVAL", 120)),
+                next_run_time=datetime.now(),  # Warm the cache at startup
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+            )
+        if snapshot_portfolios_func is not None:
+            scheduler.add_job(
+                id="snapshot_portfolios",
+                func=snapshot_portfolios_func,
+                trigger="interval",
+                minutes=int(app.config.get("PORTFOLIO_SNAPSHOT_INTERVAL", 15)),
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+            )
+        if history_retention_func is not None:
+            scheduler.add_job(
+                id="portfolio_history_retention",
+                func=history_retention_func,
+                trigger="interval",
+                hours=1,
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+            )
+        if anomaly_model_func is not None:
+            scheduler.add_job(
+                id="refresh_anomaly_model",
+                func=anomaly_model_func,
+                trigger="interval",
+                seconds=int(app.config.get("MARKET_REFRESH_INTERVAL", 120)),
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+            )
+        if audit_archival_func is not None:
+            scheduler.add_job(
+                id="audit_log_archival",
+                func=audit_archival_func,
+                trigger="interval",
+                days=1,
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+            )
         scheduler.start()
-        logger.info("Scheduler started and 'check_alerts' job added successfully.")
+        logger.info("Scheduler started and jobs added successfully.")
 
     except Exception as e:
         logger.error(f"Failed to initialize the scheduler: {e}")
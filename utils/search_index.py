@@ -0,0 +1,172 @@
+from bisect import bisect_left, bisect_right
+from math import ceil
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+FUZZY_THRESHOLD = 0.4  # Minimum trigram similarity for a fuzzy match
+
+# Match tiers, best first
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING = range(4)
+
+
+def trigrams(text: str, padded: bool = False) -> Set[str]:
+    """
+    Return the set of three-character substrings of `text`.
+
+    Padded trigrams also cover the start and end of the text, which makes
+    similarity between short words much less sensitive to a single typo.
+    """
+    if padded:
+        text = f"  {text} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """
+    Prefix, substring and fuzzy search over documents with a name and a symbol.
+
+    Built once per document set. Prefix lookups bisect a sorted term list,
+    substring lookups run one `str.find` pass over all documents joined into
+    a single string, and fuzzy lookups rank names by trigram similarity,
+    drawing candidates only from the query's rarest trigrams. Results are
+    ranked by match quality, then by document order.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[str, str]]):
+        """
+        Args:
+            documents (Iterable[Tuple[str, str]]): (name, symbol) per document;
+                a document's position is its id and its rank within a match tier.
+        """
+        self._names: List[str] = []
+        self._terms: List[Tuple[str, int, int]] = []  # (term, tier, doc)
+        self._postings: Dict[str, Set[int]] = {}
+        self._trigram_counts: List[int] = []
+        self._offsets: List[int] = []  # Start of each document in the haystack
+        haystack = []
+        offset = 0
+
+        for doc, (name, symbol) in enumerate(documents):
+            name, symbol = (name or "").lower(), (symbol or "").lower()
+            self._names.append(name)
+
+            self._terms.append((name, PREFIX, doc))
+            if symbol:
+                self._terms.append((symbol, PREFIX, doc))
+            for word in name.split()[1:]:
+                self._terms.append((word, WORD_PREFIX, doc))
+
+            grams = trigrams(name, padded=True)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(doc)
+
+            # Separators keep short queries from matching across fields
+            text = f"{name}\x00{symbol}\n"
+            self._offsets.append(offset)
+            haystack.append(text)
+            offset += len(text)
+
+        self._terms.sort()
+        self._sorted_names = sorted(
+            (name, doc) for doc, name in enumerate(self._names)
+        )
+        self._haystack = "".join(haystack)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _prefix_matches(self, query: str, matches: Dict[int, int]) -> None:
+        i = bisect_left(self._terms, (query,))
+        while i < len(self._terms) and self._terms[i][0].startswith(query):
+            term, tier, doc = self._terms[i]
+            tier = EXACT if term == query and tier == PREFIX else tier
+            matches[doc] = min(matches.get(doc, tier), tier)
+            i += 1
+
+    def _substring_matches(self, query: str) -> List[int]:
+        if "\x00" in query or "\n" in query:
+            return []
+        docs = []
+        position = self._haystack.find(query)
+        while position != -1:
+            doc = bisect_right(self._offsets, position) - 1
+            docs.append(doc)
+            # Skip to the next document, one hit per document is enough
+            next_doc = doc + 1
+            start = (
+                self._offsets[next_doc]
+                if next_doc < len(self._offsets)
+                else len(self._haystack)
+            )
+            position = self._haystack.find(query, start)
+        return docs
+
+    def names_starting_with(self, prefix: str) -> List[int]:
+        """
+        Return the documents whose full name starts with `prefix`, in document order.
+
+        Args:
+            prefix (str): Case-insensitive name prefix.
+
+        Returns:
+            List[int]: Matching document ids.
+        """
+        prefix = prefix.lower()
+        i = bisect_left(self._sorted_names, (prefix,))
+        docs = []
+        while i < len(self._sorted_names):
+            name, doc = self._sorted_names[i]
+            if not name.startswith(prefix):
+                break
+            docs.append(doc)
+            i += 1
+        return sorted(docs)
+
+    def search(self, query: str, fuzzy: bool = True) -> List[int]:
+        """
+        Find documents matching `query`, best matches first.
+
+        Exact name or symbol matches rank first, then name or symbol prefixes,
+        then prefixes of later words in the name, then substrings. Fuzzy
+        matches (trigram similarity of at least FUZZY_THRESHOLD) follow,
+        most similar first.
+
+        Args:
+            query (str): Case-insensitive search text.
+            fuzzy (bool): Whether to append fuzzy matches.
+
+        Returns:
+            List[int]: Matching document ids.
+        """
+        query = query.strip().lower()
+        if not query:
+            return list(range(len(self._names)))
+
+        matches: Dict[int, int] = {}
+        self._prefix_matches(query, matches)
+        for doc in self._substring_matches(query):
+            matches.setdefault(doc, SUBSTRING)
+
+        results = sorted(matches, key=lambda doc: (matches[doc], doc))
+        if fuzzy and len(query) >= 3:
+            results.extend(self._fuzzy_matches(query, matches))
+        return results
+
+    def _fuzzy_matches(self, query: str, exclude: Dict[int, int]) -> List[int]:
+        grams = trigrams(query, padded=True)
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        # A match shares at least `required` trigrams with the query, so it
+        # must appear in one of the len(grams) - required + 1 rarest postings
+        required = max(1, ceil(FUZZY_THRESHOLD * len(grams)))
+        candidates = set().union(*postings[: len(grams) - required + 1])
+
+        scored = []
+        for doc in candidates:
+            if doc in exclude:
+                continue
+            shared = sum(doc in posting for posting in postings)
+            similarity = shared / (len(grams) + self._trigram_counts[doc] - shared)
+            if similarity >= FUZZY_THRESHOLD:
+                scored.append((-similarity, doc))
+        return [doc for _, doc in sorted(scored)]